@@ -0,0 +1,95 @@
+"""节点缓存微基准：对比原 OrderedDict 缓存与各淘汰策略缓存的吞吐、每条目内存和命中率
+
+用法: python benchmark/cache_bench.py --capacity 5000 --ops 500000
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import time
+import tracemalloc
+from collections import OrderedDict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from cache import EVICTIONS, make_cache  # noqa: E402
+
+
+class OrderedDict_Cache:
+    """原 Node 的缓存实现：URL 字符串为键，值为 (内容大小, time.time())"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.cache = OrderedDict()
+
+    def get(self, key, now):
+        if key in self.cache:
+            content_size, _ = self.cache.pop(key)
+            self.cache[key] = (content_size, time.time())
+            return content_size
+        return 0
+
+    def put(self, key, size, now):
+        if len(self.cache) >= self.capacity:
+            self.cache.popitem(last=False)
+        self.cache[key] = (size, time.time())
+
+
+def make_stream(ops: int, universe: int, alpha: float, seed: int):
+    """按 Zipf 分布生成访问序列（alpha=0 时为均匀分布）"""
+    rng = random.Random(seed)
+    weights = [1 / (i + 1) ** alpha for i in range(universe)]
+    return rng.choices(range(universe), weights=weights, k=ops)
+
+
+def run(cache, stream, keys):
+    hits = 0
+    start = time.perf_counter()
+    for now, k in enumerate(stream):
+        key = keys[k]
+        if cache.get(key, now):
+            hits += 1
+        else:
+            cache.put(key, 32, now)
+    return len(stream) / (time.perf_counter() - start), hits / len(stream)
+
+
+def bytes_per_entry(factory, capacity, keys):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    cache = factory(capacity)
+    for now in range(capacity):
+        cache.put(keys[now], 32, now)
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del cache
+    return used / capacity
+
+
+def main():
+    parser = argparse.ArgumentParser(description="node cache microbenchmark")
+    parser.add_argument('--capacity', type=int, default=5000)
+    parser.add_argument('--ops', type=int, default=500000)
+    parser.add_argument('--universe', type=int, default=7000, help="不同 URL 数")
+    parser.add_argument('--alpha', type=float, default=0.0, help="Zipf 参数，0 为均匀访问")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    urls = [f"http://bench.com/{''.join(rng.choices(string.ascii_lowercase + string.digits + '_', k=30))}" for _ in range(args.universe)]
+    ids = list(range(args.universe))
+    stream = make_stream(args.ops, args.universe, args.alpha, args.seed)
+
+    print(f"{'cache':<14}{'key':>6}{'kops/s':>10}{'bytes/entry':>13}{'hit ratio':>11}")
+    rate, hit_ratio = run(OrderedDict_Cache(args.capacity), stream, urls)
+    memory = bytes_per_entry(OrderedDict_Cache, args.capacity, urls)
+    print(f"{'OrderedDict':<14}{'str':>6}{rate / 1000:>10.1f}{memory:>13.1f}{hit_ratio:>11.4f}")
+    for eviction in EVICTIONS:
+        rate, hit_ratio = run(make_cache(eviction, args.capacity), stream, ids)
+        memory = bytes_per_entry(lambda capacity: make_cache(eviction, capacity), args.capacity, ids)
+        print(f"{eviction:<14}{'int':>6}{rate / 1000:>10.1f}{memory:>13.1f}{hit_ratio:>11.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""放置算法基准：查找吞吐、负载不均衡度以及节点加入/退出时的键迁移比例
+
+用法: python benchmark/placement_bench.py --nodes 30 300 --keys 200000
+"""
+import argparse
+import hashlib
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from hash_ring import HashRing  # noqa: E402
+from node import Node  # noqa: E402
+from placement import PLACEMENTS, node_weight  # noqa: E402
+from util.tool import cdn_hash, Hostname_Generator  # noqa: E402
+
+
+def make_nodes(num: int, hostname_generator: Hostname_Generator):
+    bandwidths = [1024, 2048]
+    return [Node(hostname=hostname_generator.generate(), cache=5000, bandwidth=bandwidths[i % 2], unit_price=1.0, cost_method='A')
+            for i in range(num)]
+
+
+def owners(hash_ring: HashRing, hashes: np.ndarray):
+    index = {id(node): i for i, node in enumerate(hash_ring.nodes)}
+    return np.array([index[id(node)] for node in hash_ring.get_nodes(hashes)])
+
+
+def bench(placement: str, node_num: int, hashes: np.ndarray, scalar_num: int):
+    random.seed(node_num)
+    hostname_generator = Hostname_Generator()
+    nodes = make_nodes(node_num, hostname_generator)
+
+    start = time.perf_counter()
+    hash_ring = HashRing(nodes, placement=placement)
+    build_time = time.perf_counter() - start
+
+    scalar_hashes = hashes[:scalar_num].tolist()
+    start = time.perf_counter()
+    for hash_value in scalar_hashes:
+        hash_ring.get_node(hash_value)
+    scalar_rate = len(scalar_hashes) / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    before = hash_ring.get_nodes(hashes)
+    bulk_rate = len(hashes) / (time.perf_counter() - start)
+
+    # 负载不均衡度：各节点实际分到的键数与按权重期望键数之比
+    weights = np.array([node_weight(node) for node in hash_ring.nodes], dtype=np.float64)
+    counts = np.bincount(owners(hash_ring, hashes), minlength=len(nodes))
+    ratio = counts / (len(hashes) * weights / weights.sum())
+
+    # 节点加入：迁移比例及理想值（新节点的权重占比）
+    new_node = make_nodes(1, hostname_generator)[0]
+    hash_ring.add_node(new_node)
+    after = hash_ring.get_nodes(hashes)
+    join_moved = float(np.mean(before != after))
+    join_ideal = node_weight(new_node) / (weights.sum() + node_weight(new_node))
+    hash_ring.remove_node(new_node)
+
+    # 节点退出：迁移比例及理想值（退出节点的权重占比）
+    leaving = nodes[len(nodes) // 2]
+    hash_ring.remove_node(leaving)
+    after = hash_ring.get_nodes(hashes)
+    leave_moved = float(np.mean(before != after))
+    leave_ideal = node_weight(leaving) / weights.sum()
+
+    return {
+        'placement': placement,
+        'nodes': node_num,
+        'build_ms': build_time * 1000,
+        'scalar_kops': scalar_rate / 1000,
+        'bulk_kops': bulk_rate / 1000,
+        'max_load': float(ratio.max()),
+        'load_std': float(ratio.std()),
+        'join_moved': join_moved,
+        'join_ideal': join_ideal,
+        'leave_moved': leave_moved,
+        'leave_ideal': leave_ideal,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="placement benchmark")
+    parser.add_argument('--nodes', type=int, nargs='+', default=[30, 300])
+    parser.add_argument('--keys', type=int, default=200000)
+    parser.add_argument('--scalar', type=int, default=20000, help="逐个查找的键数")
+    parser.add_argument('--placements', nargs='+', default=list(PLACEMENTS))
+    args = parser.parse_args()
+
+    hashes = np.array([cdn_hash(hashlib.md5(f"http://bench.com/{i}".encode("utf-8")).hexdigest()) for i in range(args.keys)],
+                      dtype=np.int64)
+    header = f"{'placement':<12}{'nodes':>7}{'build ms':>10}{'scalar k/s':>12}{'bulk k/s':>10}{'max load':>10}{'load std':>10}" \
+             f"{'join moved':>12}{'ideal':>8}{'leave moved':>13}{'ideal':>8}"
+    print(header)
+    for node_num in args.nodes:
+        for placement in args.placements:
+            r = bench(placement, node_num, hashes, args.scalar)
+            print(f"{r['placement']:<12}{r['nodes']:>7}{r['build_ms']:>10.1f}{r['scalar_kops']:>12.1f}{r['bulk_kops']:>10.1f}"
+                  f"{r['max_load']:>10.3f}{r['load_std']:>10.3f}{r['join_moved']:>12.4f}{r['join_ideal']:>8.4f}"
+                  f"{r['leave_moved']:>13.4f}{r['leave_ideal']:>8.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+"""基准测试套件：核心操作的微基准和整段仿真的宏基准，结果保存为带机器信息的 JSON，可与基线对比找出性能回退
+
+用法:
+    python benchmark/suite.py run                                   # 微基准 + 宏基准（1 天，30/300/3000 个节点）
+    python benchmark/suite.py run --only micro --output base.json
+    python benchmark/suite.py run --days 2 --sizes 30 300 --engine flow
+    python benchmark/suite.py compare base.json new.json --threshold 0.1
+
+微基准记录每次操作的纳秒数，宏基准记录整段仿真的秒数，均取多次重复中的最小值（受干扰最小），数值越小越好。
+compare 对两次结果中同名的基准，新结果比基线慢超过 threshold（比例）时标记为回退并以退出码 1 结束。
+默认结果写入 benchmark/results/<时间>.json。
+"""
+import argparse
+import copy
+import datetime
+import json
+import os
+import platform
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+CWD = os.getcwd()  # 命令行给出的结果文件路径相对于启动时的目录
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)  # 业务波形按 ./data 相对路径读取
+
+from hash_ring import HashRing  # noqa: E402
+from node import Node  # noqa: E402
+from simulation import Simulation  # noqa: E402
+from util.entity import Request  # noqa: E402
+from util.tool import cdn_hash, cal_cost, Hostname_Generator  # noqa: E402
+from workload import Workload  # noqa: E402
+
+COST_METHODS = ('A', 'B', 'C', 'D', 'E')
+
+
+def measure(fn, number: int, repeat: int = 5):
+    """调用 fn(number) 共 repeat 次，返回每次操作的纳秒数列表；fn 自己循环 number 次，避免计入外层调用开销"""
+    values = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(number)
+        values.append((time.perf_counter() - start) / number * 1e9)
+    return values
+
+
+def make_node(hostname_generator: Hostname_Generator, bandwidth: float = 1024, cache: int = 5000):
+    return Node(hostname=hostname_generator.generate(), cache=cache, bandwidth=bandwidth, unit_price=1.0, cost_method='A')
+
+
+def micro_benchmarks(repeat: int):
+    """各核心操作的微基准，返回 {名称: 每次操作纳秒数列表}"""
+    random.seed(0)
+    results = {}
+    urls = [f"http://bench.com/{i}" for i in range(100000)]
+
+    def bench_cdn_hash(number):
+        for url in urls[:number]:
+            cdn_hash(url)
+    results['cdn_hash'] = measure(bench_cdn_hash, 100000, repeat)
+
+    hostname_generator = Hostname_Generator()
+    hash_ring = HashRing([make_node(hostname_generator, [1024, 2048][i % 2]) for i in range(300)])
+    hashes = [cdn_hash(url) for url in urls]
+
+    def bench_get_node(number):
+        for hash_value in hashes[:number]:
+            hash_ring.get_node(hash_value)
+    results['hash_ring.get_node'] = measure(bench_get_node, 100000, repeat)
+
+    # 环的增量更新：依次加入 20 个不同的备用节点再把它们依次移除，分别计时，每轮结束后环恢复原状；
+    # add_nodes 在一个扩容事件中一次加入这 20 个节点，按每个节点计
+    spares = [make_node(hostname_generator) for _ in range(20)]
+    results['hash_ring.add_node'] = []
+    results['hash_ring.add_nodes'] = []
+    results['hash_ring.remove_node'] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for spare in spares:
+            hash_ring.add_node(spare)
+        results['hash_ring.add_node'].append((time.perf_counter() - start) / len(spares) * 1e9)
+        start = time.perf_counter()
+        for spare in spares:
+            hash_ring.remove_node(spare)
+        results['hash_ring.remove_node'].append((time.perf_counter() - start) / len(spares) * 1e9)
+        start = time.perf_counter()
+        hash_ring.add_nodes(spares)
+        results['hash_ring.add_nodes'].append((time.perf_counter() - start) / len(spares) * 1e9)
+        for spare in spares:
+            hash_ring.remove_node(spare)
+    assert len(hash_ring.nodes) == 300  # 备用节点已全部移除，之后的基准使用原来的环
+
+    # 命中路径：同一批 URL 反复请求；每次请求前清零已用带宽，避免节点因带宽满载而拒绝
+    node = make_node(hostname_generator, cache=10000)
+    hit_requests = [Request(url, 0) for url in urls[:5000]]
+    for request in hit_requests:
+        node.current_bandwidth = 0
+        node.handle_request_node(request)
+
+    def bench_hit(number):
+        for i in range(number):
+            node.current_bandwidth = 0
+            node.handle_request_node(hit_requests[i % 5000])
+    results['node.handle_request_node.hit'] = measure(bench_hit, 100000, repeat)
+
+    # 未命中路径：每次请求新的 URL，缓存已满，每次回源并淘汰一项
+    miss_node = make_node(hostname_generator, cache=1000)
+    miss_urls = iter(f"http://miss.com/{i}" for i in range(10 ** 9))
+    for _ in range(1000):
+        miss_node.current_bandwidth = 0
+        miss_node.handle_request_node(Request(next(miss_urls), 0))
+
+    def bench_miss(number):
+        requests = [Request(next(miss_urls), 0) for _ in range(number)]
+        for request in requests:
+            miss_node.current_bandwidth = 0
+            miss_node.handle_request_node(request)
+    results['node.handle_request_node.miss'] = measure(bench_miss, 50000, repeat)
+
+    # 计费：一个月加一天的带宽序列
+    rng = np.random.default_rng(0)
+    bandwidth = rng.uniform(0, 2048, 8640 + 288).round(2).tolist()
+    for method in COST_METHODS:
+        results[f'cal_cost.{method}'] = measure(lambda number: [cal_cost(bandwidth, method, 1.0) for _ in range(number)], 20, repeat)
+
+    # 工作负载：一个时间片 1000 个请求的生成和 URL 字符串，按每个请求计
+    for popularity in ('uniform', 'zipf'):
+        workload = Workload('bench', 1000, {"popularity": popularity}, np.random.default_rng(0))
+
+        def bench_requests(number, workload=workload):
+            for tick in range(number // 1000):
+                workload.churn(tick * 300)
+                workload.urls(np.unique(workload.requests(1000)))
+        results[f'workload.requests.{popularity}'] = measure(bench_requests, 100000, repeat)
+    return results
+
+
+def scaled_setting(setting: dict, node_num: int, engine: str):
+    """按比例缩放各类节点数，使总节点数约为 node_num，关闭快照和指标"""
+    setting = copy.deepcopy(setting)
+    total = sum(node_type['num'] for node_type in setting['nodes'])
+    for node_type in setting['nodes']:
+        node_type['num'] = max(1, round(node_type['num'] * node_num / total))
+    setting['engine'] = engine
+    setting['checkpoint'] = {"every_ticks": 0}
+    setting['metrics'] = {"enabled": False}
+    return setting
+
+
+def macro_benchmarks(setting: dict, sizes: list, days: float, engine: str, repeat: int):
+    """在 data/202503 的业务波形上仿真 days 天，返回 {名称: 秒数列表} 和各规模的仿真结果摘要"""
+    results = {}
+    summaries = {}
+    for size in sizes:
+        values = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            simulation = Simulation(scaled_setting(setting, size, engine), seed=0)
+            simulation.run(int(days * 86400), progress=False)
+            values.append(time.perf_counter() - start)
+        name = f'simulation.{engine}.{size}_nodes.{days:g}d'
+        results[name] = values
+        summary = simulation.summary()
+        summaries[name] = {key: summary[key] for key in ('request_num', 'fetch_num', 'dropped_num', 'fetch_ratio', 'total_cost')}
+        print(f"{name:<44}{min(values):>10.2f} s")
+    return results, summaries
+
+
+def git_revision():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], capture_output=True, text=True).stdout.strip())
+        return {"commit": commit, "dirty": dirty}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+
+
+def machine_metadata():
+    return {
+        "hostname": socket.gethostname(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "numpy": np.__version__,
+    }
+
+
+def run(args):
+    setting = json.load(open(args.setting, 'r', encoding='utf-8'))
+    benchmarks = {}
+    summaries = {}
+    if args.only in (None, 'micro'):
+        micro = micro_benchmarks(args.repeat)
+        for name, values in micro.items():
+            print(f"{name:<44}{min(values):>10.1f} ns/op")
+            benchmarks[name] = {"unit": "ns/op", "value": min(values), "median": statistics.median(values), "values": values}
+    if args.only in (None, 'macro'):
+        macro, summaries = macro_benchmarks(setting, args.sizes, args.days, args.engine, args.macro_repeat)
+        for name, values in macro.items():
+            benchmarks[name] = {"unit": "s", "value": min(values), "median": statistics.median(values), "values": values}
+    result = {
+        "created": datetime.datetime.now().isoformat(timespec='seconds'),
+        "machine": machine_metadata(),
+        "git": git_revision(),
+        "args": {key: value for key, value in vars(args).items() if key != 'func'},
+        "benchmarks": benchmarks,
+        "summaries": summaries,
+    }
+    if args.output:
+        output = os.path.join(CWD, args.output)
+    else:
+        output = os.path.join(ROOT, 'benchmark', 'results', f"{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print("Results:", output)
+
+
+def compare(args):
+    base = json.load(open(os.path.join(CWD, args.base), 'r', encoding='utf-8'))
+    new = json.load(open(os.path.join(CWD, args.new), 'r', encoding='utf-8'))
+    if base["machine"] != new["machine"]:
+        print("warning: results come from different machines or environments")
+    print(f"{'benchmark':<44}{'base':>14}{'new':>14}{'change':>9}")
+    regressions = []
+    for name, record in new["benchmarks"].items():
+        if name not in base["benchmarks"]:
+            continue
+        before, after = base["benchmarks"][name]["value"], record["value"]
+        change = after / before - 1 if before else 0.0
+        flag = ''
+        if change > args.threshold:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        elif change < -args.threshold:
+            flag = '  improved'
+        print(f"{name:<44}{before:>14.2f}{after:>14.2f}{change * 100:>8.1f}%{flag}  {record['unit']}")
+    # 基线中有而新结果中没有的基准已被移除或改名，不参与比较
+    for name in sorted(set(base["benchmarks"]) - set(new["benchmarks"])):
+        record = base["benchmarks"][name]
+        print(f"{name:<44}{record['value']:>14.2f}{'-':>14}{'':>9}  {record['unit']}  (missing: removed or renamed)")
+    for name in sorted(set(new["benchmarks"]) - set(base["benchmarks"])):
+        record = new["benchmarks"][name]
+        print(f"{name:<44}{'-':>14}{record['value']:>14.2f}{'':>9}  {record['unit']}  (new)")
+    # 宏基准的仿真结果不同说明行为发生了变化，耗时不能直接比较
+    for name, summary in new.get("summaries", {}).items():
+        if name in base.get("summaries", {}) and base["summaries"][name] != summary:
+            print(f"note: {name} simulation results differ from base")
+    if regressions:
+        print(f"{len(regressions)} regression(s) beyond {args.threshold * 100:.0f}%")
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="simulator benchmark suite")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help="运行基准并保存 JSON")
+    run_parser.add_argument('--setting', default='settings.json')
+    run_parser.add_argument('--only', choices=['micro', 'macro'], help="只运行一类基准")
+    run_parser.add_argument('--sizes', type=int, nargs='+', default=[30, 300, 3000], help="宏基准的总节点数")
+    run_parser.add_argument('--days', type=float, default=1, help="宏基准仿真的天数")
+    run_parser.add_argument('--engine', choices=['request', 'flow'], default='request')
+    run_parser.add_argument('--repeat', type=int, default=5, help="微基准的重复次数")
+    run_parser.add_argument('--macro-repeat', type=int, default=1, help="宏基准的重复次数")
+    run_parser.add_argument('--output', help="结果文件，默认 benchmark/results/<时间>.json")
+    run_parser.set_defaults(func=run)
+
+    compare_parser = subparsers.add_parser('compare', help="对比两次结果，超过阈值的变慢视为回退")
+    compare_parser.add_argument('base')
+    compare_parser.add_argument('new')
+    compare_parser.add_argument('--threshold', type=float, default=0.1, help="允许的变慢比例")
+    compare_parser.set_defaults(func=compare)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,36 +1,123 @@
-import random
+import numpy as np
 
-import pandas as pd
-
-from util.entity import Request
-from util.tool import URL_Generator, cal_cost
+from metrics import Metrics, NULL_METRICS
+from timeseries import Series, Time_Series_Store
+from traces import Trace
+from util.tool import Cost_Calculator
+from workload import Workload
 
 
 class Business:  # 业务
-    def __init__(self, app_id: str, unit_price: float, cost_method: str, url_num: int, wave_file: str):
+    def __init__(self, app_id: str, unit_price: float, cost_method: str, url_num: int, wave_file: str, series: Series = None,
+                 workload: dict = None, rng: np.random.Generator = None, trace: dict = None, metrics: Metrics = None):
         self.app_id = app_id
         self.unit_price = unit_price
         self.cost_method = cost_method
-        self.url_generator = URL_Generator(app_id, url_num)
-        self.request_nums = pd.read_csv(f"./data/{wave_file}")['total_bw']
+        self.url_num = url_num
+        self.wave_file = wave_file
+        self.workload = Workload(app_id, url_num, workload, rng)  # URL 目录和请求流，rng 为本业务的随机数生成器
+        self.trace = Trace(f"./data/{wave_file}", trace)  # 带宽波形，解析结果在各业务和进程间共享
         self.current_bandwidth = 0
-        self.bandwidths = []
-        self.costs = []
+        # 带宽与成本在时间序列存储中的一行，单独创建时使用自己的小存储
+        self.series = series if series is not None else Time_Series_Store(tick_chunk=288, entity_chunk=1).register('businesses', app_id)
+        self.cost_calculator = Cost_Calculator(cost_method, unit_price)  # 增量计费，避免每个时间片重新排序全部历史
+        self.sampler = None  # 空间抽样器，None 表示全量仿真
+        self.sample_mass = 1.0  # 被抽中的 URL 的总请求概率，记录的带宽除以它还原为全量
+        self.metrics = metrics if metrics is not None else NULL_METRICS  # 所属仿真的内部指标
 
-    def send_request(self, request_handler, timestamp):
-        base_request_num = round(self.request_nums[timestamp % 86400 / 300] / 32)  # 每个请求大小为32MB，需要与node.py->generate_content_size()保持一致
+    def get_request_num(self, timestamp):
+        base_request_num = round(self.trace.bandwidth(timestamp) / self.workload.size_mean)  # 请求数 = 带宽 / 对象平均大小
         # fluctuation = int(base_request_num * 0.05)  # 计算5%的波动
         # request_num = base_request_num + random.randint(-fluctuation, fluctuation)  # 加上波动
-        request_num = base_request_num
-        for j in range(request_num):
-            request = Request(self.url_generator.get_url(timestamp), timestamp)
-            response = request_handler.handle_request(request)
-            self.current_bandwidth += response.content_size
+        return base_request_num
+
+    def sample(self, sampler):
+        """空间抽样仿真：只发送被 sampler 抽中的 URL 的请求，记录的带宽按被抽中的请求比例放大还原"""
+        self.sampler = sampler
+
+    def sample_urls(self, request_num: int):
+        """返回被抽中的 URL 下标、它们之间的相对请求概率，以及落在这些 URL 上的请求数
+
+        请求数取 request_num 乘以被抽中 URL 的总概率，小数部分随机取整，比二项抽样的方差小
+        """
+        indexes = self.sampler.indexes(self.workload)
+        probabilities = self.workload.popularity()[indexes]
+        self.sample_mass = float(probabilities.sum())
+        if self.sample_mass == 0:
+            return indexes, probabilities, 0
+        expected = request_num * self.sample_mass
+        request_num = int(expected) + (self.workload.rng.random() < expected - int(expected))
+        return indexes, probabilities / self.sample_mass, request_num
+
+    def send_request(self, request_handler, timestamp):
+        """逐请求发送：一次生成本时间片全部请求的 URL 下标，只为其中不同的 URL 生成字符串"""
+        request_num = self.get_request_num(timestamp)
+        workload = self.workload
+        request_handler.watch(workload)
+        with self.metrics.time('generate'):
+            workload.churn(timestamp)
+            if self.sampler is None:
+                indexes = workload.requests(request_num)
+            else:
+                candidates, probabilities, request_num = self.sample_urls(request_num)
+                indexes = workload.requests(request_num, candidates, probabilities)
+            slots, order = np.unique(indexes, return_inverse=True)
+            urls = workload.urls(slots)
+        self.metrics.count('generated_requests', len(indexes))
+        bandwidth, _ = request_handler.handle_batch(urls, timestamp, order.tolist(), workload.sizes[slots].tolist())
+        self.current_bandwidth += bandwidth
+
+    def send_flow(self, request_handler, timestamp):
+        """流量级发送：一次多项分布抽样得到本时间片各 URL 的请求数，每个被请求的 URL 只路由一次"""
+        request_num = self.get_request_num(timestamp)
+        if request_num == 0:
+            return
+        workload = self.workload
+        request_handler.watch(workload)
+        with self.metrics.time('generate'):
+            workload.churn(timestamp)
+            candidates, probabilities = None, None
+            if self.sampler is not None:
+                candidates, probabilities, request_num = self.sample_urls(request_num)
+                if request_num == 0:
+                    return
+            slots, counts = workload.flows(request_num, candidates, probabilities)
+            urls = workload.urls(slots)
+        self.metrics.count('generated_requests', request_num)
+        bandwidth, _ = request_handler.handle_flow(urls, counts.tolist(), timestamp, workload.sizes[slots].tolist())
+        self.current_bandwidth += bandwidth
 
     def record(self):
-        self.bandwidths.append(self.current_bandwidth)
+        if self.sampler is None:
+            self.series.append(bandwidth=self.current_bandwidth)
+        else:
+            self.series.append(bandwidth=self.current_bandwidth / self.sample_mass if self.sample_mass else 0)
         self.current_bandwidth = 0
-        self.costs.append(self.get_cost())
+        self.series.set('cost', self.get_cost())
+
+    def get_state(self):
+        """快照：构造参数以外的可变状态"""
+        return {
+            "current_bandwidth": self.current_bandwidth,
+            "sample_mass": self.sample_mass,
+            "workload": self.workload.get_state(),
+            "cost_calculator": self.cost_calculator.get_state(),
+        }
+
+    def set_state(self, state: dict):
+        self.current_bandwidth = state["current_bandwidth"]
+        self.sample_mass = state["sample_mass"]
+        self.workload.set_state(state["workload"])
+        self.cost_calculator.set_state(state["cost_calculator"])
+
+    @property
+    def bandwidths(self):
+        return self.series.view('bandwidth')
+
+    @property
+    def costs(self):
+        return self.series.view('cost')
 
     def get_cost(self):
-        return cal_cost(self.bandwidths, self.cost_method, self.unit_price)
+        with self.metrics.time('cost'):
+            return self.cost_calculator.update(self.bandwidths, self.series.offset)
@@ -0,0 +1,374 @@
+from abc import ABC, abstractmethod
+from array import array
+from collections import OrderedDict
+from math import ceil
+
+from util.tool import pack, unpack
+
+
+class Cache(ABC):
+    """节点缓存基类：键为整型 URL id
+
+    get() 只处理命中，未命中返回 0；未命中回源后由调用方调用 put() 写入。时间戳使用模拟时间
+    """
+
+    # 快照中保存的属性
+    STATE = ('slots', 'evictions')
+
+    def __init__(self, capacity: float):
+        self.capacity = max(1, ceil(capacity))  # 最多缓存的条目数
+        self.slots = {}  # URL id -> 条目
+        self.evictions = 0  # 淘汰次数
+
+    def __len__(self):
+        return len(self.slots)
+
+    def get_state(self):
+        """缓存内容和淘汰顺序，数组和字典转为 NumPy 数组"""
+        state = {name: pack(getattr(self, name)) for name in self.STATE}
+        if hasattr(self, 'lists'):
+            state['lists'] = self.lists.get_state()
+        return state
+
+    def set_state(self, state: dict):
+        """恢复 get_state 保存的状态，容量须与保存时相同"""
+        for name in self.STATE:
+            setattr(self, name, unpack(getattr(self, name), state[name]))
+        if hasattr(self, 'lists'):
+            self.lists.set_state(state['lists'])
+
+    def __contains__(self, key: int):
+        return key in self.slots
+
+    @abstractmethod
+    def get(self, key: int, now: int):
+        """命中时更新访问状态并返回内容大小，未命中返回 0"""
+
+    @abstractmethod
+    def put(self, key: int, size: int, now: int):
+        """写入未命中的内容，缓存已满时按策略先淘汰"""
+
+    def touch(self, key: int, now: int, times: int):
+        """刚 get 或 put 过的 key 在同一时刻再命中 times 次"""
+        for _ in range(times):
+            self.get(key, now)
+
+
+class Array_Cache(Cache):
+    """条目存放在预分配的数组中，slots 的值为条目下标，链表用数组下标串联，命中时不分配新对象"""
+
+    STATE = Cache.STATE + ('keys', 'sizes', 'free')
+
+    def __init__(self, capacity: float):
+        super().__init__(capacity)
+        self.keys = array('q', [0]) * self.capacity
+        self.sizes = array('q', [0]) * self.capacity
+        self.free = array('i', range(self.capacity - 1, -1, -1))  # 空闲条目下标
+
+    def allocate(self, key: int, size: int):
+        slot = self.free.pop()
+        self.slots[key] = slot
+        self.keys[slot] = key
+        self.sizes[slot] = size
+        return slot
+
+    def release(self, slot: int):
+        del self.slots[self.keys[slot]]
+        self.free.append(slot)
+        self.evictions += 1
+
+
+class Linked_Lists:
+    """共享 prev/next 数组的多条循环双向链表，表头为哨兵下标 base + i，表头之后为最新插入的条目"""
+
+    def __init__(self, capacity: int, list_num: int):
+        self.base = capacity
+        self.prev = array('i', range(capacity + list_num))
+        self.next = array('i', range(capacity + list_num))
+        self.lengths = [0] * list_num
+        self.owner = array('b', [-1]) * capacity  # 条目所在链表编号，-1 表示不在任何链表中
+
+    def get_state(self):
+        return {name: pack(getattr(self, name)) for name in ('prev', 'next', 'lengths', 'owner')}
+
+    def set_state(self, state: dict):
+        for name in ('prev', 'next', 'lengths', 'owner'):
+            setattr(self, name, unpack(getattr(self, name), state[name]))
+
+    def push_front(self, i: int, slot: int):
+        head = self.base + i
+        first = self.next[head]
+        self.prev[slot] = head
+        self.next[slot] = first
+        self.prev[first] = slot
+        self.next[head] = slot
+        self.owner[slot] = i
+        self.lengths[i] += 1
+
+    def unlink(self, slot: int):
+        prev = self.prev[slot]
+        nxt = self.next[slot]
+        self.next[prev] = nxt
+        self.prev[nxt] = prev
+        self.lengths[self.owner[slot]] -= 1
+        self.owner[slot] = -1
+
+    def back(self, i: int):
+        """链表中最早插入的条目"""
+        return self.prev[self.base + i]
+
+    def items(self, i: int):
+        """从最早到最新遍历链表"""
+        head = self.base + i
+        slot = self.prev[head]
+        while slot != head:
+            yield slot
+            slot = self.prev[slot]
+
+
+class LRU_Cache(Cache):
+    """最近最少使用淘汰，与原 OrderedDict 缓存的淘汰顺序一致
+
+    slots 本身就是 URL id -> 内容大小、按访问顺序排列的 OrderedDict：命中时 move_to_end，淘汰时 popitem，
+    链表由 C 实现维护，不需要另外的条目数组。值只有内容大小，比原来的 (内容大小, 时间戳) 元组少两个对象
+    """
+
+    def __init__(self, capacity: float):
+        super().__init__(capacity)
+        self.slots = OrderedDict()  # 从最久未使用到最近使用
+
+    def set_state(self, state: dict):
+        super().set_state(state)
+        self.slots = OrderedDict(self.slots)  # 快照按访问顺序保存键
+
+    def get(self, key: int, now: int):
+        size = self.slots.get(key)
+        if size is None:
+            return 0
+        self.slots.move_to_end(key)
+        return size
+
+    def put(self, key: int, size: int, now: int):
+        if len(self.slots) >= self.capacity:
+            self.slots.popitem(last=False)
+            self.evictions += 1
+        self.slots[key] = size
+
+    def touch(self, key: int, now: int, times: int):
+        # 条目已是最近使用，重复命中不改变顺序
+        pass
+
+    def order(self):
+        """按从最久未使用到最近使用的顺序返回缓存的 URL id"""
+        return list(self.slots)
+
+
+class LFU_Cache(Array_Cache):
+    """最少使用频次淘汰，同频次内淘汰最久未使用的条目，各频次一个桶，O(1) 更新"""
+
+    STATE = Array_Cache.STATE + ('freqs', 'next', 'prev', 'buckets', 'min_freq')
+
+    def __init__(self, capacity: float):
+        super().__init__(capacity)
+        self.freqs = array('q', [0]) * self.capacity
+        self.next = array('i', [0]) * self.capacity  # 桶内循环链表，桶头为该频次最近使用的条目
+        self.prev = array('i', [0]) * self.capacity
+        self.buckets = {}  # 频次 -> 桶头条目下标
+        self.min_freq = 0
+
+    def unlink(self, slot: int):
+        freq = self.freqs[slot]
+        nxt = self.next[slot]
+        if nxt == slot:
+            del self.buckets[freq]
+            return
+        prev = self.prev[slot]
+        self.next[prev] = nxt
+        self.prev[nxt] = prev
+        if self.buckets[freq] == slot:
+            self.buckets[freq] = nxt
+
+    def push(self, slot: int, freq: int):
+        self.freqs[slot] = freq
+        head = self.buckets.get(freq)
+        if head is None:
+            self.next[slot] = slot
+            self.prev[slot] = slot
+        else:
+            tail = self.prev[head]
+            self.next[slot] = head
+            self.prev[slot] = tail
+            self.next[tail] = slot
+            self.prev[head] = slot
+        self.buckets[freq] = slot
+
+    def get(self, key: int, now: int):
+        slot = self.slots.get(key)
+        if slot is None:
+            return 0
+        freq = self.freqs[slot]
+        self.unlink(slot)
+        if freq == self.min_freq and freq not in self.buckets:
+            self.min_freq = freq + 1
+        self.push(slot, freq + 1)
+        return self.sizes[slot]
+
+    def put(self, key: int, size: int, now: int):
+        if len(self.slots) >= self.capacity:
+            victim = self.prev[self.buckets[self.min_freq]]
+            self.unlink(victim)
+            self.release(victim)
+        self.push(self.allocate(key, size), 1)
+        self.min_freq = 1
+
+
+class S3FIFO_Cache(Array_Cache):
+    """S3-FIFO：小 FIFO（10%）过滤只访问一次的内容，主 FIFO 按访问次数重新插入，幽灵队列记录刚被小 FIFO 淘汰的键"""
+
+    SMALL, MAIN = 0, 1
+    STATE = Array_Cache.STATE + ('freqs', 'ghost')
+
+    def __init__(self, capacity: float, small_ratio: float = 0.1):
+        super().__init__(capacity)
+        self.lists = Linked_Lists(self.capacity, 2)
+        self.freqs = array('b', [0]) * self.capacity  # 访问次数，最多记到 3
+        self.small_capacity = max(1, int(self.capacity * small_ratio))
+        self.ghost = {}  # 被小 FIFO 淘汰的键，按插入顺序淘汰
+        self.ghost_capacity = max(1, self.capacity - self.small_capacity)
+
+    def get(self, key: int, now: int):
+        slot = self.slots.get(key)
+        if slot is None:
+            return 0
+        if self.freqs[slot] < 3:
+            self.freqs[slot] += 1
+        return self.sizes[slot]
+
+    def touch(self, key: int, now: int, times: int):
+        slot = self.slots[key]
+        self.freqs[slot] = min(3, self.freqs[slot] + times)
+
+    def put(self, key: int, size: int, now: int):
+        while len(self.slots) >= self.capacity:
+            if self.lists.lengths[self.SMALL] >= self.small_capacity or self.lists.lengths[self.MAIN] == 0:
+                self.evict_small()
+            else:
+                self.evict_main()
+        slot = self.allocate(key, size)
+        self.freqs[slot] = 0
+        if key in self.ghost:
+            del self.ghost[key]
+            self.lists.push_front(self.MAIN, slot)
+        else:
+            self.lists.push_front(self.SMALL, slot)
+
+    def evict_small(self):
+        slot = self.lists.back(self.SMALL)
+        self.lists.unlink(slot)
+        if self.freqs[slot] > 1:  # 在小 FIFO 中被再次访问，晋升到主 FIFO
+            self.freqs[slot] = 0
+            self.lists.push_front(self.MAIN, slot)
+            return
+        key = self.keys[slot]
+        self.release(slot)
+        if len(self.ghost) >= self.ghost_capacity:
+            del self.ghost[next(iter(self.ghost))]
+        self.ghost[key] = None
+
+    def evict_main(self):
+        while True:
+            slot = self.lists.back(self.MAIN)
+            self.lists.unlink(slot)
+            if self.freqs[slot] > 0:  # 访问过则降低计数后重新插入
+                self.freqs[slot] -= 1
+                self.lists.push_front(self.MAIN, slot)
+                continue
+            self.release(slot)
+            return
+
+
+class ARC_Cache(Array_Cache):
+    """自适应替换缓存：T1/T2 分别保存访问一次/多次的内容，B1/B2 为对应的幽灵列表，按幽灵命中自适应调整 T1 目标大小 p"""
+
+    T1, T2 = 0, 1
+    STATE = Array_Cache.STATE + ('b1', 'b2', 'p')
+
+    def __init__(self, capacity: float):
+        super().__init__(capacity)
+        self.lists = Linked_Lists(self.capacity, 2)
+        self.b1 = {}  # 幽灵列表，按插入顺序从旧到新
+        self.b2 = {}
+        self.p = 0.0
+
+    def get(self, key: int, now: int):
+        slot = self.slots.get(key)
+        if slot is None:
+            return 0
+        self.lists.unlink(slot)
+        self.lists.push_front(self.T2, slot)
+        return self.sizes[slot]
+
+    def touch(self, key: int, now: int, times: int):
+        # 第一次再命中即移入 T2 表头，之后的命中不再改变状态
+        if times > 0:
+            self.get(key, now)
+
+    def replace(self, in_b2: bool):
+        t1_len = self.lists.lengths[self.T1]
+        if t1_len > 0 and ((in_b2 and t1_len == self.p) or t1_len > self.p or self.lists.lengths[self.T2] == 0):
+            slot = self.lists.back(self.T1)
+            ghost = self.b1
+        else:
+            slot = self.lists.back(self.T2)
+            ghost = self.b2
+        key = self.keys[slot]
+        self.lists.unlink(slot)
+        self.release(slot)
+        ghost[key] = None
+
+    def put(self, key: int, size: int, now: int):
+        c = self.capacity
+        if key in self.b1:
+            self.p = min(c, self.p + max(len(self.b2) / len(self.b1), 1))
+            del self.b1[key]
+            if len(self.slots) >= c:
+                self.replace(False)
+            self.lists.push_front(self.T2, self.allocate(key, size))
+            return
+        if key in self.b2:
+            self.p = max(0.0, self.p - max(len(self.b1) / len(self.b2), 1))
+            del self.b2[key]
+            if len(self.slots) >= c:
+                self.replace(True)
+            self.lists.push_front(self.T2, self.allocate(key, size))
+            return
+        t1_len = self.lists.lengths[self.T1]
+        if t1_len + len(self.b1) >= c:
+            if t1_len < c:
+                del self.b1[next(iter(self.b1))]
+                if len(self.slots) >= c:
+                    self.replace(False)
+            else:
+                slot = self.lists.back(self.T1)
+                self.lists.unlink(slot)
+                self.release(slot)
+        elif len(self.slots) + len(self.b1) + len(self.b2) >= c:
+            if len(self.slots) + len(self.b1) + len(self.b2) >= 2 * c:
+                del self.b2[next(iter(self.b2))]
+            if len(self.slots) >= c:
+                self.replace(False)
+        self.lists.push_front(self.T1, self.allocate(key, size))
+
+
+EVICTIONS = {
+    'LRU': LRU_Cache,
+    'LFU': LFU_Cache,
+    'S3-FIFO': S3FIFO_Cache,
+    'ARC': ARC_Cache,
+}
+
+
+def make_cache(eviction: str, capacity: float):
+    if eviction not in EVICTIONS:
+        raise ValueError(f"unknown eviction policy: {eviction}")
+    return EVICTIONS[eviction](capacity)
@@ -0,0 +1,282 @@
+"""仪表盘服务：在独立进程中运行 Flask，从共享内存读取仿真进程写入的时间序列，不占用仿真进程的 GIL
+
+接口：
+    /stream    Server-Sent Events：连接时推送一次（可降采样的）历史，之后每个新时间片推送增量
+    /history   某些实体 [begin, end) 时间片的降采样历史，供缩放查看
+    /data      轮询接口，format=binary 时返回紧凑的二进制格式
+    /metrics   仿真内部指标（Prometheus 文本格式），settings.json 中 metrics.enabled 为 true 时才有内容
+
+各接口都可以用 names=（逗号分隔的节点主机名或业务 app_id）或 kinds=（nodes、shields、businesses）只取部分实体，
+总体序列总是返回；客户端接受 gzip 时较大的响应会压缩。
+
+由 main.py 通过 start_dashboard 启动；也可以单独启动并连接正在运行的仿真：
+python dashboard.py <共享内存名称> [--port 5000]
+"""
+import argparse
+import gzip
+import json
+import multiprocessing
+import struct
+import time
+import zlib
+
+import numpy as np
+from flask import Flask, Response, abort, render_template, request
+
+from shared_metrics import Shared_Metrics_Reader
+from util.downsample import downsample, DOWNSAMPLERS
+
+app = Flask(__name__)
+reader = None  # 当前进程打开的 Shared_Metrics_Reader
+GZIP_MIN_SIZE = 1024  # 小于该字节数的响应不压缩
+
+
+def entity_filter():
+    """请求参数 names、kinds 指定的实体名称和类别集合，未指定时为 None"""
+    names = request.args.get('names')
+    kinds = request.args.get('kinds')
+    return set(names.split(',')) if names else None, set(kinds.split(',')) if kinds else None
+
+
+def selected_rows(entities: list, names: set = None, kinds: set = None):
+    """筛选实体，返回 (行, 实体) 列表，总体序列总是包含"""
+    rows = []
+    for row, entity in enumerate(entities):
+        if entity["kind"] != 'total':
+            if names is not None and entity["name"] not in names:
+                continue
+            if kinds is not None and entity["kind"] not in kinds:
+                continue
+        rows.append((row, entity))
+    return rows
+
+
+def sign_of(entity: dict):
+    return -1 if entity["kind"] in ('nodes', 'shields') else 1  # 节点成本取负值显示
+
+
+def accepts_gzip():
+    return 'gzip' in request.headers.get('Accept-Encoding', '')
+
+
+def compressed(body: bytes, mimetype: str):
+    response = Response(body, mimetype=mimetype)
+    if len(body) >= GZIP_MIN_SIZE and accepts_gzip():
+        response.set_data(gzip.compress(body, compresslevel=5))
+        response.headers['Content-Encoding'] = 'gzip'
+        response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
+
+@app.route('/')
+def index():
+    return render_template('index.html')
+
+
+@app.route('/data')
+def get_data():
+    last_index = request.args.get('last_index', 0, type=int)
+    entities, first, arrays, fetch_ratio, bandwidth_ratio, data_length = reader.read(last_index)
+    rows = selected_rows(entities, *entity_filter())
+
+    if request.args.get('format') == 'binary':
+        return compressed(binary_payload(rows, first, arrays, fetch_ratio, bandwidth_ratio, data_length), 'application/octet-stream')
+
+    def entity_data(row, start, sign=1):
+        # 客户端上次请求之后才加入的实体返回完整历史（加入前为 0），其余返回增量
+        pad = first if start > last_index else 0
+        return {
+            "bandwidths": np.concatenate([np.zeros(pad), arrays['bandwidth'][row]]).tolist(),
+            "costs": np.concatenate([np.zeros(pad), sign * arrays['cost'][row]]).tolist()
+        }
+
+    nodes_data = {}
+    businesses_data = {}
+    total_bandwidth = []
+    total_cost = []
+    for row, entity in rows:
+        if entity["kind"] in ('nodes', 'shields'):
+            nodes_data[entity["name"]] = entity_data(row, entity["start"], -1)
+        elif entity["kind"] == 'businesses':
+            businesses_data[entity["name"]] = entity_data(row, entity["start"])
+        else:
+            # 总数据始终返回增量
+            total_bandwidth = arrays['bandwidth'][row].tolist()
+            total_cost = arrays['cost'][row].tolist()
+
+    return compressed(json.dumps({
+        'new_index': data_length - 1 if data_length > 0 else 0,  # 返回最后有效索引
+        'nodes': nodes_data,
+        'businesses': businesses_data,
+        'total_cost': total_cost,
+        'total_bandwidth': total_bandwidth,
+        "fetch_ratio": fetch_ratio,
+        "bandwidth_ratio": bandwidth_ratio
+    }).encode('utf-8'), 'application/json')
+
+
+def binary_payload(rows: list, first: int, arrays: dict, fetch_ratio: float, bandwidth_ratio: float, length: int):
+    """二进制格式：4 字节小端 JSON 长度、JSON 头部、float32 数据
+
+    头部 series 的每项为 [类别, 名称, 起始时间片]，数据依次为各实体 [first, length) 的带宽和成本，每段 length - first 个值
+    """
+    header = {
+        "first": first,
+        "length": length,
+        "fetch_ratio": fetch_ratio,
+        "bandwidth_ratio": bandwidth_ratio,
+        "series": [[entity["kind"], entity["name"], entity["start"]] for _, entity in rows],
+    }
+    values = np.empty((len(rows), 2, length - first), dtype='<f4')
+    for i, (row, entity) in enumerate(rows):
+        values[i, 0] = arrays['bandwidth'][row]
+        values[i, 1] = sign_of(entity) * arrays['cost'][row]
+    meta = json.dumps(header, ensure_ascii=False).encode('utf-8')
+    return struct.pack('<I', len(meta)) + meta + values.tobytes()
+
+
+def history_payload(rows: list, first: int, arrays: dict, max_points: int, method: str):
+    """各实体的历史，每个字段分别降采样为 x（时间片）和 y"""
+    series = {}
+    for row, entity in rows:
+        fields = {}
+        for field in ('bandwidth', 'cost'):
+            values = arrays[field][row] * (sign_of(entity) if field == 'cost' else 1)
+            # 总体序列点数不多且用于计算修改前后利润，不降采样
+            indexes = np.arange(len(values)) if entity["kind"] == 'total' else downsample(values, max_points, method)
+            fields[field] = {"x": (indexes + first).tolist(), "y": values[indexes].tolist()}
+        series[entity["name"]] = {"kind": entity["kind"], "start": entity["start"], **fields}
+    return series
+
+
+def history_args():
+    max_points = request.args.get('max_points', 2000, type=int)
+    method = request.args.get('method', 'lttb')
+    if method not in DOWNSAMPLERS:
+        abort(400, f"unknown downsampling method: {method}")
+    return max_points, method
+
+
+@app.route('/history')
+def get_history():
+    """[begin, end) 时间片的降采样历史，超出共享内存环的部分不返回"""
+    begin = request.args.get('begin', 0, type=int)
+    end = request.args.get('end', None, type=int)
+    max_points, method = history_args()
+    entities, first, arrays, _, _, length = reader.read(begin)
+    end = length if end is None else max(first, min(end, length))
+    arrays = {field: values[:, :end - first] for field, values in arrays.items()}
+    return compressed(json.dumps({
+        "first": first,
+        "length": end,
+        "series": history_payload(selected_rows(entities, *entity_filter()), first, arrays, max_points, method),
+    }).encode('utf-8'), 'application/json')
+
+
+@app.route('/metrics')
+def get_metrics():
+    return Response(reader.read_metrics(), mimetype='text/plain; version=0.0.4')
+
+
+def sse(event: str, payload: dict):
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n".encode('utf-8')
+
+
+@app.route('/stream')
+def stream():
+    """SSE：先推送 history 事件（降采样的历史），之后每出现新的时间片推送 delta 事件
+
+    delta 中每个实体的 bandwidths、costs 为 [first, length) 时间片的值，中途加入的实体附带 kind、start；
+    encoding=gzip 时整个事件流以 gzip 压缩，每个事件单独刷新
+    """
+    max_points, method = history_args()
+    interval = request.args.get('interval', 1.0, type=float)
+    use_gzip = request.args.get('encoding') == 'gzip' and accepts_gzip()
+    keepalive = 15  # 无新数据时发送注释行的间隔（秒），及时发现断开的连接
+    names, kinds = entity_filter()  # 生成器在请求上下文之外运行，先取出参数
+
+    def events():
+        entities, first, arrays, fetch_ratio, bandwidth_ratio, length = reader.read(0)
+        rows = selected_rows(entities, names, kinds)
+        sent = {entity["name"] for _, entity in rows}
+        yield sse('history', {
+            "first": first,
+            "length": length,
+            "fetch_ratio": fetch_ratio,
+            "bandwidth_ratio": bandwidth_ratio,
+            "series": history_payload(rows, first, arrays, max_points, method),
+        })
+        last = length
+        idle = 0.0
+        while True:
+            time.sleep(interval)
+            entities, first, arrays, fetch_ratio, bandwidth_ratio, length = reader.read(last)
+            if length <= last:
+                idle += interval
+                if idle >= keepalive:
+                    idle = 0.0
+                    yield b": keepalive\n\n"
+                continue
+            idle = 0.0
+            series = {}
+            for row, entity in selected_rows(entities, names, kinds):
+                data = {
+                    "bandwidths": arrays['bandwidth'][row].tolist(),
+                    "costs": (sign_of(entity) * arrays['cost'][row]).tolist(),
+                }
+                if entity["name"] not in sent:
+                    # 新加入的实体：起始时间片不早于 last，加入前的值为 0，增量即完整历史
+                    sent.add(entity["name"])
+                    data.update(kind=entity["kind"], start=entity["start"])
+                series[entity["name"]] = data
+            yield sse('delta', {
+                "first": first,
+                "length": length,
+                "fetch_ratio": fetch_ratio,
+                "bandwidth_ratio": bandwidth_ratio,
+                "series": series,
+            })
+            last = length
+
+    body = events()
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    if use_gzip:
+        body = gzip_stream(body)
+        headers['Content-Encoding'] = 'gzip'
+    return Response(body, mimetype='text/event-stream', headers=headers)
+
+
+def gzip_stream(chunks):
+    """逐块 gzip 压缩，每块之后同步刷新，浏览器可以立即解出每个事件"""
+    compressor = zlib.compressobj(5, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+
+def serve(name: str, host: str = '0.0.0.0', port: int = 5000):
+    global reader
+    reader = Shared_Metrics_Reader(name)
+    try:
+        app.run(host=host, port=port, threaded=True)
+    finally:
+        reader.close()
+
+
+def start_dashboard(name: str, host: str = '0.0.0.0', port: int = 5000):
+    """在新进程中启动仪表盘，返回该进程；使用 spawn 方式，子进程不复制仿真进程的内存"""
+    process = multiprocessing.get_context('spawn').Process(target=serve, args=(name, host, port), name='dashboard')
+    process.start()
+    return process
+
+
+def main():
+    parser = argparse.ArgumentParser(description="serve the dashboard for a running simulation")
+    parser.add_argument('name', help="仿真进程输出的共享内存名称")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5000)
+    args = parser.parse_args()
+    serve(args.name, args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()
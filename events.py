@@ -0,0 +1,117 @@
+"""拓扑变化时间线：按时间加入、移除节点，节点故障与恢复，业务上线与下线
+
+事件文件由 settings.json 的 events.file 指定，格式::
+
+    {"events": [
+        {"time": 1296000, "action": "add_nodes", "nodes": [{"num": 2, "cache": 5000, "bandwidth": 1024, ...}]},
+        {"time": 1296000, "action": "onboard_businesses", "businesses": [{"app_id": "business4", ...}]},
+        {"time": 1728000, "action": "fail_nodes", "type": "nodes.0", "num": 3},
+        {"time": 1800000, "action": "recover_nodes", "type": "nodes.0", "num": 3},
+        {"time": 2160000, "action": "remove_nodes", "hostnames": ["bkj-0A1B2C3D"]},
+        {"time": 2160000, "action": "offboard_businesses", "app_ids": ["baidu"]}
+    ]}
+
+time 为秒，事件在它所在时间片开始时执行，同一时间片的事件按文件中的顺序执行。节点事件用 hostnames 指定主机名，
+或用 type（节点类型，如 nodes.0；事件加入的节点类型为 <name>.<i>，name 默认为 events.<事件在文件中的下标>）
+和 num 指定该类节点中最后加入的 num 个，抽样仿真时 num 按抽样率换算。
+
+故障节点移出哈希环、缓存丢失，仍计算带宽（为 0）和成本；恢复后以空缓存重新加入哈希环。移除的节点移出哈希环和集群，
+按 0 带宽记录和计费到当前计费月结束。
+每个节点事件记录主哈希环上首选节点改变的 URL 比例；每个事件记录其后 window 个时间片的回源数相对之前
+window 个时间片平均值的增量，即冷缓存带来的回源尖峰。
+"""
+import json
+
+import numpy as np
+import pandas as pd
+
+NODE_ACTIONS = ('add_nodes', 'remove_nodes', 'fail_nodes', 'recover_nodes')
+BUSINESS_ACTIONS = ('onboard_businesses', 'offboard_businesses')
+
+
+class Timeline:
+    def __init__(self, events: list, window: int = 12):
+        for k, event in enumerate(events):
+            if event.get('action') not in NODE_ACTIONS + BUSINESS_ACTIONS:
+                raise ValueError(f"unknown event action: {event.get('action')}")
+            if 'time' not in event:
+                raise ValueError(f"event {k} ({event['action']}) has no time")
+            event.setdefault('name', f"events.{k}")
+        self.events = sorted(events, key=lambda event: event['time'])  # 稳定排序，同一时间的事件保持文件中的顺序
+        self.window = window  # 统计回源尖峰的时间片数
+        self.next = 0  # 下一个待执行事件的下标
+        self.log = []  # 已执行的事件：时间、时间片、动作、对象和首选节点改变的 URL 比例
+        self.fetches = []  # 每个时间片的回源数
+        self.fetch_total = 0  # 上一个时间片结束时的累计回源数
+
+    @classmethod
+    def load(cls, path: str, window: int = 12):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f)['events'], window)
+
+    def due(self, timestamp: int):
+        """在从 timestamp 开始的时间片内应执行的事件"""
+        events = []
+        while self.next < len(self.events) and self.events[self.next]['time'] < timestamp + 300:
+            events.append(self.events[self.next])
+            self.next += 1
+        return events
+
+    def record(self, event: dict, tick: int, targets: list, remapped_ratio: float):
+        self.log.append({
+            "time": event['time'],
+            "tick": tick,
+            "action": event['action'],
+            "targets": targets,
+            "remapped_ratio": remapped_ratio,
+        })
+
+    def end_tick(self, fetch_total: int):
+        """时间片结束时调用，fetch_total 为累计回源数"""
+        self.fetches.append(fetch_total - self.fetch_total)
+        self.fetch_total = fetch_total
+
+    def spike(self, tick: int):
+        """时间片 tick 前后各 window 个时间片的回源数：之前的平均值、之后的平均值、超出之前平均值的回源数和峰值"""
+        before = self.fetches[max(0, tick - self.window):tick]
+        after = self.fetches[tick:tick + self.window]
+        baseline = float(np.mean(before)) if before else 0.0
+        return {
+            "fetch_before": baseline,
+            "fetch_after": float(np.mean(after)) if after else 0.0,
+            "extra_fetches": float(sum(after) - baseline * len(after)),
+            "peak_fetches": max(after, default=0),
+        }
+
+    def results(self, scale: float = 1.0):
+        """各事件的结果，回源数按 scale 放大（抽样仿真时为 1/sample_rate）"""
+        results = []
+        for record in self.log:
+            spike = self.spike(record["tick"])
+            results.append({**record, **{key: value * scale for key, value in spike.items()}})
+        return results
+
+    def save(self, save_dir: str, scale: float = 1.0):
+        frame = pd.DataFrame(self.results(scale), columns=["time", "tick", "action", "targets", "remapped_ratio", "fetch_before",
+                                                           "fetch_after", "extra_fetches", "peak_fetches"])
+        frame["targets"] = frame["targets"].map(" ".join)
+        frame.to_csv(f"{save_dir}/events.csv", index=False)
+
+    def get_state(self):
+        return {
+            "events": self.events,
+            "window": self.window,
+            "next": self.next,
+            "log": self.log,
+            "fetches": np.array(self.fetches, dtype=np.int64),
+            "fetch_total": self.fetch_total,
+        }
+
+    @classmethod
+    def from_state(cls, state: dict):
+        timeline = cls(state["events"], state["window"])
+        timeline.next = state["next"]
+        timeline.log = state["log"]
+        timeline.fetches = state["fetches"].tolist()
+        timeline.fetch_total = state["fetch_total"]
+        return timeline
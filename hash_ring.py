@@ -1,27 +1,71 @@
-import bisect
+import numpy as np
+
+from placement import PLACEMENTS
 
 
 class HashRing:
-    def __init__(self, nodes: list):
-        self.ring = []  # 按哈希值排序的虚拟节点列表
-        self.node_map = {}  # 哈希值到节点的映射
-        for node in nodes:
-            self.add_node(node)
+    def __init__(self, nodes: list, placement: str = 'ketama'):
+        if placement not in PLACEMENTS:
+            raise ValueError(f"unknown placement: {placement}")
+        self.placement = PLACEMENTS[placement]()  # 放置算法，节点增减时增量更新
+        self.nodes = list(nodes)  # 环上的物理节点
+        self.version = 0  # 环每变化一次加一，供依赖环位置的缓存判断是否失效
+        self.virtual_node_num = 0  # 虚拟节点总数（每 10MB 带宽一个）
+        self.nodes_array = None  # nodes 的数组副本，供批量查找使用
+        self.rebuild()
 
     def add_node(self, node):
-        for virtual_hash, _ in node.virtual_nodes.items():
-            bisect.insort(self.ring, virtual_hash)
-            self.node_map[virtual_hash] = node
+        self.add_nodes([node])
+
+    def add_nodes(self, nodes: list):
+        """一次加入多个节点，环只更新一次，结果与逐个调用 add_node 一致"""
+        if nodes:
+            self.nodes.extend(nodes)
+            self.placement.add(self.nodes, len(nodes))
+            self.virtual_node_num += sum(len(node.virtual_nodes) for node in nodes)
+            self.changed()
 
     def remove_node(self, node):
-        for virtual_hash in node.virtual_nodes.keys():
-            if virtual_hash in self.ring:
-                self.ring.remove(virtual_hash)
-                del self.node_map[virtual_hash]
+        if node in self.nodes:
+            index = self.nodes.index(node)
+            del self.nodes[index]
+            self.placement.remove(self.nodes, index)
+            self.virtual_node_num -= len(node.virtual_nodes)
+            self.changed()
+
+    def rebuild(self):
+        self.placement.build(self.nodes)
+        self.virtual_node_num = sum(len(node.virtual_nodes) for node in self.nodes)
+        self.changed()
+
+    def changed(self):
+        self.nodes_array = np.empty(len(self.nodes), dtype=object)
+        self.nodes_array[:] = self.nodes
+        self.version += 1
+
+    def position(self, hash_value):
+        """哈希值对应的位置（ketama 下为虚拟节点在环上的下标）"""
+        return self.placement.position(hash_value)
+
+    def positions(self, hash_values: np.ndarray):
+        """批量计算哈希值对应的位置，与逐个调用 position 的结果一致"""
+        return self.placement.positions(hash_values)
+
+    def node_at(self, position):
+        return self.nodes[self.placement.owner(position)]
 
     def get_node(self, hash_value):
-        idx = bisect.bisect_left(self.ring, hash_value)
-        if idx == len(self.ring):
-            idx = 0
-        virtual_hash = self.ring[idx]
-        return self.node_map[virtual_hash]
+        return self.node_at(self.position(hash_value))
+
+    def get_nodes(self, hash_values: np.ndarray):
+        """批量查找哈希值对应的节点，与逐个调用 get_node 的结果一致"""
+        return self.nodes_array[self.placement.owners_of(self.positions(hash_values))]
+
+    def available_view(self, excluded: set):
+        """排除 excluded 中的节点后的查找视图"""
+        mask = np.fromiter((node not in excluded for node in self.nodes), dtype=bool, count=len(self.nodes))
+        return self.placement.available_view(mask)
+
+    def next_available(self, view, position, hash_value):
+        """在视图中查找下一个可用位置，没有可用节点时返回 -1"""
+        return self.placement.next_available(view, position, hash_value)
@@ -0,0 +1,121 @@
+"""仿真内部指标：各阶段耗时、调用次数和计数器，按时间片汇总
+
+插桩点只在时间片或批次级别（每个业务、每个节点每个时间片一次），逐请求的量（哈希计算、探测、缓存命中与淘汰）
+由已有的计数器在时间片结束时汇总，不在请求路径上增加开销。关闭时 time 返回共享的空计时器，count 直接返回。
+
+开启后每个时间片一行记录各阶段耗时和计数器增量，可以 dump 为 CSV；prometheus 输出 Prometheus 文本格式，
+由仪表盘进程的 /metrics 接口提供。每个 Simulation 一个 Metrics，传给它的节点、业务和请求处理器；
+单独创建的组件使用始终关闭的 NULL_METRICS。
+"""
+import csv
+from time import perf_counter
+
+
+class Null_Timer:
+    """关闭指标时使用的计时器，什么也不做"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_TIMER = Null_Timer()
+
+
+class Timer:
+    def __init__(self, metrics, name: str):
+        self.metrics = metrics
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        timer = self.metrics.timers.setdefault(self.name, [0, 0.0])
+        timer[0] += 1
+        timer[1] += perf_counter() - self.start
+        return False
+
+
+class Metrics:
+    def __init__(self, prefix: str = 'ecdn'):
+        self.prefix = prefix
+        self.enabled = False
+        self.timers = {}  # 阶段 -> [调用次数, 累计秒数]
+        self.counters = {}  # 计数器 -> 累计值（单调递增）
+        self.gauges = {}  # 当前值
+        self.rows = []  # 每个时间片一行：各阶段耗时和计数器增量
+        self.last = {}  # 上一个时间片结束时的累计值，用于计算增量
+
+    def enable(self, enabled: bool = True):
+        self.enabled = enabled
+
+    def reset(self):
+        self.timers = {}
+        self.counters = {}
+        self.gauges = {}
+        self.rows = []
+        self.last = {}
+
+    def time(self, name: str):
+        """with metrics.time('route'): ... 记录一个阶段的耗时"""
+        return Timer(self, name) if self.enabled else NULL_TIMER
+
+    def count(self, name: str, value: int = 1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def total(self, name: str, value):
+        """由已有的累计计数器设置计数器的值"""
+        if self.enabled:
+            self.counters[name] = value
+
+    def gauge(self, name: str, value):
+        if self.enabled:
+            self.gauges[name] = value
+
+    def end_tick(self, tick: int):
+        """记录本时间片的各阶段耗时（秒）和计数器增量"""
+        if not self.enabled:
+            return
+        row = {"tick": tick}
+        for name, (_, seconds) in self.timers.items():
+            key = f"{name}_seconds"
+            row[key] = seconds - self.last.get(key, 0.0)
+            self.last[key] = seconds
+        for name, value in self.counters.items():
+            row[name] = value - self.last.get(name, 0)
+            self.last[name] = value
+        row.update(self.gauges)
+        self.rows.append(row)
+
+    def prometheus(self):
+        """Prometheus 文本格式"""
+        prefix = self.prefix
+        lines = [f"# TYPE {prefix}_phase_seconds_total counter"]
+        lines += [f'{prefix}_phase_seconds_total{{phase="{name}"}} {seconds:.6f}' for name, (_, seconds) in self.timers.items()]
+        lines.append(f"# TYPE {prefix}_phase_calls_total counter")
+        lines += [f'{prefix}_phase_calls_total{{phase="{name}"}} {calls}' for name, (calls, _) in self.timers.items()]
+        for name, value in self.counters.items():
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {value}")
+        for name, value in self.gauges.items():
+            lines.append(f"# TYPE {prefix}_{name} gauge")
+            lines.append(f"{prefix}_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path: str):
+        """每个时间片一行写入 CSV，返回 path"""
+        columns = list(dict.fromkeys(key for row in self.rows for key in row))
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=columns, restval=0)
+            writer.writeheader()
+            writer.writerows(self.rows)
+        return path
+
+
+NULL_METRICS = Metrics()  # 单独创建的节点、业务和请求处理器默认使用，从不开启
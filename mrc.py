@@ -0,0 +1,165 @@
+"""单遍 LRU 缺失率曲线：记录每个节点实际承接的请求流，用 Mattson 栈算法一次得到所有缓存大小下的缺失率
+
+节点承接哪些请求只取决于带宽和调度，与缓存大小无关，因此一次仿真即可得到各缓存大小下的回源量。
+复用距离（两次访问同一 URL 之间访问过的不同 URL 数）用树状数组计算，容量为 c 的 LRU 缓存
+命中当且仅当复用距离小于 c。可按 URL id 的哈希值抽样，只跟踪部分 URL，距离按 1/sample_rate 放大。
+"""
+import numpy as np
+import pandas as pd
+
+from util.tool import pack, unpack
+
+
+class Reuse_Distance:
+    """单个节点的复用距离直方图，树状数组按访问时间下标标记每个 URL 最近一次访问，下标用尽时压缩"""
+
+    def __init__(self, max_distance: int, sample_rate: float = 1.0):
+        self.max_distance = max_distance  # 超过该距离的访问归入最后一个桶
+        self.sample_rate = sample_rate
+        self.threshold = int(sample_rate * (1 << 32))  # URL id 哈希值低于阈值的访问被跟踪
+        self.size = 1024  # 树状数组容量，即可用的时间下标数
+        self.tree = [0] * (self.size + 1)
+        self.last = {}  # URL id -> 最近一次访问的时间下标（从 1 开始）
+        self.clock = 0  # 已使用的时间下标
+        self.hist = [0] * (max_distance + 1)  # hist[d] 为复用距离为 d 的访问数
+        self.cold = 0  # 首次访问数
+
+    STATE = ('size', 'tree', 'last', 'clock', 'hist', 'cold')
+
+    def get_state(self):
+        return {name: pack(getattr(self, name)) for name in self.STATE}
+
+    def set_state(self, state: dict):
+        for name in self.STATE:
+            setattr(self, name, unpack(getattr(self, name), state[name]))
+
+    def sampled(self, key: int):
+        return self.sample_rate >= 1 or (key * 2654435761) & 0xffffffff < self.threshold
+
+    def access(self, key: int):
+        """记录一次访问"""
+        if not self.sampled(key):
+            return
+        if self.clock == self.size:
+            self.compact()
+        self.clock += 1
+        now = self.clock
+        last = self.last.get(key)
+        if last is None:
+            self.cold += 1
+        else:
+            # 标记在 (last, now) 之间的 URL 即为其间访问过的不同 URL
+            distance = len(self.last) - self.prefix(last)
+            if self.sample_rate < 1:
+                distance = int(distance / self.sample_rate)
+            self.hist[min(distance, self.max_distance)] += 1
+            self.add(last, -1)
+        self.add(now, 1)
+        self.last[key] = now
+
+    def repeat(self, key: int, times: int):
+        """同一时刻再访问 times 次，复用距离均为 0"""
+        if self.sampled(key):
+            self.hist[0] += times
+
+    def prefix(self, i: int):
+        tree = self.tree
+        total = 0
+        while i > 0:
+            total += tree[i]
+            i &= i - 1
+        return total
+
+    def add(self, i: int, delta: int):
+        tree = self.tree
+        size = self.size
+        while i <= size:
+            tree[i] += delta
+            i += i & -i
+
+    def compact(self):
+        """按最近访问顺序重新分配时间下标，容量取存活 URL 数的两倍"""
+        keys = sorted(self.last, key=self.last.get)
+        self.size = max(1024, 2 * len(keys))
+        self.last = {key: i + 1 for i, key in enumerate(keys)}
+        self.clock = len(keys)
+        # 前 clock 个下标全部标记为 1，树状数组第 i 项为 (i - lowbit(i), i] 内的标记数
+        self.tree = [0] + [max(0, min(i, self.clock) - (i - (i & -i))) for i in range(1, self.size + 1)]
+
+    def misses(self, sizes: list):
+        """各缓存大小下的缺失数（按抽样率放大）"""
+        hist = np.asarray(self.hist, dtype=np.float64)
+        beyond = np.concatenate([np.cumsum(hist[::-1])[::-1], [0.0]])  # beyond[c] 为复用距离不小于 c 的访问数
+        sizes = np.minimum(np.asarray(sizes, dtype=np.int64), self.max_distance)
+        return (self.cold + beyond[sizes]) / self.sample_rate
+
+    def accesses(self):
+        return (self.cold + sum(self.hist)) / self.sample_rate
+
+
+class Miss_Ratio_Curves:
+    """记录所有节点的复用距离，按节点和节点类型输出缺失率曲线及对应的回源带宽"""
+
+    def __init__(self, sizes: list = None, sample_rate: float = 1.0):
+        self.sizes = sorted(sizes or [100, 200, 500, 1000, 2000, 5000, 10000, 20000])  # 输出曲线的缓存大小（条目数）
+        self.sample_rate = sample_rate
+        self.trackers = {}  # 节点 -> (节点类型, Reuse_Distance)
+
+    def attach(self, node, node_type: str):
+        """开始记录 node 的请求流，node_type 为节点所属类型的名称"""
+        node.reuse = Reuse_Distance(self.sizes[-1], self.sample_rate)
+        self.trackers[node] = (node_type, node.reuse)
+
+    def detach(self, node):
+        """节点移出集群后不再记录，已记录的复用距离一并丢弃"""
+        self.trackers.pop(node, None)
+        node.reuse = None
+
+    def get_state(self):
+        return [{"hostname": node.hostname, "node_type": node_type, "reuse": reuse.get_state()}
+                for node, (node_type, reuse) in self.trackers.items()]
+
+    def set_state(self, state: list, nodes: list):
+        """按主机名把保存的复用距离恢复到 nodes 中对应的节点上"""
+        by_hostname = {node.hostname: node for node in nodes}
+        self.trackers = {}
+        for tracker in state:
+            node = by_hostname[tracker["hostname"]]
+            self.attach(node, tracker["node_type"])
+            node.reuse.set_state(tracker["reuse"])
+
+    def node_curves(self, ticks: int):
+        """每个节点一行一个缓存大小：缺失率、回源数和平均每个时间片的回源带宽"""
+        rows = []
+        for node, (node_type, reuse) in self.trackers.items():
+            accesses = reuse.accesses()
+            misses = reuse.misses(self.sizes)
+            content_size = node.generate_content_size()
+            for size, miss in zip(self.sizes, misses):
+                rows.append({
+                    "hostname": node.hostname,
+                    "node_type": node_type,
+                    "size": size,
+                    "miss_ratio": miss / accesses if accesses else 0.0,
+                    "fetch_num": miss,
+                    "fetch_bandwidth": miss * content_size / ticks if ticks else 0.0,
+                    "weight": node.sample_weight,
+                    "accesses": accesses,
+                })
+        return pd.DataFrame(rows, columns=["hostname", "node_type", "size", "miss_ratio", "fetch_num", "fetch_bandwidth", "weight", "accesses"])
+
+    def type_curves(self, ticks: int):
+        """按节点类型汇总：缺失率为总缺失数与总访问数之比，回源带宽为该类全部节点之和"""
+        nodes = self.node_curves(ticks)
+        if nodes.empty:
+            return pd.DataFrame(columns=["node_type", "size", "miss_ratio", "fetch_num", "fetch_bandwidth"])
+        # 空间抽样仿真时每个节点代表 weight 个全量节点
+        for column in ("fetch_num", "fetch_bandwidth", "accesses"):
+            nodes[column] = nodes[column] * nodes["weight"]
+        types = nodes.groupby(["node_type", "size"], as_index=False)[["fetch_num", "fetch_bandwidth", "accesses"]].sum()
+        types["miss_ratio"] = (types["fetch_num"] / types["accesses"]).where(types["accesses"] > 0, 0.0)
+        return types[["node_type", "size", "miss_ratio", "fetch_num", "fetch_bandwidth"]]
+
+    def save(self, save_dir: str, ticks: int):
+        self.node_curves(ticks).drop(columns=["weight", "accesses"]).to_csv(f"{save_dir}/mrc_nodes.csv", index=False)
+        self.type_curves(ticks).to_csv(f"{save_dir}/mrc_types.csv", index=False)
@@ -1,26 +1,40 @@
+import hashlib
 from math import ceil
 
 import numpy as np
 
+from cache import make_cache
+from metrics import Metrics, NULL_METRICS
+from timeseries import Series, Time_Series_Store
 from util.entity import Response, Request
-from util.tool import cdn_hash, cal_cost
-import time
-from collections import OrderedDict
+from util.tool import cdn_hash, Cost_Calculator, URL_Interner
 
 
 class Node:
-    def __init__(self, hostname: str, cache: float, bandwidth: float, unit_price: float, cost_method: str):
+    def __init__(self, hostname: str, cache: float, bandwidth: float, unit_price: float, cost_method: str, eviction: str = 'LRU', rng: np.random.Generator = None,
+                 series: Series = None, origin_latency: float = 0, coalescing: bool = True, interner: URL_Interner = None,
+                 metrics: Metrics = None):
         self.hostname = hostname
         self.cache_size = cache
         self.bandwidth = bandwidth
         self.unit_price = unit_price
         self.cost_method = cost_method
+        self.eviction = eviction
         self.virtual_nodes = self.generate_virtual_nodes()
-        self.cache = OrderedDict()  # 使用有序字典模拟缓存，键为资源路径，值为资源大小和时间戳
+        self.cache = make_cache(eviction, cache)  # 以整型 URL id 为键的数组缓存，值为资源大小和模拟时间戳
         self.current_bandwidth = 0
-        self.bandwidths = []
-        self.costs = []
-        self.rng = np.random.default_rng()
+        # 带宽与成本在时间序列存储中的一行，单独创建时使用自己的小存储
+        self.series = series if series is not None else Time_Series_Store(tick_chunk=288, entity_chunk=1).register('nodes', hostname)
+        self.cost_calculator = Cost_Calculator(cost_method, unit_price)  # 增量计费，避免每个时间片重新排序全部历史
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.sample_weight = 1  # 空间抽样仿真时该节点代表的全量节点数
+        self.reuse = None  # 缺失率曲线分析时记录本节点复用距离的 Reuse_Distance
+        self.origin_latency = origin_latency  # 回源耗时（秒），为 0 时回源立即完成
+        self.coalescing = coalescing  # 回源合并：回源完成前到达的同一 URL 的请求等待这次回源，而不是各自回源
+        self.in_flight = {}  # 本时间片内发起的回源：URL id -> 完成时间（秒）
+        self.parent = None  # 父层（Shield_Tier），未命中时先向父层请求，None 表示直接回源
+        self.interner = interner if interner is not None else URL_Interner()  # 按 URL 字符串处理请求时使用，仿真中与请求处理器共用
+        self.metrics = metrics if metrics is not None else NULL_METRICS  # 所属仿真的内部指标
 
     def generate_virtual_nodes(self):
         virtual_nodes = {}
@@ -37,48 +51,125 @@ class Node:
         # if content_size < 0:
         #     content_size = 1
         # return content_size
-        return 32  # 每个请求大小为32MB，需要与business.py->send_request()保持一致
+        return 32  # 请求未给出内容大小时每个请求为32MB，需要与workload.py的默认 size_mean 保持一致
 
-    def fetch_from_origin(self, path: str):
-        """模拟回源获取数据"""
+    def fetch_from_origin(self, url_id: int, timestamp: int, size: int = None, arrival: float = None, key: int = None):
+        """模拟回源获取数据，size 为工作负载给出的对象大小；有父层时以 URL 的哈希值 key 向父层请求"""
         # 模拟从源站获取的内容
-        content_size = self.generate_content_size()  # 使用t分布生成新的内容大小
-        current_time = time.time()  # 获取当前时间戳
-        # 如果缓存已满，先清除最久未使用的项
-        if len(self.cache) >= self.cache_size:
-            self.cache.popitem(last=False)
-        # 将新资源加入缓存
-        self.cache[path] = (content_size, current_time)
+        content_size = size if size is not None else self.generate_content_size()
+        if self.parent is not None:
+            self.parent.fetch(url_id, key, timestamp, content_size, arrival)
+        # 缓存已满时由淘汰策略先清除一项，再将新资源加入缓存
+        self.cache.put(url_id, content_size, timestamp)
         return content_size
 
-    def get_from_cache(self, path: str):
-        """获取缓存中的内容并更新时间戳"""
-        if path in self.cache:
-            # 获取缓存中的数据并更新时间戳
-            content_size, _ = self.cache.pop(path)
-            current_time = time.time()  # 获取当前时间戳
-            self.cache[path] = (content_size, current_time)
-            return content_size
-        return None
+    def get_from_cache(self, url_id: int, timestamp: int):
+        """获取缓存中的内容并更新时间戳，未命中返回 0"""
+        if self.reuse is not None:
+            self.reuse.access(url_id)
+        return self.cache.get(url_id, timestamp)
+
+    def available(self, timestamp: int):
+        """判断节点当前能否承接请求"""
+        if self.current_bandwidth >= self.bandwidth:  # 带宽超限，可设置为最大带宽的百分比
+            return False
+        if self.cost_method == "C" and timestamp % 86400 < 72000:  # 晚高峰节点不承担非晚高峰请求
+            return False
+        return True
+
+    def serve(self, url_id: int, timestamp: int, size: int = None, arrival: float = None, key: int = None):
+        """在本节点处理请求，先查缓存，缓存未命中则回源，返回内容大小、是否回源和是否合并到进行中的回源
+
+        arrival 为请求的到达时间（秒），为 None 时不模拟回源耗时。缓存在回源时即写入，
+        回源完成前到达的同一 URL 的请求开启回源合并时等待这次回源，否则各自回源。
+        key 为 URL 的哈希值（Probe_Cache 条目的首选哈希值），有父层时按它路由；URL id 依赖处理顺序，不能用于路由
+        """
+        content_size = self.get_from_cache(url_id, timestamp)
+        fetch_flag = not content_size
+        coalesced = False
+        if fetch_flag:
+            content_size = self.fetch_from_origin(url_id, timestamp, size, arrival, key)
+            if self.origin_latency and arrival is not None:
+                self.in_flight[url_id] = arrival + self.origin_latency
+        elif self.in_flight and arrival is not None and arrival < self.in_flight.get(url_id, arrival):
+            if self.coalescing:
+                coalesced = True
+            else:
+                fetch_flag = True
+                if self.parent is not None:
+                    self.parent.fetch(url_id, key, timestamp, content_size, arrival)
+        self.current_bandwidth += content_size
+        return content_size, fetch_flag, coalesced
+
+    def serve_flow(self, url_id: int, count: int, timestamp: int, size: int = None, key: int = None):
+        """流量级处理同一 URL 的 count 个请求，按剩余带宽尽可能多地承接
+
+        首个请求查缓存或回源，其余请求均为缓存命中，返回 (承接的请求数, 内容大小, 回源次数, 合并的请求数)。
+        组内请求在时间片内均匀到达，首个请求回源期间到达的请求按 coalescing 合并或各自回源
+        """
+        content_size = self.get_from_cache(url_id, timestamp)
+        fetch_flag = int(not content_size)
+        coalesced = 0
+        if fetch_flag:
+            content_size = self.fetch_from_origin(url_id, timestamp, size, key=key)
+        served = min(count, ceil((self.bandwidth - self.current_bandwidth) / content_size))
+        if fetch_flag and self.origin_latency and served > 1:
+            waiting = min(served - 1, ceil(served * self.origin_latency / 300) - 1)
+            if self.coalescing:
+                coalesced = waiting
+            else:
+                fetch_flag += waiting
+                if self.parent is not None:
+                    for _ in range(waiting):
+                        self.parent.fetch(url_id, key, timestamp, content_size)
+        self.cache.touch(url_id, timestamp, served - 1)
+        if self.reuse is not None and served > 1:
+            self.reuse.repeat(url_id, served - 1)
+        self.current_bandwidth += served * content_size
+        return served, content_size, fetch_flag, coalesced
 
     def handle_request_node(self, request: Request):
         """处理请求，先查缓存，缓存未命中则回源"""
-        if self.current_bandwidth >= self.bandwidth:  # 带宽超限，可设置为最大带宽的百分比
+        if not self.available(request.timestamp):
             return Response(handle_flag=False)
-        if self.cost_method == "C" and request.timestamp % 86400 < 72000:  # 晚高峰节点不承担非晚高峰请求
-            return Response(handle_flag=False)
-        content_size = self.get_from_cache(request.url)
-        if content_size:
-            response = Response(fetch_flag=False, content_size=content_size, handle_flag=True)
-        else:
-            response = Response(fetch_flag=True, content_size=self.fetch_from_origin(request.url), handle_flag=True)
-        self.current_bandwidth += response.content_size
-        return response
+        key = cdn_hash(hashlib.md5(request.url.encode("utf-8")).hexdigest())  # 与 Probe_Cache 条目的首选哈希值相同
+        content_size, fetch_flag, _ = self.serve(self.interner.intern(request.url), request.timestamp, key=key)
+        return Response(fetch_flag=fetch_flag, content_size=content_size, handle_flag=True)
 
     def record(self):
-        self.bandwidths.append(self.current_bandwidth)
+        self.series.append(bandwidth=self.current_bandwidth)
         self.current_bandwidth = 0
-        self.costs.append(self.get_cost())
+        self.in_flight.clear()
+        self.series.set('cost', self.get_cost())
+
+    def clear_cache(self):
+        """节点故障：缓存内容和进行中的回源全部丢失"""
+        self.cache = make_cache(self.eviction, self.cache_size)
+        self.in_flight.clear()
+
+    def get_state(self):
+        """快照：构造参数以外的可变状态"""
+        return {
+            "current_bandwidth": self.current_bandwidth,
+            "sample_weight": self.sample_weight,
+            "cache": self.cache.get_state(),
+            "cost_calculator": self.cost_calculator.get_state(),
+        }
+
+    def set_state(self, state: dict):
+        self.current_bandwidth = state["current_bandwidth"]
+        self.sample_weight = state["sample_weight"]
+        self.cache.set_state(state["cache"])
+        self.cost_calculator.set_state(state["cost_calculator"])
+
+    @property
+    def bandwidths(self):
+        return self.series.view('bandwidth')
+
+    @property
+    def costs(self):
+        return self.series.view('cost')
 
     def get_cost(self):
-        return cal_cost(self.bandwidths, self.cost_method, self.unit_price)
+        with self.metrics.time('cost'):
+            return self.cost_calculator.update(self.bandwidths, self.series.offset)
@@ -0,0 +1,305 @@
+import bisect
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+from util.tool import cdn_hash
+
+
+def mix64(x: np.ndarray):
+    """splitmix64 混合函数，输入输出均为 uint64 数组"""
+    x = x ^ (x >> np.uint64(30))
+    x = x * np.uint64(0xbf58476d1ce4e5b9)
+    x = x ^ (x >> np.uint64(27))
+    x = x * np.uint64(0x94d049bb133111eb)
+    return x ^ (x >> np.uint64(31))
+
+
+def node_weight(node):
+    """节点权重，与虚拟节点数一致（每 10MB 带宽一个）"""
+    return len(node.virtual_nodes)
+
+
+class Placement(ABC):
+    """放置算法基类：把哈希值映射为位置，再由位置得到节点下标
+
+    节点增减时调用 add / remove 增量更新，不支持增量更新的算法整体重建
+    """
+
+    @abstractmethod
+    def build(self, nodes: list):
+        """按节点列表整体构建"""
+
+    def add(self, nodes: list, count: int = 1):
+        """nodes 末尾加入了 count 个节点"""
+        self.build(nodes)
+
+    def remove(self, nodes: list, index: int):
+        """nodes 中原下标为 index 的节点已被移除，其后的节点下标减一"""
+        self.build(nodes)
+
+    @abstractmethod
+    def position(self, hash_value: int):
+        """哈希值对应的位置"""
+
+    @abstractmethod
+    def positions(self, hash_values: np.ndarray):
+        """批量计算哈希值对应的位置"""
+
+    @abstractmethod
+    def owner(self, position: int):
+        """位置对应的节点在 nodes 中的下标"""
+
+    @abstractmethod
+    def owners_of(self, positions: np.ndarray):
+        """批量计算位置对应的节点下标"""
+
+    @abstractmethod
+    def available_view(self, mask: np.ndarray):
+        """根据节点可用掩码构建跳过不可用节点的查找视图"""
+
+    @abstractmethod
+    def next_available(self, view, position: int, hash_value: int):
+        """在视图中查找 position（对应哈希值 hash_value）之后第一个可用位置，没有可用节点时返回 -1"""
+
+
+class Table_Placement(Placement):
+    """基于位置表的放置算法，owners[i] 为第 i 个位置所属节点的下标，跳过不可用节点时沿表顺序向后查找"""
+
+    def __init__(self):
+        self.owners = np.empty(0, dtype=np.int64)
+        self.owner_list = []  # owners 的列表副本，标量下标访问比数组快
+
+    def owner(self, position: int):
+        return self.owner_list[position]
+
+    def owners_of(self, positions: np.ndarray):
+        return self.owners[positions]
+
+    def available_view(self, mask: np.ndarray):
+        return np.flatnonzero(mask[self.owners])
+
+    def next_available(self, view, position: int, hash_value: int):
+        if len(view) == 0:
+            return -1
+        idx = int(np.searchsorted(view, position))
+        if idx == len(view):
+            idx = 0
+        return int(view[idx])
+
+
+class Ketama_Placement(Table_Placement):
+    """一致性哈希环：顺时针查找第一个虚拟节点
+
+    增量更新只插入或删除变化节点的虚拟节点，结果与按新的节点列表整体重建一致
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.ring = []  # 按哈希值排序的虚拟节点列表
+        self.ring_array = np.empty(0, dtype=np.int64)
+        self.sources = np.empty(0, dtype=np.int64)  # 各环位置的虚拟节点所属节点的下标（处理哈希冲突前）
+
+    def build(self, nodes: list):
+        hashes = []
+        owners = []
+        for i, node in enumerate(nodes):
+            hashes.extend(node.virtual_nodes.keys())
+            owners.extend([i] * len(node.virtual_nodes))
+        hashes = np.array(hashes, dtype=np.int64)
+        owners = np.array(owners, dtype=np.int64)
+        order = np.argsort(hashes, kind='stable')
+        self.ring_array = hashes[order]
+        self.sources = owners[order]
+        self.owners = self.sources.copy()
+        # 哈希冲突时保留重复的环位置，但都归属最后加入的节点，与逐个插入时的哈希值到节点映射一致
+        for i in np.flatnonzero(self.ring_array[:-1] == self.ring_array[1:])[::-1]:
+            self.owners[i] = self.owners[i + 1]
+        self.ring = self.ring_array.tolist()
+        self.owner_list = self.owners.tolist()
+
+    def add(self, nodes: list, count: int = 1):
+        first = len(nodes) - count
+        hashes = np.concatenate([np.fromiter(node.virtual_nodes, dtype=np.int64) for node in nodes[first:]])
+        sources = np.repeat(np.arange(first, len(nodes)), [len(node.virtual_nodes) for node in nodes[first:]])
+        order = np.argsort(hashes, kind='stable')
+        hashes, sources = hashes[order], sources[order]
+        # 新节点下标最大，插在相同哈希值之后，与稳定排序的结果一致
+        at = np.searchsorted(self.ring_array, hashes, side='right')
+        inserted = at + np.arange(len(hashes))  # 新虚拟节点在新环上的位置
+        kept = np.ones(len(self.ring_array) + len(hashes), dtype=bool)
+        kept[inserted] = False
+        ring_array = np.empty(len(kept), dtype=np.int64)
+        ring_array[inserted] = hashes
+        ring_array[kept] = self.ring_array
+        new_sources = np.empty(len(kept), dtype=np.int64)
+        new_sources[inserted] = sources
+        new_sources[kept] = self.sources
+        owners = new_sources.copy()
+        owners[kept] = self.owners
+        # 按插入点拼接原列表的各段，不重建整个环的列表
+        old_ring, old_owners = self.ring, self.owner_list
+        ring, owner_list, prev = [], [], 0
+        for position, hash_value, source in zip(at.tolist(), hashes.tolist(), sources.tolist()):
+            ring += old_ring[prev:position]
+            ring.append(hash_value)
+            owner_list += old_owners[prev:position]
+            owner_list.append(source)
+            prev = position
+        ring += old_ring[prev:]
+        owner_list += old_owners[prev:]
+        # 只有新哈希值所在的冲突组需要处理：整组归属组内最后加入的节点
+        start = np.searchsorted(ring_array, hashes, side='left')
+        end = np.searchsorted(ring_array, hashes, side='right')
+        for i in np.flatnonzero(end - start > 1).tolist():
+            owner = int(new_sources[end[i] - 1])
+            owners[start[i]:end[i]] = owner
+            owner_list[start[i]:end[i]] = [owner] * int(end[i] - start[i])
+        self.ring_array, self.sources, self.owners = ring_array, new_sources, owners
+        self.ring, self.owner_list = ring, owner_list
+
+    def remove(self, nodes: list, index: int):
+        kept = self.sources != index
+        removed = self.ring_array[~kept]
+        self.ring_array = self.ring_array[kept]
+        self.sources = self.sources[kept]
+        self.owners = self.owners[kept]
+        self.sources[self.sources > index] -= 1
+        self.owners[self.owners > index] -= 1
+        # 曾与被移除节点冲突的环位置改归冲突组中下标最大（排在最后）的节点
+        collided = np.flatnonzero(np.isin(self.ring_array, removed))
+        if len(collided):
+            last = np.searchsorted(self.ring_array, self.ring_array[collided], side='right') - 1
+            self.owners[collided] = self.sources[last]
+        self.ring = self.ring_array.tolist()
+        self.owner_list = self.owners.tolist()
+
+    def position(self, hash_value: int):
+        idx = bisect.bisect_left(self.ring, hash_value)
+        if idx == len(self.ring):
+            idx = 0
+        return idx
+
+    def positions(self, hash_values: np.ndarray):
+        idx = np.searchsorted(self.ring_array, hash_values, side='left')
+        idx[idx == len(self.ring_array)] = 0
+        return idx
+
+
+class Maglev_Placement(Table_Placement):
+    """Maglev 查找表：每个节点按自己的排列轮流占位，占位速度与权重成正比"""
+
+    def __init__(self, table_size: int = 65537):
+        super().__init__()
+        self.min_table_size = table_size  # 查找表最小长度，实际取不小于 100 倍节点数的素数
+
+    @staticmethod
+    def next_prime(n: int):
+        def is_prime(k):
+            if k < 2:
+                return False
+            i = 2
+            while i * i <= k:
+                if k % i == 0:
+                    return False
+                i += 1
+            return True
+
+        while not is_prime(n):
+            n += 1
+        return n
+
+    def build(self, nodes: list):
+        size = self.next_prime(max(self.min_table_size, 100 * len(nodes)))
+        self.table_size = size
+        table = [-1] * size
+        if nodes:
+            offsets = [cdn_hash(f"{node.hostname}-offset") % size for node in nodes]
+            skips = [cdn_hash(f"{node.hostname}-skip") % (size - 1) + 1 for node in nodes]
+            weights = [node_weight(node) for node in nodes]
+            max_weight = max(weights)
+            cursor = [0] * len(nodes)
+            credit = [0.0] * len(nodes)
+            filled = 0
+            while filled < size:
+                for i in range(len(nodes)):
+                    credit[i] += weights[i] / max_weight
+                    while credit[i] >= 1 and filled < size:
+                        credit[i] -= 1
+                        # 沿节点 i 的排列找到下一个空位
+                        slot = (offsets[i] + cursor[i] * skips[i]) % size
+                        while table[slot] >= 0:
+                            cursor[i] += 1
+                            slot = (offsets[i] + cursor[i] * skips[i]) % size
+                        table[slot] = i
+                        cursor[i] += 1
+                        filled += 1
+        self.owners = np.array(table, dtype=np.int64)
+        self.owner_list = table
+
+    def position(self, hash_value: int):
+        return hash_value % self.table_size
+
+    def positions(self, hash_values: np.ndarray):
+        return np.asarray(hash_values, dtype=np.int64) % self.table_size
+
+
+class Rendezvous_Placement(Placement):
+    """加权最高随机权重（HRW）哈希：位置即得分最高的节点下标"""
+
+    def __init__(self, chunk: int = 4096):
+        self.chunk = chunk  # 批量查找时每批的键数，限制得分矩阵的内存
+        self.seeds = np.empty(0, dtype=np.uint64)
+        self.weights = np.empty(0, dtype=np.float64)
+
+    def build(self, nodes: list):
+        self.seeds = mix64(np.array([cdn_hash(node.hostname) for node in nodes], dtype=np.uint64))
+        self.weights = np.array([node_weight(node) for node in nodes], dtype=np.float64)
+
+    def add(self, nodes: list, count: int = 1):
+        added = nodes[len(nodes) - count:]
+        self.seeds = np.append(self.seeds, mix64(np.array([cdn_hash(node.hostname) for node in added], dtype=np.uint64)))
+        self.weights = np.append(self.weights, np.array([node_weight(node) for node in added], dtype=np.float64))
+
+    def remove(self, nodes: list, index: int):
+        self.seeds = np.delete(self.seeds, index)
+        self.weights = np.delete(self.weights, index)
+
+    def scores(self, hash_values: np.ndarray):
+        keys = mix64(np.asarray(hash_values, dtype=np.uint64))
+        mixed = mix64(keys[:, None] ^ self.seeds[None, :])
+        uniform = ((mixed >> np.uint64(11)).astype(np.float64) + 0.5) * (1.0 / (1 << 53))
+        return self.weights[None, :] / -np.log(uniform)
+
+    def position(self, hash_value: int):
+        return int(np.argmax(self.scores(np.array([hash_value]))[0]))
+
+    def positions(self, hash_values: np.ndarray):
+        hash_values = np.asarray(hash_values)
+        result = np.empty(len(hash_values), dtype=np.int64)
+        for start in range(0, len(hash_values), self.chunk):
+            result[start:start + self.chunk] = np.argmax(self.scores(hash_values[start:start + self.chunk]), axis=1)
+        return result
+
+    def owner(self, position: int):
+        return position
+
+    def owners_of(self, positions: np.ndarray):
+        return positions
+
+    def available_view(self, mask: np.ndarray):
+        return mask.copy()
+
+    def next_available(self, view, position: int, hash_value: int):
+        if not view.any():
+            return -1
+        scores = self.scores(np.array([hash_value]))[0]
+        scores[~view] = -np.inf
+        return int(np.argmax(scores))
+
+
+PLACEMENTS = {
+    'ketama': Ketama_Placement,
+    'maglev': Maglev_Placement,
+    'rendezvous': Rendezvous_Placement,
+}
@@ -1,37 +1,389 @@
 import hashlib
 
+import numpy as np
+
 from hash_ring import HashRing
+from metrics import Metrics, NULL_METRICS
 from util.entity import Response, Request
-from util.tool import cdn_hash
+from util.tool import cdn_hash, URL_Interner
+from workload import Workload
+
+
+class Probe_Cache:
+    """URL 指纹与探测序列缓存：按 URL 缓存 fid、首选环位置以及按需扩展的兜底环位置"""
+
+    def __init__(self, hash_ring: HashRing, capacity: int = 100000, max_probes: int = 256, interner: URL_Interner = None):
+        self.hash_ring = hash_ring
+        self.interner = interner if interner is not None else URL_Interner()  # URL -> 整型 id，与节点共用
+        self.capacity = capacity  # 最多缓存的 URL 数，超出后淘汰最早加入的条目
+        self.max_probes = max_probes  # 每个 URL 最多缓存的探测位置数，更长的探测序列现算
+        self.entries = {}  # URL -> [fid, 环位置列表, 首选哈希值, URL id]，环位置列表第 i 项对应第 i 次探测
+        self.ring_version = hash_ring.version
+        self.hits = 0  # 命中缓存、省去一次哈希计算的次数
+        self.misses = 0  # 需要计算哈希的次数
+
+    def get_state(self):
+        """快照：命中统计和缓存条目（按加入顺序，fid 由 URL 重新计算），恢复后的命中和淘汰与不中断时相同"""
+        entries = list(self.entries.values())
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "ring_version": self.ring_version,
+            "urls": np.array(list(self.entries), dtype=str),
+            "hashes": np.array([entry[2] for entry in entries], dtype=np.int64),
+            "ids": np.array([entry[3] for entry in entries], dtype=np.int64),
+            "probe_nums": np.array([len(entry[1]) for entry in entries], dtype=np.int64),
+            "positions": np.array([position for entry in entries for position in entry[1]], dtype=np.int64),
+        }
+
+    def set_state(self, state: dict):
+        self.hits = state["hits"]
+        self.misses = state["misses"]
+        self.ring_version = state["ring_version"]
+        positions = state["positions"].tolist()
+        ends = np.cumsum(state["probe_nums"]).tolist()
+        self.entries = {}
+        for url, hash_value, url_id, start, end in zip(state["urls"].tolist(), state["hashes"].tolist(), state["ids"].tolist(),
+                                                       [0] + ends[:-1], ends):
+            fid = hashlib.md5(url.encode("utf-8")).hexdigest()
+            self.entries[url] = [fid, positions[start:end], hash_value, url_id]
+
+    def check_ring(self):
+        """哈希环发生变化后，缓存的环位置全部失效"""
+        if self.ring_version != self.hash_ring.version:
+            self.entries.clear()
+            self.ring_version = self.hash_ring.version
+
+    def insert(self, url: str, entry: list):
+        if len(self.entries) >= self.capacity:
+            del self.entries[next(iter(self.entries))]
+        self.entries[url] = entry
+
+    def get(self, url: str):
+        """返回 URL 的缓存条目 [fid, 环位置列表, 首选哈希值, URL id]"""
+        entry = self.entries.get(url)
+        if entry is not None:
+            self.hits += 1
+            return entry
+        self.misses += 1
+        fid = hashlib.md5(f"{url}".encode("utf-8")).hexdigest()
+        hash_value = cdn_hash(fid)
+        entry = [fid, [self.hash_ring.position(hash_value)], hash_value, self.interner.intern(url)]
+        self.insert(url, entry)
+        return entry
+
+    def get_many(self, urls: list):
+        """批量返回互不相同的 URL 的缓存条目，未缓存的 URL 批量计算环位置"""
+        entries = [self.entries.get(url) for url in urls]
+        missing = [i for i, entry in enumerate(entries) if entry is None]
+        self.hits += len(urls) - len(missing)
+        self.misses += len(missing)
+        if missing:
+            fids = [hashlib.md5(urls[i].encode("utf-8")).hexdigest() for i in missing]
+            hashes = np.fromiter((cdn_hash(fid) for fid in fids), dtype=np.int64, count=len(fids))
+            positions = self.hash_ring.positions(hashes).tolist()
+            for i, fid, position, hash_value in zip(missing, fids, positions, hashes.tolist()):
+                entries[i] = [fid, [position], hash_value, self.interner.intern(urls[i])]
+                self.insert(urls[i], entries[i])
+        return entries
+
+    def probe(self, entry: list, i: int):
+        """返回第 i 次探测（fid+i）的环位置"""
+        positions = entry[1]
+        if i < len(positions):
+            self.hits += 1
+            return positions[i]
+        self.misses += 1
+        position = self.hash_ring.position(cdn_hash(f"{entry[0]}{i}"))
+        if i == len(positions) and i < self.max_probes:
+            positions.append(position)
+        return position
+
+    def discard(self, url: str):
+        """URL 下线后删除其缓存条目"""
+        self.entries.pop(url, None)
+
+    def hashes(self, urls: list):
+        """各 URL 的首选哈希值，已缓存的直接取用，不改变缓存内容和命中统计"""
+        values = []
+        for url in urls:
+            entry = self.entries.get(url)
+            values.append(entry[2] if entry is not None else cdn_hash(hashlib.md5(url.encode("utf-8")).hexdigest()))
+        return np.array(values, dtype=np.int64)
 
 
 class RequestHandler:
-    def __init__(self, hash_ring: HashRing):
+    def __init__(self, hash_ring: HashRing, fallback: str = "probe", interner: URL_Interner = None, metrics: Metrics = None):
+        if fallback not in ("probe", "skip"):
+            raise ValueError(f"unknown fallback mode: {fallback}")
         self.hash_ring = hash_ring
-        self.fetch_from_origin_num = 0  # 回源量
+        self.fallback_mode = fallback  # probe: 依次尝试 fid+i（原有行为）；skip: 跳过本时间片已不可用的节点
+        self.interner = interner if interner is not None else URL_Interner()
+        self.metrics = metrics if metrics is not None else NULL_METRICS  # 所属仿真的内部指标
+        self.probe_cache = Probe_Cache(hash_ring, interner=self.interner)
+        self.watched = set()  # 已注册 URL 下线通知的 Workload
+        self.fetch_from_origin_num = 0  # 回源量（实际发往源站的请求数）
+        self.coalesced_num = 0  # 合并到进行中的回源、未单独回源的请求数
+        self.origin_traffic = 0  # 实际回源流量（MB）
+        self.coalesced_traffic = 0  # 回源合并节省的回源流量（MB）
         self.request_num = 0  # 请求量
+        self.tick = None  # 当前时间片
+        self.unavailable = set()  # 当前时间片内已满载或不参与调度的节点
+        self.available_view = None  # 可用虚拟节点的环下标，unavailable 变化时置空
+        self.probe_hist = {}  # 当前时间片的探测次数分布，键为承接请求前尝试的节点数
+        self.dropped_num = 0  # 当前时间片内无节点承接的请求数
+        self.probe_histograms = []  # 每个时间片的探测次数分布
+        self.dropped_nums = []  # 每个时间片被丢弃的请求数
+        self.group_requests = None  # 抽样仿真时按首选哈希值分组的请求数，用于估计方差
+        self.group_fetches = None  # 同上，分组的回源数
+
+    def get_state(self):
+        """快照：计数器、各时间片的统计和探测缓存"""
+        hist_ticks = [tick for tick, hist in enumerate(self.probe_histograms) for _ in hist]
+        return {
+            "request_num": self.request_num,
+            "fetch_from_origin_num": self.fetch_from_origin_num,
+            "coalesced_num": self.coalesced_num,
+            "origin_traffic": self.origin_traffic,
+            "coalesced_traffic": self.coalesced_traffic,
+            "dropped_nums": np.array(self.dropped_nums, dtype=np.int64),
+            "probe_ticks": np.array(hist_ticks, dtype=np.int64),
+            "probe_lens": np.array([probe_len for hist in self.probe_histograms for probe_len in hist], dtype=np.int64),
+            "probe_counts": np.array([num for hist in self.probe_histograms for num in hist.values()], dtype=np.int64),
+            "group_requests": self.group_requests,
+            "group_fetches": self.group_fetches,
+            "probe_cache": self.probe_cache.get_state(),
+        }
+
+    def set_state(self, state: dict):
+        self.request_num = state["request_num"]
+        self.fetch_from_origin_num = state["fetch_from_origin_num"]
+        self.coalesced_num = state["coalesced_num"]
+        self.origin_traffic = state["origin_traffic"]
+        self.coalesced_traffic = state["coalesced_traffic"]
+        self.dropped_nums = state["dropped_nums"].tolist()
+        self.probe_histograms = [{} for _ in self.dropped_nums]
+        for tick, probe_len, num in zip(state["probe_ticks"].tolist(), state["probe_lens"].tolist(), state["probe_counts"].tolist()):
+            self.probe_histograms[tick][probe_len] = num
+        self.group_requests = state["group_requests"]
+        self.group_fetches = state["group_fetches"]
+        if "probe_cache" in state:
+            self.probe_cache.set_state(state["probe_cache"])
+
+    def watch(self, workload: Workload):
+        """Workload 淘汰 URL 时同步删除探测缓存和 id 映射"""
+        if id(workload) not in self.watched:
+            self.watched.add(id(workload))
+            workload.retire_listeners.append(self.retire)
+
+    def unwatch(self, workload: Workload):
+        """业务下线：取消 URL 下线通知并删除其全部 URL 的探测缓存和 id 映射"""
+        if id(workload) in self.watched:
+            self.watched.discard(id(workload))
+            workload.retire_listeners.remove(self.retire)
+        for url in workload.urls(np.arange(workload.url_num)):
+            self.retire(url)
+
+    def retire(self, url: str):
+        self.probe_cache.discard(url)
+        self.interner.release(url)
+
+    def start_tick(self, timestamp: int):
+        """进入新的时间片，节点带宽已清零，重置不可用节点集合"""
+        if timestamp != self.tick:
+            self.tick = timestamp
+            self.unavailable = set()
+            self.available_view = None
+
+    def record(self):
+        """记录本时间片的探测次数分布和丢弃请求数"""
+        self.probe_histograms.append(self.probe_hist)
+        self.dropped_nums.append(self.dropped_num)
+        self.probe_hist = {}
+        self.dropped_num = 0
+
+    def count_probe(self, probe_len: int, num: int = 1):
+        self.probe_hist[probe_len] = self.probe_hist.get(probe_len, 0) + num
+
+    def enable_groups(self, group_num: int):
+        """按首选哈希值把 URL 随机分为 group_num 组，分别统计承接的请求数和回源数"""
+        self.group_requests = [0] * group_num
+        self.group_fetches = [0] * group_num
+
+    def count_group(self, entry: list, num: int, fetch_flag: int):
+        group = entry[2] % len(self.group_requests)
+        self.group_requests[group] += num
+        self.group_fetches[group] += fetch_flag
 
     def handle_request(self, request: Request):
         """处理用户请求，分发到合适的节点"""
-        fid = hashlib.md5(f"{request.url}".encode("utf-8")).hexdigest()
-
-        # 首先尝试i=0的情况
-        node = self.hash_ring.get_node(cdn_hash(fid))
-        response = node.handle_request_node(request)
-        if response.handle_flag:
-            self.request_num += 1
-            self.fetch_from_origin_num += response.fetch_flag
-            return response
-
-        # 处理i>=1的情况
-        ring_length = len(self.hash_ring.ring)
-        for i in range(1, ring_length):
-            current_key = f"{fid}{i}"
-            node = self.hash_ring.get_node(cdn_hash(current_key))
-            response = node.handle_request_node(request)
-            if response.handle_flag:
-                self.request_num += 1
-                self.fetch_from_origin_num += response.fetch_flag
-                return response
-
-        return Response(handle_flag=False)
+        self.probe_cache.check_ring()
+        self.start_tick(request.timestamp)
+        entry = self.probe_cache.get(request.url)
+
+        # 首先尝试i=0的情况，首选节点无法承接时处理i>=1的情况
+        node = self.hash_ring.node_at(entry[1][0])
+        if node.available(request.timestamp):
+            content_size, fetch_flag = self.serve(node, entry, request.timestamp, 1)
+        else:
+            result = self.fallback(entry, node, request.timestamp)
+            if result is None:
+                return Response(handle_flag=False)
+            content_size, fetch_flag = result
+        if self.group_requests is not None:
+            self.count_group(entry, 1, fetch_flag)
+        return Response(fetch_flag=fetch_flag, content_size=content_size, handle_flag=True)
+
+    def fallback(self, entry: list, node, timestamp: int, size: int = None, arrival: float = None):
+        """首选节点 node 无法承接时寻找其他节点，返回内容大小和是否回源，全部失败返回 None"""
+        node, probe_len = self.next_node(entry, node, timestamp, 1)
+        if node is None:
+            self.count_probe(probe_len)
+            self.dropped_num += 1
+            return None
+        return self.serve(node, entry, timestamp, probe_len, size, arrival)
+
+    def next_node(self, entry: list, node, timestamp: int, probe_len: int):
+        """node 无法承接时查找下一个可承接的节点，probe_len 为已尝试的节点数
+
+        返回 (节点, 尝试过的节点数)，没有可承接的节点时节点为 None
+        """
+        if self.fallback_mode == "skip":
+            return self.skip_next(entry, node, timestamp, probe_len)
+        return self.probe_next(entry, timestamp, probe_len)
+
+    def probe_next(self, entry: list, timestamp: int, probe_len: int):
+        """依次尝试 fid+i 对应的节点，最坏情况下探测次数与环长度相同"""
+        ring_length = self.hash_ring.virtual_node_num
+        for i in range(probe_len, ring_length):
+            node = self.hash_ring.node_at(self.probe_cache.probe(entry, i))
+            if node.available(timestamp):
+                return node, i + 1
+        return None, ring_length
+
+    def skip_next(self, entry: list, node, timestamp: int, probe_len: int):
+        """排除本时间片不可用的节点后，由放置算法查找下一个节点，探测次数不超过节点数"""
+        self.mark_unavailable(node)
+        while True:
+            if self.available_view is None:
+                self.available_view = self.hash_ring.available_view(self.unavailable)
+            position = self.hash_ring.next_available(self.available_view, entry[1][0], entry[2])
+            if position < 0:
+                return None, probe_len
+            node = self.hash_ring.node_at(position)
+            probe_len += 1
+            if node.available(timestamp):
+                return node, probe_len
+            self.mark_unavailable(node)
+
+    def mark_unavailable(self, node):
+        if node not in self.unavailable:
+            self.unavailable.add(node)
+            self.available_view = None
+
+    def serve(self, node, entry: list, timestamp: int, probe_len: int, size: int = None, arrival: float = None):
+        content_size, fetch_flag, coalesced = node.serve(entry[3], timestamp, size, arrival, entry[2])
+        self.request_num += 1
+        self.fetch_from_origin_num += fetch_flag
+        self.count_probe(probe_len)
+        self.count_origin(content_size, fetch_flag, coalesced)
+        return content_size, fetch_flag
+
+    def count_origin(self, content_size: int, fetch_num: int, coalesced_num: int):
+        """累计回源流量和回源合并节省的流量"""
+        self.origin_traffic += fetch_num * content_size
+        if coalesced_num:
+            self.coalesced_num += coalesced_num
+            self.coalesced_traffic += coalesced_num * content_size
+
+    def handle_batch(self, urls: list, timestamp: int, order: list = None, sizes: list = None):
+        """批量处理同一时间片内的请求，返回总带宽和回源数，结果与按顺序逐个调用 handle_request 一致
+
+        order 为 None 时 urls 为按到达顺序的请求；否则 urls 互不相同，order 为各请求在 urls 中的下标。
+        sizes 为 urls 中各 URL 的内容大小，None 时由节点决定
+        """
+        # 每个不同的 URL 只取一次缓存条目，未缓存的批量计算指纹和首选环位置
+        self.probe_cache.check_ring()
+        self.start_tick(timestamp)
+        if order is None:
+            positions = {}
+            order = [positions.setdefault(url, len(positions)) for url in urls]
+            urls = list(positions)
+        if sizes is None:
+            sizes = [None] * len(urls)
+        with self.metrics.time('hash'):
+            entries = self.probe_cache.get_many(urls)
+        with self.metrics.time('lookup'):
+            targets = [(entry, self.hash_ring.node_at(entry[1][0]), size) for entry, size in zip(entries, sizes)]
+
+        # 节点带宽与缓存状态依赖请求顺序，因此按原顺序逐个落到节点上
+        bandwidth = 0
+        fetch_num = 0
+        direct_request_num = 0  # 首选节点直接承接的请求数，兜底路径的请求由 fallback 计数
+        direct_fetch_num = 0
+        direct_origin_traffic = 0
+        grouped = self.group_requests is not None
+        spacing = 300 / len(order) if order else 0  # 请求在时间片内均匀到达，用于模拟回源耗时
+        with self.metrics.time('serve'):
+            for k, i in enumerate(order):
+                entry, node, size = targets[i]
+                if node.available(timestamp):
+                    content_size, fetch_flag, coalesced = node.serve(entry[3], timestamp, size, timestamp + k * spacing, entry[2])
+                    direct_request_num += 1
+                    if fetch_flag:
+                        direct_fetch_num += 1
+                        direct_origin_traffic += content_size
+                    elif coalesced:
+                        self.count_origin(content_size, 0, 1)
+                else:
+                    result = self.fallback(entry, node, timestamp, size, timestamp + k * spacing)
+                    if result is None:
+                        continue
+                    content_size, fetch_flag = result
+                bandwidth += content_size
+                fetch_num += fetch_flag
+                if grouped:
+                    self.count_group(entry, 1, fetch_flag)
+        self.request_num += direct_request_num
+        self.fetch_from_origin_num += direct_fetch_num
+        self.origin_traffic += direct_origin_traffic
+        self.count_probe(1, direct_request_num)
+        return bandwidth, fetch_num
+
+    def handle_flow(self, urls: list, counts: list, timestamp: int, sizes: list = None):
+        """流量级处理：每个 URL 在本时间片内的 count 个请求作为一组路由一次，返回总带宽和回源数
+
+        节点按剩余带宽承接组内尽可能多的请求，其余请求整体转给下一个节点；sizes 为各 URL 的内容大小，None 时由节点决定
+        """
+        self.probe_cache.check_ring()
+        self.start_tick(timestamp)
+        if sizes is None:
+            sizes = [None] * len(urls)
+        with self.metrics.time('hash'):
+            entries = self.probe_cache.get_many(urls)
+        bandwidth = 0
+        fetch_num = 0
+        with self.metrics.time('serve'):
+            for entry, count, size in zip(entries, counts, sizes):
+                node = self.hash_ring.node_at(entry[1][0])
+                probe_len = 1
+                while True:
+                    if node.available(timestamp):
+                        served, content_size, fetch_flag, coalesced = node.serve_flow(entry[3], count, timestamp, size, entry[2])
+                        self.request_num += served
+                        self.fetch_from_origin_num += fetch_flag
+                        self.count_probe(probe_len, served)
+                        self.count_origin(content_size, fetch_flag, coalesced)
+                        if self.group_requests is not None:
+                            self.count_group(entry, served, fetch_flag)
+                        bandwidth += served * content_size
+                        fetch_num += fetch_flag
+                        count -= served
+                        if count == 0:
+                            break
+                    node, probe_len = self.next_node(entry, node, timestamp, probe_len)
+                    if node is None:
+                        self.count_probe(probe_len, count)
+                        self.dropped_num += count
+                        break
+        return bandwidth, fetch_num
@@ -0,0 +1,172 @@
+"""流式结果写入与读取：仿真过程中每 chunk_ticks 个时间片把时间序列存储追加写入结果目录
+
+结果目录结构::
+
+    results/<时间>/
+        manifest.json          实体列表（类别、名称、起始时间片）、字段和已完成的块
+        chunk_00000.npz        第一块：每个字段一个 实体 × 时间片 的压缩数组
+        chunk_00001.npz
+        ...
+
+每块和 manifest 都先写临时文件再原子替换，中断的仿真也能读出已完成的部分。
+用法: python results.py results/<时间> --csv 把结果导出为原来每个节点、业务一个 CSV 的格式
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+FORMATS = ('npz',)
+
+
+def atomic_write(path: str, write):
+    """write(f) 写入临时文件后替换 path，中断时不会留下写了一半的文件"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class Result_Writer:
+    """把时间序列存储按块写入结果目录，retain_ticks 不为 None 时写入后只在内存中保留最近的时间片"""
+
+    def __init__(self, store, path: str, chunk_ticks: int = 288, retain_ticks: int = None, format: str = 'npz'):
+        if format not in FORMATS:
+            raise ValueError(f"unknown result format: {format}")
+        self.store = store
+        self.path = path
+        self.chunk_ticks = chunk_ticks
+        self.retain_ticks = retain_ticks
+        self.format = format
+        self.total = store.register('total', 'total')  # 总体序列每个时间片最后写入，以它的长度为已完成的时间片数
+        self.written = 0  # 已写入磁盘的时间片数
+        self.chunks = []  # 已完成的块：文件名、起止时间片和实体数
+        os.makedirs(path, exist_ok=True)
+
+    def get_state(self):
+        return {"path": self.path, "chunk_ticks": self.chunk_ticks, "retain_ticks": self.retain_ticks, "format": self.format,
+                "written": self.written, "chunks": self.chunks}
+
+    @classmethod
+    def from_state(cls, store, state: dict):
+        """从快照恢复，继续写入原来的结果目录，快照之后写入的块会被重新写入的同名块覆盖"""
+        writer = cls(store, state["path"], state["chunk_ticks"], state["retain_ticks"], state["format"])
+        writer.written = state["written"]
+        writer.chunks = state["chunks"]
+        return writer
+
+    def update(self):
+        """每个时间片结束后调用，攒够 chunk_ticks 个时间片写一块"""
+        if len(self.total) - self.written >= self.chunk_ticks:
+            self.flush()
+
+    def flush(self, complete: bool = False):
+        """把尚未写入的时间片写成一块，complete 表示仿真已结束"""
+        end = len(self.total)
+        if end > self.written:
+            self.write_chunk(self.written, end)
+            self.written = end
+            if self.retain_ticks is not None:
+                self.store.trim(max(self.store.base, end - self.retain_ticks))
+        self.write_manifest(complete)
+
+    def write_chunk(self, begin: int, end: int):
+        store = self.store
+        rows = len(store.keys)
+        name = f"chunk_{len(self.chunks):05d}.{self.format}"
+        columns = {field: store.arrays[field][:rows, begin - store.base:end - store.base] for field in store.fields}
+        atomic_write(os.path.join(self.path, name), lambda f: np.savez_compressed(f, **columns))
+        self.chunks.append({"file": name, "begin": begin, "end": end, "entities": rows})
+
+    def write_manifest(self, complete: bool = False):
+        store = self.store
+        manifest = {
+            "format": self.format,
+            "fields": list(store.fields),
+            "entities": [{"kind": kind, "name": name, "start": start} for (kind, name), start in zip(store.keys, store.starts)],
+            "chunks": self.chunks,
+            "ticks": self.written,
+            "complete": complete,
+        }
+        atomic_write(os.path.join(self.path, 'manifest.json'), lambda f: f.write(json.dumps(manifest, ensure_ascii=False, indent=2).encode('utf-8')))
+
+
+class Results:
+    """读取结果目录，字段数组为 实体 × 时间片，实体顺序与 entities 一致"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, 'manifest.json'), 'r', encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        self.entities = pd.DataFrame(self.manifest["entities"], columns=["kind", "name", "start"])
+        self.ticks = self.manifest["ticks"]
+        self.complete = self.manifest["complete"]
+        self.fields = self.manifest["fields"]
+        if self.manifest["format"] not in FORMATS:
+            raise ValueError(f"unknown result format: {self.manifest['format']}")
+        self.arrays = None
+
+    def load(self):
+        """读入全部块，块中没有的实体（尚未加入）为 0"""
+        if self.arrays is not None:
+            return self.arrays
+        rows = len(self.entities)
+        arrays = {field: np.zeros((rows, self.ticks)) for field in self.fields}
+        for chunk in self.manifest["chunks"]:
+            file = os.path.join(self.path, chunk["file"])
+            begin, end, chunk_rows = chunk["begin"], chunk["end"], chunk["entities"]
+            with np.load(file) as data:
+                for field in self.fields:
+                    arrays[field][:chunk_rows, begin:end] = data[field]
+        self.arrays = arrays
+        return arrays
+
+    def array(self, field: str, kind: str = None):
+        """某个字段的 实体 × 时间片 数组，kind 给出时只取该类实体"""
+        array = self.load()[field]
+        return array if kind is None else array[(self.entities["kind"] == kind).to_numpy()]
+
+    def names(self, kind: str):
+        return self.entities.loc[self.entities["kind"] == kind, "name"].tolist()
+
+    def series(self, kind: str, name: str):
+        """单个实体的时间序列，列为各字段"""
+        row = self.entities.index[(self.entities["kind"] == kind) & (self.entities["name"] == name)][0]
+        return pd.DataFrame({field: self.load()[field][row] for field in self.fields})
+
+    def wide(self, field: str, kind: str):
+        """时间片 × 实体名称 的宽表"""
+        return pd.DataFrame(self.array(field, kind).T, columns=self.names(kind))
+
+    def export_csv(self, out_dir: str = None):
+        """导出为每个节点、业务一个 CSV 以及 total.csv 的格式，默认写入结果目录"""
+        out_dir = out_dir or self.path
+        for row, (kind, name) in enumerate(zip(self.entities["kind"], self.entities["name"])):
+            df = pd.DataFrame({field: self.load()[field][row] for field in self.fields})
+            df.to_csv(os.path.join(out_dir, f"{name}.csv"), index=False)
+        return out_dir
+
+
+def load_results(path: str):
+    return Results(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="inspect or export streamed simulation results")
+    parser.add_argument('path', help="结果目录")
+    parser.add_argument('--csv', action='store_true', help="导出为每个实体一个 CSV")
+    args = parser.parse_args()
+
+    results = load_results(args.path)
+    counts = results.entities["kind"].value_counts().to_dict()
+    print(f"{results.ticks} ticks, {'complete' if results.complete else 'partial'}, entities: {counts}")
+    if args.csv:
+        print(f"csv -> {results.export_csv()}")
+
+
+if __name__ == "__main__":
+    main()
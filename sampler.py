@@ -0,0 +1,108 @@
+"""SHARDS 式空间抽样：只仿真 URL 哈希值低于阈值的请求，指标按 1/rate 放大还原
+
+总缓存和总带宽随抽样率缩小：每类节点只保留 rate 比例的节点，单个节点的缓存和带宽不变，
+这样每个节点承接的 URL 数和负载波动与全量仿真一致。每类节点数最好是 1/rate 的整数倍。
+
+抽中的 URL 按首选哈希值随机分为 group_num 组，各组分别统计请求数和回源数，用随机分组法估计方差，
+给出回源率、请求数和回源数的置信区间。
+"""
+from math import sqrt
+from statistics import NormalDist
+
+import numpy as np
+
+from util.tool import cdn_hash
+
+HASH_SPACE = 2147483647  # cdn_hash 的取值范围为 [0, 2^31 - 1)
+
+
+def t_quantile(df: int, confidence: float = 0.95):
+    """自由度为 df 的 t 分布双侧分位数（Cornish-Fisher 展开近似，df >= 3 时误差小于 1%）"""
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    return (z + (z ** 3 + z) / (4 * df) + (5 * z ** 5 + 16 * z ** 3 + 3 * z) / (96 * df ** 2))
+
+
+def ratio_interval(numerators, denominators, confidence: float = 0.95):
+    """比值 sum(numerators) / sum(denominators) 的估计值和置信区间，各项为一组的统计量"""
+    numerators = np.asarray(numerators, dtype=np.float64)
+    denominators = np.asarray(denominators, dtype=np.float64)
+    total = denominators.sum()
+    estimate = numerators.sum() / total if total else 0.0
+    valid = denominators > 0
+    if valid.sum() < 2:
+        return estimate, estimate, estimate
+    ratios = numerators[valid] / denominators[valid]
+    half = t_quantile(len(ratios) - 1, confidence) * ratios.std(ddof=1) / sqrt(len(ratios))
+    return estimate, estimate - half, estimate + half
+
+
+def total_interval(values, rate: float, confidence: float = 0.95):
+    """由各组的样本计数估计全量总数（按 1/rate 放大）及其置信区间"""
+    values = np.asarray(values, dtype=np.float64)
+    estimate = values.sum() / rate
+    if len(values) < 2:
+        return estimate, estimate, estimate
+    scaled = values * len(values) / rate  # 每组单独放大得到的全量估计
+    half = t_quantile(len(values) - 1, confidence) * scaled.std(ddof=1) / sqrt(len(values))
+    return estimate, estimate - half, estimate + half
+
+
+class Spatial_Sampler:
+    def __init__(self, rate: float, group_num: int = 30):
+        if not 0 < rate <= 1:
+            raise ValueError(f"sample_rate must be in (0, 1]: {rate}")
+        self.rate = rate
+        self.threshold = rate * HASH_SPACE  # 哈希值低于阈值的 URL 被抽中
+        self.group_num = group_num  # 估计方差用的随机分组数
+        self.states = {}  # id(Workload) -> [各 URL 是否被抽中, 被抽中的下标]
+
+    def keep(self, url: str):
+        return cdn_hash(url) < self.threshold
+
+    def node_num(self, num: int):
+        """一类节点抽样后保留的节点数，至少保留一个"""
+        return max(1, round(num * self.rate)) if num else 0
+
+    def track(self, workload):
+        """首次使用时计算整个 URL 目录的抽样结果，之后在 URL 被替换时增量更新"""
+        urls = workload.urls(np.arange(workload.url_num))
+        positions = {url: i for i, url in enumerate(urls)}
+        mask = np.fromiter((self.keep(url) for url in urls), dtype=bool, count=len(urls))
+        state = [mask, None]
+
+        def retire(url):
+            i = positions.pop(url)
+            new_url = workload.url(i)  # churn 先替换再通知，下标 i 处已是新 URL
+            positions[new_url] = i
+            kept = self.keep(new_url)
+            if kept != mask[i]:
+                mask[i] = kept
+                state[1] = None
+
+        workload.retire_listeners.append(retire)
+        self.states[id(workload)] = state
+        return state
+
+    def untrack(self, workload):
+        """业务下线后丢弃其抽样结果，id 可能被之后创建的 Workload 复用"""
+        self.states.pop(id(workload), None)
+
+    def indexes(self, workload):
+        """URL 目录中被抽中的槽位下标"""
+        state = self.states.get(id(workload))
+        if state is None:
+            state = self.track(workload)
+        if state[1] is None:
+            state[1] = np.flatnonzero(state[0])
+        return state[1]
+
+    def intervals(self, request_handler, confidence: float = 0.95):
+        """由请求处理器的分组计数估计全量的回源率（百分比）、请求数和回源数，值为 (估计值, 下限, 上限)"""
+        requests = request_handler.group_requests
+        fetches = request_handler.group_fetches
+        fetch_ratio = tuple(value * 100 for value in ratio_interval(fetches, requests, confidence))
+        return {
+            "fetch_ratio": fetch_ratio,
+            "request_num": total_interval(requests, self.rate, confidence),
+            "fetch_num": total_interval(fetches, self.rate, confidence),
+        }
@@ -0,0 +1,170 @@
+"""仿真进程与仪表盘进程之间的共享内存：每个实体的带宽和成本保存在 实体 × 时间片 的环形数组中
+
+仿真进程每个时间片结束后把新的时间片从时间序列存储复制到共享内存，仪表盘进程只读。
+开启指标（metrics.py）时同时写入 Prometheus 文本，供仪表盘的 /metrics 接口读取。
+读写用顺序锁（seqlock）同步：写入前后各把序号加一，读者在读取前后序号相同且为偶数时才采用读到的数据，
+否则重读，写入方从不等待读者。实体列表（类别、名称、起始时间片）以 JSON 写在共享内存的元数据区。
+
+布局::
+
+    [0, 128)            int64 头部：序号、环长度、最大实体数、元数据区大小、实体数、已写入时间片数、元数据长度、指标区大小、指标长度
+    [128, 160)          float64：回源率、带宽占用比
+    [160, 160+blob)     元数据区（UTF-8 JSON）
+    之后                 指标区（Prometheus 文本），再之后每个字段一个 最大实体数 × 环长度 的 float64 数组，时间片 t 在第 t % 环长度 列
+"""
+import json
+import time
+from multiprocessing import parent_process, resource_tracker, shared_memory
+
+import numpy as np
+
+HEADER_SIZE = 128
+FLOATS_SIZE = 32
+FIELDS = ('bandwidth', 'cost')
+SEQ, RING_TICKS, MAX_ENTITIES, BLOB_SIZE, ENTITY_NUM, LENGTH, BLOB_LEN, METRICS_SIZE, METRICS_LEN = range(9)
+
+
+def layout(ring_ticks: int, max_entities: int, blob_size: int, metrics_size: int):
+    """各字段数组在共享内存中的偏移量和总大小"""
+    offset = HEADER_SIZE + FLOATS_SIZE + blob_size + metrics_size
+    offset += -offset % 8
+    offsets = {}
+    for field in FIELDS:
+        offsets[field] = offset
+        offset += max_entities * ring_ticks * 8
+    return offsets, offset
+
+
+class Shared_Metrics:
+    """共享内存上的各个视图，由写入方创建或由读者按名称打开"""
+
+    def __init__(self, shm: shared_memory.SharedMemory):
+        self.shm = shm
+        self.header = np.ndarray((HEADER_SIZE // 8,), dtype=np.int64, buffer=shm.buf)
+        self.floats = np.ndarray((FLOATS_SIZE // 8,), dtype=np.float64, buffer=shm.buf, offset=HEADER_SIZE)
+        self.ring_ticks = int(self.header[RING_TICKS])
+        self.max_entities = int(self.header[MAX_ENTITIES])
+        self.blob_size = int(self.header[BLOB_SIZE])
+        self.metrics_size = int(self.header[METRICS_SIZE])
+        self.blob = np.ndarray((self.blob_size,), dtype=np.uint8, buffer=shm.buf, offset=HEADER_SIZE + FLOATS_SIZE)
+        self.metrics = np.ndarray((self.metrics_size,), dtype=np.uint8, buffer=shm.buf, offset=HEADER_SIZE + FLOATS_SIZE + self.blob_size)
+        offsets, _ = layout(self.ring_ticks, self.max_entities, self.blob_size, self.metrics_size)
+        self.arrays = {field: np.ndarray((self.max_entities, self.ring_ticks), dtype=np.float64, buffer=shm.buf, offset=offset)
+                       for field, offset in offsets.items()}
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def close(self):
+        # 视图引用着共享内存的缓冲区，须先释放
+        self.header = self.floats = self.blob = self.metrics = self.arrays = None
+        self.shm.close()
+
+
+class Shared_Metrics_Writer(Shared_Metrics):
+    """仿真进程一侧：创建共享内存，每个时间片调用 publish"""
+
+    def __init__(self, ring_ticks: int = 8640, max_entities: int = 512, blob_size: int = 1 << 18, metrics_size: int = 1 << 16,
+                 name: str = None):
+        _, size = layout(ring_ticks, max_entities, blob_size, metrics_size)
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        header = np.ndarray((HEADER_SIZE // 8,), dtype=np.int64, buffer=shm.buf)
+        header[:] = 0
+        header[RING_TICKS] = ring_ticks
+        header[MAX_ENTITIES] = max_entities
+        header[BLOB_SIZE] = blob_size
+        header[METRICS_SIZE] = metrics_size
+        del header
+        super().__init__(shm)
+        self.published = None  # 已写入共享内存的时间片数
+        self.entity_num = 0
+        self.warned = False
+
+    def publish(self, store, data: dict, metrics_text: str = None):
+        """把 store 中尚未写入的时间片、data 中的回源率和带宽占用比以及指标文本写入共享内存"""
+        length = len(store.register('total', 'total'))
+        rows = len(store.keys)
+        if rows > self.max_entities:
+            if not self.warned:
+                print(f"shared metrics: {rows} entities exceed max_entities={self.max_entities}, the rest are not shown")
+                self.warned = True
+            rows = self.max_entities
+        # 首次写入或存储已被 trim 时，从内存中仍保留且环能容纳的最早时间片开始
+        begin = max(store.base, length - self.ring_ticks, self.published or 0)
+        header = self.header
+        header[SEQ] += 1  # 奇数：写入中
+        if rows != self.entity_num:
+            entities = [{"kind": kind, "name": name, "start": start} for (kind, name), start in zip(store.keys[:rows], store.starts[:rows])]
+            blob = json.dumps(entities, ensure_ascii=False).encode('utf-8')
+            if len(blob) > self.blob_size:
+                raise ValueError(f"entity list ({len(blob)} bytes) exceeds shared metrics blob_size={self.blob_size}")
+            self.blob[:len(blob)] = np.frombuffer(blob, dtype=np.uint8)
+            header[BLOB_LEN] = len(blob)
+            header[ENTITY_NUM] = rows
+            self.entity_num = rows
+        if length > begin:
+            columns = np.arange(begin, length) % self.ring_ticks
+            for field in FIELDS:
+                self.arrays[field][:rows, columns] = store.arrays[field][:rows, begin - store.base:length - store.base]
+        if metrics_text is not None:
+            text = metrics_text.encode('utf-8')[:self.metrics_size]
+            self.metrics[:len(text)] = np.frombuffer(text, dtype=np.uint8)
+            header[METRICS_LEN] = len(text)
+        header[LENGTH] = length
+        self.floats[0] = data["fetch_ratio"]
+        self.floats[1] = data["bandwidth_ratio"]
+        header[SEQ] += 1  # 偶数：写入完成
+        self.published = length
+
+    def unlink(self):
+        """仿真结束且仪表盘不再需要时删除共享内存"""
+        shm = self.shm
+        self.close()
+        shm.unlink()
+
+
+class Shared_Metrics_Reader(Shared_Metrics):
+    """仪表盘进程一侧：按名称打开共享内存，read 返回一致的快照"""
+
+    def __init__(self, name: str):
+        shm = shared_memory.SharedMemory(name=name)
+        if parent_process() is None:
+            # 独立启动的读者有自己的 resource_tracker，退出时会把共享内存当作泄漏删除
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        super().__init__(shm)
+
+    def read(self, begin: int = 0, retry_interval: float = 0.001):
+        """读取 [begin, 已写入) 时间片（早于环内最早时间片的部分不返回）
+
+        返回 (entities, first, arrays, fetch_ratio, bandwidth_ratio, length)，arrays 的第 0 列对应时间片 first
+        """
+        header = self.header
+        while True:
+            seq = int(header[SEQ])
+            if seq % 2:
+                time.sleep(retry_interval)
+                continue
+            length = int(header[LENGTH])
+            rows = int(header[ENTITY_NUM])
+            blob = bytes(self.blob[:int(header[BLOB_LEN])])
+            first = min(max(begin, length - self.ring_ticks, 0), length)
+            columns = np.arange(first, length) % self.ring_ticks
+            arrays = {field: self.arrays[field][:rows, columns] for field in FIELDS}  # 花式索引得到副本
+            fetch_ratio, bandwidth_ratio = float(self.floats[0]), float(self.floats[1])
+            if int(header[SEQ]) == seq:
+                break
+        entities = json.loads(blob) if blob else []
+        return entities, first, arrays, fetch_ratio, bandwidth_ratio, length
+
+    def read_metrics(self, retry_interval: float = 0.001):
+        """最新的指标文本，未开启指标时为空字符串"""
+        header = self.header
+        while True:
+            seq = int(header[SEQ])
+            if seq % 2:
+                time.sleep(retry_interval)
+                continue
+            text = bytes(self.metrics[:int(header[METRICS_LEN])])
+            if int(header[SEQ]) == seq:
+                return text.decode('utf-8')
@@ -0,0 +1,74 @@
+"""父层缓存（源站保护，shield）：边缘节点未命中时先按 URL 路由到父层节点，父层也未命中才回源
+
+父层节点与边缘节点相同（Node），有自己的缓存、带宽上限和计费方式，成本计入总成本；父层节点组成单独的哈希环，
+按 URL 的哈希值（与边缘哈希环相同，不依赖 URL id 的分配顺序）路由，首选节点不可用时由放置算法跳过本时间片已不可用的节点，父层全部不可用时边缘节点直接回源。
+"""
+from hash_ring import HashRing
+
+
+class Shield_Tier:
+    def __init__(self, nodes: list, placement: str = 'ketama'):
+        self.nodes = list(nodes)
+        self.hash_ring = HashRing(self.nodes, placement=placement)
+        self.bandwidth_sum = sum(node.bandwidth * node.sample_weight for node in self.nodes)  # 父层总带宽上限
+        self.tick = None  # 当前时间片
+        self.unavailable = set()  # 当前时间片内已满载或不参与调度的父层节点
+        self.available_view = None
+        self.request_num = 0  # 边缘节点发往父层的请求数
+        self.hit_num = 0  # 父层命中数（包括合并到父层进行中回源的请求）
+        self.bypass_num = 0  # 父层全部不可用、边缘节点直接回源的请求数
+        self.fetch_from_origin_num = 0  # 回源数，包括直接回源
+        self.origin_traffic = 0  # 回源流量（MB），包括直接回源
+        self.total_bandwidth_sum = 0  # 各时间片父层总带宽之和
+
+    def fetch(self, url_id: int, hash_value: int, timestamp: int, size: int, arrival: float = None):
+        """边缘节点未命中内容大小为 size 的 url_id 时调用，按 URL 的哈希值 hash_value 路由到父层节点承接或直接回源"""
+        if timestamp != self.tick:
+            self.tick = timestamp
+            self.unavailable = set()
+            self.available_view = None
+        position = self.hash_ring.position(hash_value)
+        node = self.hash_ring.node_at(position)
+        while not node.available(timestamp):
+            if node not in self.unavailable:
+                self.unavailable.add(node)
+                self.available_view = None
+            if self.available_view is None:
+                self.available_view = self.hash_ring.available_view(self.unavailable)
+            next_position = self.hash_ring.next_available(self.available_view, position, hash_value)
+            if next_position < 0:
+                self.bypass_num += 1
+                self.fetch_from_origin_num += 1
+                self.origin_traffic += size
+                return
+            node = self.hash_ring.node_at(next_position)
+        _, fetch_flag, _ = node.serve(url_id, timestamp, size, arrival)
+        self.request_num += 1
+        if fetch_flag:
+            self.fetch_from_origin_num += fetch_flag
+            self.origin_traffic += fetch_flag * size
+        else:
+            self.hit_num += 1
+
+    def record(self):
+        """记录父层节点本时间片的带宽和成本，返回 (总带宽, 总成本)"""
+        bandwidth = 0
+        cost = 0
+        for node in self.nodes:
+            node.record()
+            bandwidth += node.bandwidths[-1] * node.sample_weight
+            cost += node.costs[-1] * node.sample_weight
+        self.total_bandwidth_sum += bandwidth
+        return bandwidth, cost
+
+    def hit_ratio(self):
+        return self.hit_num / self.request_num * 100 if self.request_num else 0.0
+
+    STATE = ('request_num', 'hit_num', 'bypass_num', 'fetch_from_origin_num', 'origin_traffic', 'total_bandwidth_sum')
+
+    def get_state(self):
+        return {name: getattr(self, name) for name in self.STATE}
+
+    def set_state(self, state: dict):
+        for name in self.STATE:
+            setattr(self, name, state[name])
@@ -0,0 +1,646 @@
+import datetime
+import os.path
+import random
+
+import numpy as np
+import pandas as pd
+import tqdm
+
+from business import Business
+from events import Timeline, NODE_ACTIONS
+from hash_ring import HashRing
+from metrics import Metrics
+from mrc import Miss_Ratio_Curves
+from results import Result_Writer
+from node import Node
+from request_handler import RequestHandler
+from sampler import Spatial_Sampler
+from shield import Shield_Tier
+from snapshot import save_snapshot, load_snapshot, latest_snapshot, prune_snapshots, snapshot_path
+from timeseries import Time_Series_Store
+from util.tool import cdn_hash, Hostname_Generator, URL_Interner
+
+
+def new_data():
+    """结果导出与仪表盘共用的数据：时间序列存储和最新的回源率、带宽占用比"""
+    return {
+        "store": Time_Series_Store(),
+        "fetch_ratio": 0.0,
+        "bandwidth_ratio": 0.0
+    }
+
+
+class Simulation:
+    """一次完整的仿真：按 setting 初始化节点、哈希环和业务，每 300 秒一个时间片推进"""
+
+    def __init__(self, setting: dict, data: dict = None, seed: int = None):
+        self.setting = setting
+        self.engine = setting.get('engine', 'request')  # request: 逐请求仿真；flow: 按时间片的流量级仿真
+        if self.engine not in ('request', 'flow'):
+            raise ValueError(f"unknown engine: {self.engine}")
+        self.data = data if data is not None else new_data()
+        self.seed = seed
+        if seed is not None:
+            random.seed(seed)
+        self.seed_sequence = np.random.SeedSequence(seed)  # 未给出种子时随机取熵，各业务的请求流由它派生
+        self.rng = np.random.default_rng(self.seed_sequence)
+        self.store = self.data["store"]
+        self.total = self.store.register('total', 'total')  # 总带宽与总利润，每个时间片最后写入
+        self.tick = 0  # 当前时间片，中途加入的实体从这里开始记录
+        self.timestamp = 0  # 下一个要仿真的时间片的起始时间（秒），从快照恢复后由此继续
+        self.total_bandwidth_sum = 0  # 各时间片总带宽之和，内存中只保留部分时间片时也能算平均带宽占用比
+        self.writer = None  # 流式结果写入，由 stream_results 创建
+        self.dashboard = None  # 仪表盘进程读取的共享内存（Shared_Metrics_Writer），每个时间片结束后写入
+        self.sample_rate = setting.get('sample_rate', 1.0)  # 空间抽样率，小于 1 时只仿真部分 URL，结果按比例放大
+        self.sampler = Spatial_Sampler(self.sample_rate) if self.sample_rate < 1 else None
+        # 内部指标：各阶段耗时和计数器，关闭时不产生开销
+        self.metrics = Metrics()
+        self.metrics.enable(setting.get('metrics', {}).get('enabled', False))
+        mrc = setting.get('mrc', {})  # 缺失率曲线分析：一次仿真得到各缓存大小下的 LRU 缺失率
+        self.mrc = Miss_Ratio_Curves(mrc.get('sizes'), mrc.get('sample_rate', 1.0)) if mrc.get('enabled') else None
+
+        self.url_interner = URL_Interner()  # 本次仿真的 URL -> 整型 id，节点和请求处理器共用
+
+        # 初始化节点
+        self.nodes = []
+        self.node_types = {}  # 主机名 -> 节点类型（如 nodes.0），拓扑变化事件按类型选择节点
+        self.failed = set()  # 故障中、已移出哈希环的节点
+        self.removed = []  # 已缩容、不再承接请求的节点，按 0 带宽计费到当前计费月结束
+        self.bandwidth_sum = 0
+        self.hostname_generator = Hostname_Generator()
+        self.shield = None  # 父层（源站保护），未开启时边缘节点未命中直接回源
+        for i, node_type in enumerate(setting['nodes']):
+            self.nodes.extend(self.make_nodes(node_type, f"nodes.{i}"))
+            self.bandwidth_sum += node_type['bandwidth'] * node_type['num']
+
+        # 初始化父层，父层节点在边缘节点之后创建，开启父层不改变边缘节点的主机名
+        shield = setting.get('shield', {})
+        if shield.get('enabled'):
+            shield_nodes = []
+            for i, node_type in enumerate(shield['nodes']):
+                shield_nodes.extend(self.make_nodes(node_type, f"shield.{i}", 'shields'))
+            self.shield = Shield_Tier(shield_nodes, placement=shield.get('placement', 'ketama'))
+            for node in self.nodes:
+                node.parent = self.shield
+
+        # 初始化哈希环
+        self.hash_ring = HashRing(self.nodes, placement=setting.get('placement', 'ketama'))
+
+        # 初始化请求处理器
+        self.request_handler = RequestHandler(self.hash_ring, fallback=setting.get('fallback', 'probe'), interner=self.url_interner,
+                                              metrics=self.metrics)
+        if self.sampler is not None:
+            self.request_handler.enable_groups(self.sampler.group_num)
+
+        # 初始化业务
+        self.businesses = []
+        for business in setting['businesses']:
+            self.businesses.append(self.make_business(business))
+
+        # 拓扑变化时间线
+        events = setting.get('events', {})
+        self.timeline = Timeline.load(events['file'], events.get('window', 12)) if events.get('file') else None
+
+    def make_node(self, node_type: dict, kind: str = 'nodes'):
+        """创建一个节点，kind 为 nodes（边缘节点）或 shields（父层节点）"""
+        hostname = self.hostname_generator.generate()
+        node = Node(
+            hostname=hostname,
+            cache=node_type['cache'],
+            bandwidth=node_type['bandwidth'],
+            unit_price=node_type['unit_price'],
+            cost_method=node_type['cost_method'],
+            eviction=node_type.get('eviction', 'LRU'),
+            rng=self.rng,
+            series=self.store.register(kind, hostname, self.tick),
+            interner=self.url_interner,
+            metrics=self.metrics,
+            **self.origin_options(),
+        )
+        if kind == 'nodes':
+            node.parent = self.shield
+        return node
+
+    def origin_options(self):
+        """setting 的 origin：回源耗时（秒）和是否开启回源合并，所有节点相同"""
+        origin = self.setting.get('origin', {})
+        return {"origin_latency": origin.get('latency', 0), "coalescing": origin.get('coalescing', True)}
+
+    def make_nodes(self, node_type: dict, type_name: str, kind: str = 'nodes'):
+        """创建一类节点，抽样仿真时只保留 sample_rate 比例的节点，每个节点代表 num / 保留数 个全量节点
+
+        type_name 为该类节点在配置文件中的位置（如 nodes.0），用于按类型汇总缺失率曲线
+        """
+        num = node_type['num']
+        if self.sampler is None:
+            nodes = [self.make_node(node_type, kind) for _ in range(num)]
+        else:
+            nodes = [self.make_node(node_type, kind) for _ in range(self.sampler.node_num(num))]
+            for node in nodes:
+                node.sample_weight = num / len(nodes)
+        for node in nodes:
+            self.node_types[node.hostname] = type_name
+            if self.mrc is not None:
+                self.mrc.attach(node, type_name)
+        return nodes
+
+    def business_rng(self, app_id: str):
+        """业务请求流的随机数生成器，只由仿真种子和 app_id 决定，其他业务的增减不影响它"""
+        return np.random.default_rng(np.random.SeedSequence(self.seed_sequence.entropy, spawn_key=(cdn_hash(app_id),)))
+
+    def make_business(self, business: dict):
+        new_business = Business(
+            app_id=business['app_id'],
+            unit_price=business['unit_price'],
+            cost_method=business['cost_method'],
+            url_num=business['url_num'],
+            wave_file=business['wave_file'],
+            series=self.store.register('businesses', business['app_id'], self.tick),
+            workload={**self.setting.get('workload', {}), **business.get('workload', {})},
+            rng=self.business_rng(business['app_id']),
+            trace={**self.setting.get('trace', {}), **business.get('trace', {})},
+            metrics=self.metrics,
+        )
+        if self.sampler is not None:
+            new_business.sample(self.sampler)
+        return new_business
+
+    def run(self, end: int = 2592000, progress: bool = True):
+        """从当前时间（新建时为 0，恢复快照后为快照时间）运行到 end（秒，不含）
+
+        setting 的 checkpoint.every_ticks 大于 0 时每隔这么多个时间片保存一次快照
+        """
+        checkpoint = self.setting.get('checkpoint', {})
+        every_ticks = checkpoint.get('every_ticks', 0)
+        timestamps = range(self.timestamp, end, 300)
+        if progress:
+            timestamps = tqdm.tqdm(timestamps, desc="Processing timestamps")
+        for timestamp in timestamps:
+            self.step(timestamp)
+            if every_ticks and len(self.total) % every_ticks == 0:
+                with self.metrics.time('checkpoint'):
+                    self.checkpoint(checkpoint.get('path', './checkpoints'), checkpoint.get('keep', 2))
+        if self.writer is not None:
+            self.writer.flush(complete=True)
+            if self.mrc is not None:
+                self.mrc.save(self.writer.path, len(self.total))
+            if self.timeline is not None:
+                self.timeline.save(self.writer.path, 1 / self.sample_rate)
+            if self.metrics.enabled:
+                self.metrics.dump(os.path.join(self.writer.path, 'metrics.csv'))
+        return self
+
+    def stream_results(self, root: str = "./results"):
+        """在 root 下新建以时间命名的结果目录，仿真过程中按 setting 的 results 配置分块写入，返回目录"""
+        results = self.setting.get('results', {})
+        save_dir = os.path.join(root, datetime.datetime.now().strftime("%Y%m%d_%H%M%S"))
+        self.writer = Result_Writer(self.store, save_dir, chunk_ticks=results.get('chunk_ticks', 288),
+                                    retain_ticks=results.get('retain_ticks'), format=results.get('format', 'npz'))
+        return save_dir
+
+    def step(self, timestamp: int):
+        """推进一个时间片"""
+        data = self.data
+        self.tick = timestamp // 300
+        if self.timeline is not None:
+            for event in self.timeline.due(timestamp):
+                self.apply_event(event)
+        with self.metrics.time('send'):
+            for business in self.businesses:
+                if self.engine == 'flow':
+                    business.send_flow(self.request_handler, timestamp)
+                else:
+                    business.send_request(self.request_handler, timestamp)
+        tot_cost = 0
+        tot_bandwidth = 0
+        with self.metrics.time('record'):
+            for node in self.nodes:
+                node.record()
+                tot_cost -= node.costs[-1] * node.sample_weight
+                tot_bandwidth += node.bandwidths[-1] * node.sample_weight
+            for node in self.removed:
+                node.record()
+                tot_cost -= node.costs[-1] * node.sample_weight
+            if self.shield is not None:
+                _, shield_cost = self.shield.record()
+                tot_cost -= shield_cost
+            for business in self.businesses:
+                business.record()
+                tot_cost += business.costs[-1]
+        if self.metrics.enabled:
+            self.collect_metrics()
+        self.request_handler.record()
+        if self.timeline is not None:
+            self.timeline.end_tick(self.origin_fetch_count())
+        self.total.append(bandwidth=tot_bandwidth, cost=tot_cost)
+        if self.removed and len(self.total) % 8640 == 0:  # 计费月结束，缩容的节点不再计费
+            self.removed = []
+        self.total_bandwidth_sum += tot_bandwidth
+        if self.writer is not None:
+            with self.metrics.time('export'):
+                self.writer.update()
+        data["fetch_ratio"] = self.fetch_ratio()
+        data["bandwidth_ratio"] = tot_bandwidth / self.bandwidth_sum * 100
+        self.metrics.end_tick(self.tick)
+        if self.dashboard is not None:
+            with self.metrics.time('publish'):
+                self.dashboard.publish(self.store, data, self.metrics.prometheus() if self.metrics.enabled else None)
+        self.timestamp = timestamp + 300
+
+    def collect_metrics(self):
+        """由各组件已有的累计计数器汇总请求路径上的指标，在 request_handler.record 之前调用"""
+        metrics = self.metrics
+        request_handler = self.request_handler
+        probe_cache = request_handler.probe_cache
+        # 本时间片的探测分布：探测长度为 k 的请求经过了 k - 1 次兜底探测
+        fallback_requests = sum(num for probe_len, num in request_handler.probe_hist.items() if probe_len > 1)
+        fallback_probes = sum((probe_len - 1) * num for probe_len, num in request_handler.probe_hist.items())
+        metrics.total('requests', request_handler.request_num)
+        metrics.total('cache_hits', request_handler.request_num - request_handler.fetch_from_origin_num)
+        metrics.total('cache_misses', request_handler.fetch_from_origin_num)
+        metrics.total('coalesced_requests', request_handler.coalesced_num)
+        metrics.total('origin_traffic_mb', request_handler.origin_traffic)
+        metrics.total('cache_evictions', sum(node.cache.evictions for node in self.nodes))
+        metrics.total('hash_computed', probe_cache.misses)
+        metrics.total('hash_cached', probe_cache.hits)
+        metrics.count('fallback_requests', fallback_requests)
+        metrics.count('fallback_probes', fallback_probes)
+        metrics.count('dropped_requests', request_handler.dropped_num)
+        if self.shield is not None:
+            metrics.total('shield_requests', self.shield.request_num)
+            metrics.total('shield_hits', self.shield.hit_num)
+            metrics.total('origin_fetches', self.shield.fetch_from_origin_num)
+        metrics.gauge('tick', self.tick)
+        metrics.gauge('nodes', len(self.nodes))
+        metrics.gauge('failed_nodes', len(self.failed))
+        metrics.gauge('businesses', len(self.businesses))
+        metrics.gauge('probe_cache_entries', len(probe_cache.entries))
+        metrics.gauge('interned_urls', len(self.url_interner.ids))
+
+    def apply_event(self, event: dict):
+        """执行一个拓扑变化事件（见 events.py），节点事件记录首选节点改变的 URL 比例"""
+        node_event = event['action'] in NODE_ACTIONS
+        if node_event:
+            hashes = self.request_handler.probe_cache.hashes(
+                [url for business in self.businesses for url in business.workload.urls(np.arange(business.url_num))])
+            before = self.primary_nodes(hashes)
+        targets = getattr(self, event['action'])(event)
+        remapped_ratio = 0.0
+        if node_event and len(hashes):
+            remapped_ratio = float(np.mean(before != self.primary_nodes(hashes))) * 100
+        self.timeline.record(event, self.tick, targets, remapped_ratio)
+
+    def primary_nodes(self, hashes: np.ndarray):
+        """各哈希值在哈希环上的首选节点，环上没有节点时为 None"""
+        if not self.hash_ring.nodes:
+            return np.full(len(hashes), None, dtype=object)
+        return self.hash_ring.get_nodes(hashes)
+
+    def select_nodes(self, event: dict, failed: bool = None):
+        """节点事件作用的节点，failed 为 True / False 时只在故障中 / 正常的节点中选择，None 时不限"""
+        candidates = [node for node in self.nodes if failed is None or (node in self.failed) == failed]
+        if 'hostnames' in event:
+            by_hostname = {node.hostname: node for node in candidates}
+            missing = [hostname for hostname in event['hostnames'] if hostname not in by_hostname]
+            if missing:
+                raise ValueError(f"{event['action']} at {event['time']}: no such node: {', '.join(missing)}")
+            return [by_hostname[hostname] for hostname in event['hostnames']]
+        if 'type' not in event:
+            raise ValueError(f"{event['action']} at {event['time']}: either hostnames or type is required")
+        nodes = [node for node in candidates if self.node_types[node.hostname] == event['type']]
+        num = event.get('num', len(nodes))
+        if self.sampler is not None:
+            num = self.sampler.node_num(num)
+        return nodes[len(nodes) - min(num, len(nodes)):]
+
+    def add_nodes(self, event: dict):
+        """扩容：加入事件中的各类节点，它们的时间序列从当前时间片开始"""
+        new_nodes = []
+        for i, node_type in enumerate(event['nodes']):
+            self.bandwidth_sum += node_type['bandwidth'] * node_type['num']
+            new_nodes.extend(self.make_nodes(node_type, f"{event['name']}.{i}"))
+        self.nodes.extend(new_nodes)
+        self.hash_ring.add_nodes(new_nodes)
+        return [node.hostname for node in new_nodes]
+
+    def remove_nodes(self, event: dict):
+        """缩容：节点移出哈希环和集群，缓存释放；当月已产生的带宽仍要计费，按 0 带宽记录到当前计费月结束"""
+        nodes = self.select_nodes(event)
+        for node in nodes:
+            self.hash_ring.remove_node(node)
+            self.nodes.remove(node)
+            self.failed.discard(node)
+            self.bandwidth_sum -= node.bandwidth * node.sample_weight
+            if self.mrc is not None:
+                self.mrc.detach(node)
+            node.clear_cache()
+            if len(self.total) % 8640:  # 在计费月的第一个时间片移除时，之前的月份已结清
+                self.removed.append(node)
+        return [node.hostname for node in nodes]
+
+    def fail_nodes(self, event: dict):
+        """节点故障：移出哈希环，缓存丢失，仍按 0 带宽计费"""
+        nodes = self.select_nodes(event, failed=False)
+        for node in nodes:
+            self.hash_ring.remove_node(node)
+            node.clear_cache()
+            self.failed.add(node)
+        return [node.hostname for node in nodes]
+
+    def recover_nodes(self, event: dict):
+        """故障节点恢复，以空缓存重新加入哈希环"""
+        nodes = self.select_nodes(event, failed=True)
+        self.hash_ring.add_nodes(nodes)
+        for node in nodes:
+            self.failed.discard(node)
+        return [node.hostname for node in nodes]
+
+    def onboard_businesses(self, event: dict):
+        """业务上线，时间序列从当前时间片开始"""
+        for business in event['businesses']:
+            self.businesses.append(self.make_business(business))
+        return [business['app_id'] for business in event['businesses']]
+
+    def offboard_businesses(self, event: dict):
+        """业务下线：不再发送请求和记录，其 URL 的探测缓存和 id 映射一并删除"""
+        by_app_id = {business.app_id: business for business in self.businesses}
+        missing = [app_id for app_id in event['app_ids'] if app_id not in by_app_id]
+        if missing:
+            raise ValueError(f"{event['action']} at {event['time']}: no such business: {', '.join(missing)}")
+        for app_id in event['app_ids']:
+            business = by_app_id[app_id]
+            self.businesses.remove(business)
+            workload = business.workload
+            self.request_handler.unwatch(workload)
+            if self.sampler is not None:
+                self.sampler.untrack(workload)
+        return list(event['app_ids'])
+
+    def get_state(self):
+        """完整的仿真状态：随机数状态、各节点和业务的构造参数与可变状态、计数器、时间序列存储及结果写入进度"""
+        version, internal, gauss = random.getstate()
+        return {
+            "engine": self.engine,
+            "sample_rate": self.sample_rate,
+            "random": {"version": version, "internal": np.array(internal, dtype=np.int64), "gauss": gauss},
+            "rng": self.rng.bit_generator.state,
+            "entropy": self.seed_sequence.entropy,
+            "tick": self.tick,
+            "timestamp": self.timestamp,
+            "total_bandwidth_sum": self.total_bandwidth_sum,
+            "bandwidth_sum": self.bandwidth_sum,
+            "hostnames": np.array(sorted(self.hostname_generator.generated), dtype=str),
+            "nodes": [self.node_params(node) for node in self.nodes],
+            "removed": [self.node_params(node) for node in self.removed],
+            "shield": {
+                "nodes": [self.node_params(node) for node in self.shield.nodes],
+                "state": self.shield.get_state(),
+            } if self.shield is not None else None,
+            "ring": [node.hostname for node in self.hash_ring.nodes],  # 环上节点的顺序，故障节点不在环上
+            "ring_version": self.hash_ring.version,
+            "events": self.timeline.get_state() if self.timeline is not None else None,
+            "businesses": [{
+                "app_id": business.app_id,
+                "unit_price": business.unit_price,
+                "cost_method": business.cost_method,
+                "url_num": business.url_num,
+                "wave_file": business.wave_file,
+                "workload": business.workload.setting,
+                "trace": business.trace.setting,
+                "state": business.get_state(),
+            } for business in self.businesses],
+            "request_handler": self.request_handler.get_state(),
+            "url_interner": self.url_interner.get_state(),
+            "store": self.store.get_state(),
+            "mrc": self.mrc.get_state() if self.mrc is not None else None,
+            "writer": self.writer.get_state() if self.writer is not None else None,
+            "fetch_ratio": self.data["fetch_ratio"],
+            "bandwidth_ratio": self.data["bandwidth_ratio"],
+        }
+
+    def set_state(self, state: dict):
+        """恢复 get_state 保存的状态，setting 中的引擎和抽样率须与保存时相同"""
+        if state["engine"] != self.engine or state["sample_rate"] != self.sample_rate:
+            raise ValueError(f"snapshot was taken with engine={state['engine']}, sample_rate={state['sample_rate']}")
+        # 存储原地恢复，仪表盘共享的 data["store"] 不变
+        self.store.set_state(state["store"])
+        self.total = self.store.register('total', 'total')
+        self.tick = state["tick"]
+        self.timestamp = state["timestamp"]
+        self.total_bandwidth_sum = state["total_bandwidth_sum"]
+        self.bandwidth_sum = state["bandwidth_sum"]
+        self.hostname_generator.generated = set(state["hostnames"].tolist())
+
+        self.node_types = {}
+        self.nodes = [self.restore_node(params, 'nodes') for params in state["nodes"]]
+        self.removed = [self.restore_node(params, 'nodes') for params in state.get("removed", [])]
+        self.shield = None
+        if state.get("shield") is not None:
+            self.shield = Shield_Tier([self.restore_node(params, 'shields') for params in state["shield"]["nodes"]],
+                                      placement=self.setting.get('shield', {}).get('placement', 'ketama'))
+            self.shield.set_state(state["shield"]["state"])
+            for node in self.nodes:
+                node.parent = self.shield
+        if self.mrc is not None:
+            self.mrc.set_state(state["mrc"], self.nodes + (self.shield.nodes if self.shield is not None else []))
+
+        by_hostname = {node.hostname: node for node in self.nodes}
+        ring_nodes = [by_hostname[hostname] for hostname in state["ring"]] if "ring" in state else self.nodes
+        self.failed = set(self.nodes) - set(ring_nodes)
+        self.hash_ring = HashRing(ring_nodes, placement=self.setting.get('placement', 'ketama'))
+        self.hash_ring.version = state["ring_version"]
+        self.timeline = Timeline.from_state(state["events"]) if state.get("events") is not None else None
+        self.request_handler = RequestHandler(self.hash_ring, fallback=self.setting.get('fallback', 'probe'), interner=self.url_interner,
+                                              metrics=self.metrics)
+        self.request_handler.set_state(state["request_handler"])
+
+        if self.sampler is not None:
+            self.sampler.states = {}  # 按 Workload 的 id 缓存的抽样结果随业务一起重建
+        self.seed_sequence = np.random.SeedSequence(state["entropy"])  # 之后加入的业务由原来的种子派生
+        self.businesses = []
+        for params in state["businesses"]:
+            business = self.make_business(params)
+            business.set_state(params["state"])
+            self.businesses.append(business)
+        self.url_interner.set_state(state["url_interner"])
+
+        if state["writer"] is not None:
+            self.writer = Result_Writer.from_state(self.store, state["writer"])
+        self.data["fetch_ratio"] = state["fetch_ratio"]
+        self.data["bandwidth_ratio"] = state["bandwidth_ratio"]
+        # 各业务请求流的随机数已由 Business.set_state 恢复，最后恢复全局随机数状态
+        random.setstate((state["random"]["version"], tuple(state["random"]["internal"].tolist()), state["random"]["gauss"]))
+        self.rng.bit_generator.state = state["rng"]
+        return self
+
+    def node_params(self, node: Node):
+        """快照中节点的构造参数、类型和可变状态"""
+        return {
+            "hostname": node.hostname,
+            "type": self.node_types.get(node.hostname),
+            "cache": node.cache_size,
+            "bandwidth": node.bandwidth,
+            "unit_price": node.unit_price,
+            "cost_method": node.cost_method,
+            "eviction": node.eviction,
+            "state": node.get_state(),
+        }
+
+    def restore_node(self, params: dict, kind: str):
+        node = Node(
+            hostname=params["hostname"],
+            cache=params["cache"],
+            bandwidth=params["bandwidth"],
+            unit_price=params["unit_price"],
+            cost_method=params["cost_method"],
+            eviction=params["eviction"],
+            rng=self.rng,
+            series=self.store.register(kind, params["hostname"]),
+            interner=self.url_interner,
+            metrics=self.metrics,
+            **self.origin_options(),
+        )
+        node.set_state(params["state"])
+        if params.get("type") is not None:
+            self.node_types[node.hostname] = params["type"]
+        return node
+
+    def checkpoint(self, snapshot_dir: str = "./checkpoints", keep: int = 2):
+        """保存当前状态到 snapshot_dir，只保留最新的 keep 个快照，返回快照路径"""
+        path = save_snapshot(snapshot_path(snapshot_dir, len(self.total)), self.get_state())
+        prune_snapshots(snapshot_dir, keep)
+        return path
+
+    def resume(self, path: str = None):
+        """从快照恢复，path 为快照文件或目录（取其中最新的快照），默认为 setting 中的 checkpoint.path"""
+        path = path or self.setting.get('checkpoint', {}).get('path', './checkpoints')
+        if os.path.isdir(path):
+            snapshot = latest_snapshot(path)
+            if snapshot is None:
+                raise FileNotFoundError(f"no snapshot in {path}")
+            path = snapshot
+        return self.set_state(load_snapshot(path))
+
+    def origin_fetch_count(self):
+        """实际发往源站的累计请求数，开启父层时为父层的回源数"""
+        if self.shield is not None:
+            return self.shield.fetch_from_origin_num
+        return self.request_handler.fetch_from_origin_num
+
+    def fetch_ratio(self):
+        request_handler = self.request_handler
+        return request_handler.fetch_from_origin_num / request_handler.request_num * 100 if request_handler.request_num else 0.0
+
+    def origin_saving(self):
+        """回源合并节省的回源流量占不合并时回源流量的百分比"""
+        request_handler = self.request_handler
+        total = request_handler.origin_traffic + request_handler.coalesced_traffic
+        return request_handler.coalesced_traffic / total * 100 if total else 0.0
+
+    @staticmethod
+    def tier_cost(nodes: list):
+        """一层节点当前的总成本（抽样仿真时按节点代表的全量节点数加权）"""
+        return float(sum(node.costs[-1] * node.sample_weight for node in nodes if len(node.costs)))
+
+    def summary(self):
+        """汇总指标：回源率、平均带宽占用比、总利润和各节点成本
+
+        抽样仿真时计数按 1/sample_rate 放大，并在 intervals 中给出回源率、请求数和回源数的 95% 置信区间
+        """
+        scale = 1 / self.sample_rate
+        summary = {
+            "sample_rate": self.sample_rate,
+            "request_num": round(self.request_handler.request_num * scale),
+            "fetch_num": round(self.request_handler.fetch_from_origin_num * scale),
+            "dropped_num": round(sum(self.request_handler.dropped_nums) * scale),
+            "coalesced_num": round(self.request_handler.coalesced_num * scale),
+            "origin_traffic": self.request_handler.origin_traffic * scale,
+            "origin_saving": self.origin_saving(),
+            "fetch_ratio": self.fetch_ratio(),
+            "bandwidth_ratio": float(self.total_bandwidth_sum / len(self.total)) / self.bandwidth_sum * 100 if len(self.total) else 0.0,
+            "total_cost": float(self.total.view('cost')[-1]) if len(self.total) else 0.0,
+            "node_costs": {node.hostname: float(node.costs[-1]) if len(node.costs) else 0.0 for node in self.nodes + self.removed},
+        }
+        shield = self.shield
+        if shield is not None:
+            # fetch_num 为边缘节点未命中数（发往父层），origin_fetch_num 为实际回源数
+            summary["origin_fetch_num"] = round(shield.fetch_from_origin_num * scale)
+            summary["origin_traffic"] = shield.origin_traffic * scale
+            summary["shield_request_num"] = round(shield.request_num * scale)
+            summary["shield_bypass_num"] = round(shield.bypass_num * scale)
+            summary["shield_hit_ratio"] = shield.hit_ratio()
+            summary["shield_bandwidth_ratio"] = float(shield.total_bandwidth_sum / len(self.total)) / shield.bandwidth_sum * 100 if len(self.total) else 0.0
+            summary["edge_cost"] = self.tier_cost(self.nodes + self.removed)
+            summary["shield_cost"] = self.tier_cost(shield.nodes)
+            summary["combined_cost"] = summary["edge_cost"] + summary["shield_cost"]
+        else:
+            summary["origin_fetch_num"] = summary["fetch_num"]
+        if self.timeline is not None:
+            summary["events"] = self.timeline.results(scale)
+        if self.sampler is not None:
+            summary["intervals"] = {key: [float(value) for value in interval]
+                                    for key, interval in self.sampler.intervals(self.request_handler).items()}
+        return summary
+
+    def report(self):
+        if self.sampler is not None:
+            summary = self.summary()
+            print(f"Sample Rate: {self.sample_rate} (estimates with 95% confidence intervals)")
+            for key, label in (("request_num", "Request Num"), ("fetch_num", "Fetch Num"), ("fetch_ratio", "Fetch Ratio")):
+                estimate, low, high = summary["intervals"][key]
+                print(f"{label}: {estimate:.2f} [{low:.2f}, {high:.2f}]")
+            print("Dropped Num:", summary["dropped_num"])
+        else:
+            request_handler = self.request_handler
+            print("Request Num:", request_handler.request_num)
+            print("Fetch Num:", request_handler.fetch_from_origin_num)
+            print("Fetch Ratio:", self.fetch_ratio())
+            print("Dropped Num:", sum(request_handler.dropped_nums))
+        if self.setting.get('origin', {}).get('latency', 0):
+            summary = self.summary()
+            print("Coalesced Num:", summary["coalesced_num"])
+            print(f"Origin Traffic: {summary['origin_traffic']:.0f} MB (coalescing saved {summary['origin_saving']:.2f}%)")
+        if self.shield is not None:
+            summary = self.summary()
+            print(f"Shield Hit Ratio: {summary['shield_hit_ratio']:.2f}% ({summary['shield_request_num']} requests, {summary['shield_bypass_num']} bypassed)")
+            print("Origin Fetch Num:", summary["origin_fetch_num"])
+            print(f"Edge Cost: {summary['edge_cost']:.2f}  Shield Cost: {summary['shield_cost']:.2f}  Combined Cost: {summary['combined_cost']:.2f}")
+        if self.timeline is not None and self.timeline.log:
+            print(f"Topology events (URLs remapped; origin fetches per tick before -> after, over {self.timeline.window} ticks):")
+            for result in self.timeline.results(1 / self.sample_rate):
+                targets = result['targets']
+                names = ' '.join(targets) if len(targets) <= 4 else f"{' '.join(targets[:4])} ... ({len(targets)})"
+                print(f"  {result['time']} {result['action']} {names}: remapped {result['remapped_ratio']:.2f}%, "
+                      f"fetches {result['fetch_before']:.1f} -> {result['fetch_after']:.1f} "
+                      f"({result['extra_fetches']:+.0f}, peak {result['peak_fetches']:.0f})")
+        if self.mrc is not None:
+            print("LRU miss ratio curves by node type (size: miss ratio / origin bandwidth per tick):")
+            for node_type, curve in self.mrc.type_curves(len(self.total)).groupby("node_type"):
+                print(f"  {node_type}:", "  ".join(f"{row.size}: {row.miss_ratio * 100:.2f}% / {row.fetch_bandwidth:.1f}" for row in curve.itertuples()))
+
+    def save(self, root: str = "./results"):
+        """将各节点、业务和总体的带宽与成本导出为 CSV，返回保存目录
+
+        只包含内存中保留的时间片；完整结果请用 stream_results 流式写入，再用 results.py 导出
+        """
+        if not os.path.exists(root):
+            os.mkdir(root)
+        save_time = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        save_dir = f"{root}/{save_time}"
+        if not os.path.exists(save_dir):
+            os.mkdir(save_dir)
+
+        for node in self.nodes + self.removed:
+            df = pd.DataFrame({'bandwidth': node.bandwidths, 'cost': node.costs})
+            df.to_csv(f"{save_dir}/{node.hostname}.csv", index=False)
+
+        for business in self.businesses:
+            df = pd.DataFrame({'bandwidth': business.bandwidths, 'cost': business.costs})
+            df.to_csv(f"{save_dir}/{business.app_id}.csv", index=False)
+
+        df = pd.DataFrame({'bandwidth': self.total.view('bandwidth'), 'cost': self.total.view('cost')})
+        df.to_csv(f"{save_dir}/total.csv", index=False)
+
+        if self.mrc is not None:
+            self.mrc.save(save_dir, len(self.total))
+        return save_dir
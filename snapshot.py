@@ -0,0 +1,79 @@
+"""仿真快照：把 Simulation.get_state() 得到的嵌套状态保存为一个压缩的 npz 文件
+
+状态中的 NumPy 数组各存为 npz 中的一项，其余的字典、列表和标量写成一项 JSON（__meta__），
+数组在 JSON 中以 {"__array__": 项名} 引用。缓存、URL 列表等以整型 URL id 和数组保存，不使用 pickle。
+文件先写临时文件再原子替换，中断时不会留下写了一半的快照。
+"""
+import json
+import os
+
+import numpy as np
+
+from results import atomic_write
+
+META = '__meta__'
+
+
+def flatten(value, arrays: dict):
+    """把 value 中的数组移入 arrays，返回可 JSON 序列化的结构"""
+    if isinstance(value, np.ndarray):
+        key = f"a{len(arrays)}"
+        arrays[key] = value
+        return {"__array__": key}
+    if isinstance(value, dict):
+        return {key: flatten(item, arrays) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [flatten(item, arrays) for item in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def restore(value, arrays):
+    """flatten 的逆操作"""
+    if isinstance(value, dict):
+        if "__array__" in value:
+            return arrays[value["__array__"]]
+        return {key: restore(item, arrays) for key, item in value.items()}
+    if isinstance(value, list):
+        return [restore(item, arrays) for item in value]
+    return value
+
+
+def save_snapshot(path: str, state: dict):
+    arrays = {}
+    meta = json.dumps(flatten(state, arrays), ensure_ascii=False)
+    arrays[META] = np.array(meta)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    atomic_write(path, lambda f: np.savez_compressed(f, **arrays))
+    return path
+
+
+def load_snapshot(path: str):
+    with np.load(path) as data:
+        arrays = {key: data[key] for key in data.files}
+    return restore(json.loads(str(arrays.pop(META))), arrays)
+
+
+def snapshot_path(snapshot_dir: str, tick: int):
+    """第 tick 个时间片结束后的快照文件名，按时间片排序即为时间顺序"""
+    return os.path.join(snapshot_dir, f"snapshot_{tick:08d}.npz")
+
+
+def list_snapshots(snapshot_dir: str):
+    if not os.path.isdir(snapshot_dir):
+        return []
+    names = sorted(name for name in os.listdir(snapshot_dir) if name.startswith('snapshot_') and name.endswith('.npz'))
+    return [os.path.join(snapshot_dir, name) for name in names]
+
+
+def latest_snapshot(snapshot_dir: str):
+    """目录中最新的快照，没有时返回 None"""
+    snapshots = list_snapshots(snapshot_dir)
+    return snapshots[-1] if snapshots else None
+
+
+def prune_snapshots(snapshot_dir: str, keep: int):
+    """只保留最新的 keep 个快照"""
+    for path in list_snapshots(snapshot_dir)[:-keep] if keep > 0 else []:
+        os.remove(path)
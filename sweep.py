@@ -0,0 +1,168 @@
+"""参数扫描：在进程池中并行运行多组 settings.json 覆盖项，汇总为一张对比表，中断后可继续
+
+扫描文件示例（sweep.json）::
+
+    {
+      "name": "cache_size",
+      "base": "settings.json",
+      "days": 3,
+      "seeds": [0, 1],
+      "grid": {"nodes.0.cache": [1000, 5000], "placement": ["ketama", "maglev"]},
+      "scenarios": [{"name": "lfu", "overrides": {"nodes.0.eviction": "LFU"}}]
+    }
+
+grid 中各项取笛卡尔积，scenarios 为额外列出的场景；覆盖项的键是 setting 中以点分隔的路径，列表用下标。
+结果逐个追加到输出目录的 results.jsonl，并记录场景的指纹（覆盖后的完整 setting、种子和天数的哈希）；
+再次运行时只复用指纹相同的结果，summary.csv 只列出当前扫描文件中的场景。
+用法: python sweep.py sweep.json --workers 4
+"""
+import argparse
+import copy
+import csv
+import hashlib
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from traces import warm_cache
+
+
+def apply_overrides(setting: dict, overrides: dict):
+    """按点分隔路径覆盖 setting 中的值，返回新的 setting"""
+    setting = copy.deepcopy(setting)
+    for path, value in overrides.items():
+        keys = path.split('.')
+        target = setting
+        for key in keys[:-1]:
+            target = target[int(key)] if isinstance(target, list) else target[key]
+        last = keys[-1]
+        if isinstance(target, list):
+            target[int(last)] = value
+        else:
+            target[last] = value
+    return setting
+
+
+def expand(sweep: dict):
+    """展开扫描文件，返回 (场景名, 覆盖项) 列表"""
+    scenarios = []
+    grid = sweep.get('grid', {})
+    if grid:
+        paths = list(grid)
+        for values in itertools.product(*(grid[path] for path in paths)):
+            overrides = dict(zip(paths, values))
+            name = ','.join(f"{path}={value}" for path, value in overrides.items())
+            scenarios.append((name, overrides))
+    for i, scenario in enumerate(sweep.get('scenarios', [])):
+        scenarios.append((scenario.get('name', f"scenario{i}"), scenario.get('overrides', {})))
+    if not scenarios:
+        scenarios.append(('base', {}))
+    return scenarios
+
+
+def run_scenario(setting: dict, seed: int, days: float):
+    """在工作进程中运行一次无界面仿真，返回汇总指标"""
+    from simulation import Simulation
+
+    simulation = Simulation(setting, seed=seed)
+    simulation.run(int(days * 86400), progress=False)
+    return simulation.summary()
+
+
+def job_key(setting: dict, seed: int, days: float):
+    """场景的指纹：覆盖后的完整 setting、种子和天数的哈希，扫描文件或基础配置改变后不会误用旧结果"""
+    job = json.dumps({'setting': setting, 'seed': seed, 'days': days}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(job.encode('utf-8')).hexdigest()[:16]
+
+
+def load_done(results_path: str):
+    """读取已完成的场景，按指纹索引，用于中断后继续"""
+    done = {}
+    if os.path.exists(results_path):
+        with open(results_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:  # 中断时写了一半的行
+                    continue
+                if 'key' in record:
+                    done[record['key']] = record
+    return done
+
+
+def write_table(records: list, table_path: str):
+    """把各场景的汇总指标写成一张 CSV 对比表"""
+    columns = ['id', 'scenario', 'seed', 'sample_rate', 'request_num', 'fetch_num', 'dropped_num', 'fetch_ratio', 'fetch_ratio_low',
+               'fetch_ratio_high', 'coalesced_num', 'origin_traffic', 'origin_saving', 'origin_fetch_num', 'shield_hit_ratio',
+               'shield_cost', 'bandwidth_ratio', 'total_cost', 'node_cost_min', 'node_cost_mean', 'node_cost_max']
+    with open(table_path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        for record in records:
+            node_costs = np.array(list(record['node_costs'].values()), dtype=np.float64)
+            row = {column: record.get(column) for column in columns}
+            # 抽样仿真的回源率置信区间，全量仿真时上下限即为回源率
+            _, row['fetch_ratio_low'], row['fetch_ratio_high'] = record.get('intervals', {}).get('fetch_ratio', [None] + [record['fetch_ratio']] * 2)
+            row['node_cost_min'] = float(node_costs.min()) if len(node_costs) else 0.0
+            row['node_cost_mean'] = float(node_costs.mean()) if len(node_costs) else 0.0
+            row['node_cost_max'] = float(node_costs.max()) if len(node_costs) else 0.0
+            writer.writerow(row)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="parameter sweep over settings.json scenarios")
+    parser.add_argument('sweep', help="扫描文件（JSON）")
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--out', default=None, help="输出目录，默认 ./sweeps/<name>")
+    args = parser.parse_args()
+
+    sweep = json.load(open(args.sweep, 'r', encoding='utf-8'))
+    base = json.load(open(sweep.get('base', 'settings.json'), 'r', encoding='utf-8'))
+    days = sweep.get('days', 30)
+    seeds = sweep.get('seeds', [0])
+    out_dir = args.out or os.path.join('./sweeps', sweep.get('name', os.path.splitext(os.path.basename(args.sweep))[0]))
+    os.makedirs(out_dir, exist_ok=True)
+    results_path = os.path.join(out_dir, 'results.jsonl')
+    table_path = os.path.join(out_dir, 'summary.csv')
+
+    # 只复用指纹相同的结果：场景的覆盖项、天数或基础配置改变后重新运行
+    done = load_done(results_path)
+    jobs = []
+    for name, overrides in expand(sweep):
+        setting = apply_overrides(base, overrides)
+        for seed in seeds:
+            jobs.append((f"{name}#seed={seed}", name, overrides, seed, setting, job_key(setting, seed, days)))
+    pending = [job for job in jobs if job[5] not in done]
+    finished = len(jobs) - len(pending)
+    print(f"{finished} done, {len(pending)} to run -> {out_dir}")
+
+    # 工作进程直接以 memmap 打开已解析的波形缓存
+    for job in pending:
+        warm_cache(job[4])
+
+    with open(results_path, 'a', encoding='utf-8') as results, ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = {executor.submit(run_scenario, setting, seed, days): (job_id, name, overrides, seed, key)
+                   for job_id, name, overrides, seed, setting, key in pending}
+        for future in as_completed(futures):
+            job_id, name, overrides, seed, key = futures[future]
+            record = {'id': job_id, 'key': key, 'scenario': name, 'overrides': overrides, 'seed': seed, 'days': days, **future.result()}
+            results.write(json.dumps(record, ensure_ascii=False) + '\n')
+            results.flush()  # 每完成一个场景立即落盘，中断后从这里继续
+            done[key] = record
+            finished += 1
+            print(f"[{finished}/{len(jobs)}] {job_id}: "
+                  f"fetch {record['fetch_ratio']:.2f}%  bandwidth {record['bandwidth_ratio']:.2f}%  cost {record['total_cost']:.2f}")
+
+    # 对比表只包含当前扫描文件中的场景，results.jsonl 中其他的旧结果保留但不列出
+    write_table([done[job[5]] for job in jobs], table_path)
+    print(f"summary -> {table_path}")
+
+
+if __name__ == "__main__":
+    main()
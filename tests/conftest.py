@@ -0,0 +1,59 @@
+import copy
+import json
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture
+def setting(monkeypatch):
+    """缩小规模的 settings.json，工作目录切换到仓库根目录以读取 ./data 下的波形文件"""
+    monkeypatch.chdir(ROOT)
+    with open(os.path.join(ROOT, 'settings.json'), 'r', encoding='utf-8') as f:
+        setting = json.load(f)
+    for node_type, eviction in zip(setting['nodes'], ['LRU', 'S3-FIFO', 'ARC']):
+        node_type['num'] = 4
+        node_type['cache'] = 150
+        node_type['eviction'] = eviction
+    setting['dashboard']['enabled'] = False
+    setting['fallback'] = 'skip'  # 节点很少、大量请求被丢弃，probe 模式每个丢弃的请求都要探测 256 次
+    return setting
+
+
+@pytest.fixture
+def run_outputs(tmp_path):
+    """run_outputs(setting, seed, end, crash=None) 运行仿真并返回结果目录中的数组、实体、summary 和探测缓存的命中统计
+
+    crash=(checkpoint_ticks, crash_ticks) 时先运行到 crash_ticks 个时间片（每 checkpoint_ticks 个时间片保存快照）后丢弃，
+    再由新的 Simulation 从最新快照恢复运行到 end
+    """
+    from results import load_results
+    from simulation import Simulation
+
+    def run(setting, seed, end, crash=None):
+        setting = copy.deepcopy(setting)
+        out = tmp_path / f"run{len(list(tmp_path.iterdir()))}"
+        checkpoint_dir = str(out / 'checkpoints')
+        setting['checkpoint'] = {'every_ticks': 0, 'path': checkpoint_dir, 'keep': 2}
+        if crash is None:
+            sim = Simulation(setting, seed=seed)
+            sim.stream_results(str(out / 'results'))
+        else:
+            checkpoint_ticks, crash_ticks = crash
+            setting['checkpoint']['every_ticks'] = checkpoint_ticks
+            sim = Simulation(setting, seed=seed)
+            sim.stream_results(str(out / 'results'))
+            sim.run(crash_ticks * 300, progress=False)
+            setting['checkpoint']['every_ticks'] = 0
+            sim = Simulation(setting, seed=seed)
+            sim.resume(checkpoint_dir)
+        sim.run(end, progress=False)
+        results = load_results(sim.writer.path)
+        probe_cache = sim.request_handler.probe_cache
+        return results.load(), results.entities.values.tolist(), sim.summary(), (probe_cache.hits, probe_cache.misses, len(probe_cache.entries))
+
+    return run
@@ -0,0 +1,78 @@
+"""handle_batch 与按到达顺序逐个调用 handle_request 的结果一致：各放置算法、兜底方式下的节点状态和计数器都相同"""
+import random
+
+import numpy as np
+import pytest
+
+from hash_ring import HashRing
+from node import Node
+from placement import PLACEMENTS
+from request_handler import RequestHandler
+from util.entity import Request
+
+TICKS = 6
+URLS = [f"http://example.com/{i}" for i in range(2000)]
+
+
+def make_handler(placement: str, fallback: str):
+    nodes = [Node(hostname=f"node-{i}", cache=60, bandwidth=[320, 640][i % 2], unit_price=1.0,
+                  cost_method='C' if i % 5 == 0 else 'A', eviction=['LRU', 'LFU', 'S3-FIFO', 'ARC'][i % 4])
+             for i in range(12)]
+    handler = RequestHandler(HashRing(nodes, placement=placement), fallback=fallback)
+    for url in URLS:  # 各处理器的 URL id 相同，缓存状态可以直接比较
+        handler.interner.intern(url)
+    return handler
+
+
+def ticks(seed: int):
+    """每个时间片的请求 URL 序列，热门 URL 重复出现，总量超过节点带宽以触发兜底和丢弃"""
+    rng = random.Random(seed)
+    weights = [1 / (i + 1) for i in range(len(URLS))]
+    for tick in range(TICKS):
+        timestamp = 72000 - 600 + tick * 300  # 跨过 C 类节点开始承接请求的时刻
+        yield timestamp, rng.choices(URLS, weights, k=200)
+
+
+def plain(value):
+    """快照状态转为可直接比较的列表和字典"""
+    if isinstance(value, dict):
+        return {key: plain(item) for key, item in value.items()}
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return value
+
+
+def state(handler: RequestHandler):
+    nodes = handler.hash_ring.nodes
+    return {
+        "bandwidths": [node.bandwidths.tolist() for node in nodes],
+        "caches": [plain(node.cache.get_state()) for node in nodes],
+        "cache_order": [node.cache.order() for node in nodes if hasattr(node.cache, 'order')],
+        "counters": [handler.request_num, handler.fetch_from_origin_num, handler.origin_traffic, handler.coalesced_num],
+        "probe_histograms": handler.probe_histograms,
+        "dropped_nums": handler.dropped_nums,
+    }
+
+
+def finish_tick(handler: RequestHandler):
+    for node in handler.hash_ring.nodes:
+        node.record()
+    handler.record()
+
+
+@pytest.mark.parametrize('fallback', ['probe', 'skip'])
+@pytest.mark.parametrize('placement', sorted(PLACEMENTS))
+def test_batch_matches_scalar(placement, fallback):
+    scalar, batch, ordered = (make_handler(placement, fallback) for _ in range(3))
+    for timestamp, urls in ticks(7):
+        for url in urls:
+            scalar.handle_request(Request(url, timestamp))
+        batch.handle_batch(urls, timestamp)
+        unique, order = np.unique(urls, return_inverse=True)
+        ordered.handle_batch(unique.tolist(), timestamp, order.tolist())
+        for handler in (scalar, batch, ordered):
+            finish_tick(handler)
+    assert sum(scalar.dropped_nums) > 0 and any(len(hist) > 1 for hist in scalar.probe_histograms)
+    expected = state(scalar)
+    assert state(batch) == expected
+    assert state(ordered) == expected
@@ -0,0 +1,110 @@
+"""节点缓存：LRU 与原 OrderedDict 缓存的淘汰顺序一致，各淘汰策略的结构不变量，快照恢复后行为不变"""
+import random
+from collections import OrderedDict
+
+import pytest
+
+from cache import Array_Cache, EVICTIONS, make_cache
+
+CAPACITY = 50
+
+
+def stream(seed: int, length: int = 20000, universe: int = 200):
+    """(key, now, 再命中次数) 序列，热门键集中，偶尔在同一时刻重复命中"""
+    rng = random.Random(seed)
+    weights = [1 / (i + 1) ** 0.8 for i in range(universe)]
+    keys = rng.choices(range(universe), weights, k=length)
+    return [(key, now // 10, rng.choice([0, 0, 0, 1, 3])) for now, key in enumerate(keys)]
+
+
+def access(cache, key: int, now: int, times: int):
+    size = cache.get(key, now)
+    if not size:
+        cache.put(key, 32 + key, now)
+    cache.touch(key, now, times)
+    return bool(size)
+
+
+def check_invariants(cache):
+    assert len(cache) <= cache.capacity
+    if isinstance(cache, Array_Cache):
+        assert len(cache.free) + len(cache.slots) == cache.capacity
+        assert sorted(list(cache.free) + list(cache.slots.values())) == list(range(cache.capacity))
+        for key, slot in cache.slots.items():
+            assert cache.keys[slot] == key and cache.sizes[slot] == 32 + key
+    if hasattr(cache, 'lists'):
+        lists = cache.lists
+        members = [list(lists.items(i)) for i in range(len(lists.lengths))]
+        assert [len(items) for items in members] == lists.lengths
+        assert sorted(slot for items in members for slot in items) == sorted(cache.slots.values())
+        assert all(lists.owner[slot] == i for i, items in enumerate(members) for slot in items)
+    name = type(cache).__name__
+    if name == 'LFU_Cache':
+        bucket_sizes = 0
+        for freq, head in cache.buckets.items():
+            slot = head
+            while True:
+                assert cache.freqs[slot] == freq
+                bucket_sizes += 1
+                slot = cache.next[slot]
+                if slot == head:
+                    break
+        assert bucket_sizes == len(cache)
+        assert not cache.slots or cache.min_freq == min(cache.buckets)
+    elif name == 'S3FIFO_Cache':
+        assert len(cache.ghost) <= cache.ghost_capacity
+        assert not set(cache.ghost) & set(cache.slots)
+        assert all(0 <= cache.freqs[slot] <= 3 for slot in cache.slots.values())
+    elif name == 'ARC_Cache':
+        c = cache.capacity
+        t1, t2 = cache.lists.lengths
+        assert 0 <= cache.p <= c
+        assert t1 + t2 == len(cache)
+        assert t1 + len(cache.b1) <= c
+        assert t1 + t2 + len(cache.b1) + len(cache.b2) <= 2 * c
+        assert not set(cache.b1) & set(cache.b2)
+        assert not (set(cache.b1) | set(cache.b2)) & set(cache.slots)
+
+
+def test_lru_matches_ordered_dict():
+    """与原 Node 的 OrderedDict 缓存（命中时移到末尾，满时淘汰最前面的）逐次比较命中和缓存顺序"""
+    cache = make_cache('LRU', CAPACITY)
+    reference = OrderedDict()
+    for key, now, times in stream(0):
+        hit = key in reference
+        if hit:
+            reference.move_to_end(key)
+        else:
+            if len(reference) >= CAPACITY:
+                reference.popitem(last=False)
+            reference[key] = 32 + key
+        assert access(cache, key, now, times) == hit
+        assert cache.order() == list(reference)
+    assert cache.evictions > 0
+
+
+@pytest.mark.parametrize('eviction', sorted(EVICTIONS))
+def test_invariants(eviction):
+    cache = make_cache(eviction, CAPACITY)
+    hits = 0
+    for k, (key, now, times) in enumerate(stream(1)):
+        hits += access(cache, key, now, times)
+        if k % 7 == 0:
+            check_invariants(cache)
+    check_invariants(cache)
+    assert len(cache) == CAPACITY and cache.evictions > 0 and 0 < hits < k
+
+
+@pytest.mark.parametrize('eviction', sorted(EVICTIONS))
+def test_state_round_trip(eviction):
+    """中途保存快照、恢复到新缓存后继续访问，命中序列和最终状态与不中断时相同"""
+    requests = stream(2)
+    cache = make_cache(eviction, CAPACITY)
+    for key, now, times in requests[:8000]:
+        access(cache, key, now, times)
+    restored = make_cache(eviction, CAPACITY)
+    restored.set_state(cache.get_state())
+    check_invariants(restored)
+    for key, now, times in requests[8000:]:
+        assert access(restored, key, now, times) == access(cache, key, now, times)
+    assert dict(restored.slots) == dict(cache.slots) and restored.evictions == cache.evictions
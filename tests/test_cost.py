@@ -0,0 +1,73 @@
+"""Cost_Calculator 与 cal_cost 的一致性：各计费方式、跨日/跨月边界、补零和快照恢复"""
+import random
+
+import pytest
+
+from snapshot import load_snapshot, save_snapshot
+from util.tool import cal_cost, Cost_Calculator, Percentile_Tracker
+
+COST_METHODS = ('A', 'B', 'C', 'D', 'E')
+LENGTH = 8640 + 700  # 一个月加两天多，覆盖月边界和之后的日边界
+
+
+def series(seed: int, length: int = LENGTH):
+    """整数和两位小数混合的带宽序列，含大量重复值"""
+    rng = random.Random(seed)
+    return [rng.randint(0, 2048) if rng.random() < 0.5 else round(rng.uniform(0, 2048), 2) for _ in range(length)]
+
+
+@pytest.mark.parametrize('method', COST_METHODS)
+def test_matches_cal_cost(method):
+    bandwidth = series(1)
+    calculator = Cost_Calculator(method, 1.5)
+    for n in range(1, len(bandwidth) + 1):
+        assert calculator.update(bandwidth[:n]) == cal_cost(bandwidth[:n], method, 1.5), n
+
+
+@pytest.mark.parametrize('method', COST_METHODS)
+def test_skipped_updates(method):
+    """不是每个采样点都调用 update 时，一次计入多个采样点"""
+    bandwidth = series(2)
+    calculator = Cost_Calculator(method, 1.0)
+    n = 0
+    rng = random.Random(3)
+    while n < len(bandwidth):
+        n = min(len(bandwidth), n + rng.randint(1, 400))
+        assert calculator.update(bandwidth[:n]) == cal_cost(bandwidth[:n], method, 1.0), n
+
+
+@pytest.mark.parametrize('method', COST_METHODS)
+@pytest.mark.parametrize('offset', [1, 250, 8640 + 5])
+def test_zero_padding(method, offset):
+    """中途加入的实体：offset 之前的采样点按 0 计入，与补零后的完整序列一致"""
+    bandwidth = series(4, 1000)
+    calculator = Cost_Calculator(method, 1.0)
+    for n in range(1, len(bandwidth) + 1, 37):
+        padded = [0] * offset + bandwidth[:n]
+        assert calculator.update(bandwidth[:n], offset) == cal_cost(padded, method, 1.0), n
+
+
+@pytest.mark.parametrize('method', COST_METHODS)
+def test_state_round_trip(method, tmp_path):
+    """经快照文件保存和恢复后继续计费，结果与不中断时相同"""
+    bandwidth = series(5)
+    calculator = Cost_Calculator(method, 1.0)
+    for split in (5, 300, 8640, 8700):
+        calculator.update(bandwidth[:split])
+        path = save_snapshot(str(tmp_path / f"cost_{split}.npz"), {"cost": calculator.get_state()})
+        restored = Cost_Calculator(method, 1.0)
+        restored.set_state(load_snapshot(path)["cost"])
+        for n in range(split + 1, min(split + 600, len(bandwidth)) + 1, 11):
+            assert restored.update(bandwidth[:n]) == calculator.update(bandwidth[:n]), (split, n)
+
+
+def test_percentile_tracker():
+    rng = random.Random(6)
+    tracker = Percentile_Tracker()
+    values = []
+    for _ in range(2000):
+        value = rng.randint(0, 50)
+        tracker.add(value)
+        values.append(value)
+        k = rng.randrange(len(values))
+        assert tracker.kth(k) == sorted(values)[k]
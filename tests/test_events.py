@@ -0,0 +1,27 @@
+"""拓扑事件：移除的节点按 0 带宽计费到当前计费月结束，与同一时间故障且不再恢复的节点成本相同"""
+import json
+
+import numpy as np
+import pytest
+
+from simulation import Simulation
+
+END = 86400
+
+
+def run(setting, tmp_path, action):
+    events = tmp_path / f"{action}.json"
+    events.write_text(json.dumps({"events": [{"time": 36000, "action": action, "type": "nodes.1", "num": 2}]}))
+    setting['events'] = {'file': str(events), 'window': 12}
+    return Simulation(setting, seed=5).run(END, progress=False)
+
+
+@pytest.mark.parametrize('engine', ['request', 'flow'])
+def test_removed_nodes_billed_until_month_end(setting, tmp_path, engine):
+    setting['engine'] = engine
+    removed = run(setting, tmp_path, 'remove_nodes')
+    failed = run(setting, tmp_path, 'fail_nodes')
+    assert len(removed.nodes) == len(failed.nodes) - 2
+    assert len(removed.removed) == 2
+    np.testing.assert_array_equal(removed.total.view('cost'), failed.total.view('cost'))
+    assert removed.summary()['node_costs'] == failed.summary()['node_costs']
@@ -0,0 +1,28 @@
+"""内部指标属于各自的 Simulation：同一进程中先后运行的仿真互不影响"""
+from metrics import NULL_METRICS
+from node import Node
+from simulation import Simulation
+
+END = 20 * 300
+
+
+def test_simulations_keep_their_own_metrics(setting):
+    setting['metrics'] = {'enabled': True}
+    first = Simulation(setting, seed=3).run(END, progress=False)
+    rows = [dict(row) for row in first.metrics.rows]
+    counters = dict(first.metrics.counters)
+    second = Simulation(setting, seed=3).run(END, progress=False)
+    assert first.metrics is not second.metrics
+    assert first.metrics.rows == rows and first.metrics.counters == counters
+    assert len(rows) == END // 300 and counters['requests'] > 0
+    assert second.metrics.counters == counters
+    assert [row['requests'] for row in second.metrics.rows] == [row['requests'] for row in rows]
+
+    setting['metrics'] = {'enabled': False}
+    third = Simulation(setting, seed=3).run(END, progress=False)
+    assert third.metrics.rows == [] and first.metrics.rows == rows
+
+
+def test_standalone_components_use_disabled_metrics():
+    node = Node(hostname="node-0", cache=10, bandwidth=1024, unit_price=1.0, cost_method='A')
+    assert node.metrics is NULL_METRICS and not NULL_METRICS.enabled
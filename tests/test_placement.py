@@ -0,0 +1,60 @@
+"""哈希环的增量更新：逐个或成批加入、移除节点后，查找结果与按当前节点列表整体重建一致，包括虚拟节点哈希冲突"""
+import random
+
+import numpy as np
+import pytest
+
+from hash_ring import HashRing
+from node import Node
+from placement import PLACEMENTS
+
+
+def make_node(hostname: str, bandwidth: float):
+    return Node(hostname=hostname, cache=10, bandwidth=bandwidth, unit_price=1.0, cost_method='A')
+
+
+def assert_same(ring: HashRing, nodes: list, placement: str, hashes: np.ndarray):
+    ref = HashRing(nodes, placement)
+    assert ring.nodes == ref.nodes
+    assert ring.virtual_node_num == ref.virtual_node_num
+    assert all(a is b for a, b in zip(ring.get_nodes(hashes), ref.get_nodes(hashes)))
+    assert all(ring.get_node(h) is ref.get_node(h) for h in hashes[:300].tolist())
+    if placement == 'ketama':
+        assert ring.placement.ring == ref.placement.ring
+        assert ring.placement.owner_list == ref.placement.owner_list
+        assert (ring.placement.sources == ref.placement.sources).all()
+        assert (ring.placement.owners == ref.placement.owners).all()
+
+
+@pytest.mark.parametrize('placement', sorted(PLACEMENTS))
+def test_incremental_matches_rebuild(placement):
+    rng = random.Random(5)
+    nodes = [make_node(f"h{i}", rng.choice([1024, 2048, 20480])) for i in range(60)]
+    nodes.append(make_node("h1", 1024))  # 与 h1 的虚拟节点哈希值全部冲突
+    hashes = np.random.default_rng(0).integers(0, 2147483647, 5000)
+    current = nodes[:30]
+    ring = HashRing(current, placement)
+    for _ in range(40):
+        if rng.random() < 0.5 and len(current) > 2:
+            node = rng.choice(current)
+            current = [n for n in current if n is not node]
+            ring.remove_node(node)
+        else:
+            pool = [n for n in nodes if n not in current]
+            batch = rng.sample(pool, min(len(pool), rng.choice([1, 1, 3, 7])))
+            current = current + batch
+            if len(batch) == 1:
+                ring.add_node(batch[0])
+            else:
+                ring.add_nodes(batch)
+        assert_same(ring, current, placement, hashes)
+
+
+@pytest.mark.parametrize('placement', sorted(PLACEMENTS))
+def test_batch_add_with_collisions(placement):
+    nodes = [make_node(f"h{i}", 2048) for i in range(20)]
+    added = [make_node("h3", 1024), make_node("h21", 2048), make_node("h3", 2048)]
+    hashes = np.random.default_rng(1).integers(0, 2147483647, 5000)
+    ring = HashRing(nodes, placement)
+    ring.add_nodes(added)
+    assert_same(ring, nodes + added, placement, hashes)
@@ -0,0 +1,25 @@
+"""从快照恢复的仿真与不中断的仿真结果一致"""
+import numpy as np
+import pytest
+
+END = 86400  # 一天，288 个时间片
+
+
+def assert_same(expected, actual):
+    arrays, entities, summary, probe_counters = expected
+    resumed_arrays, resumed_entities, resumed_summary, resumed_probe_counters = actual
+    assert resumed_entities == entities
+    assert resumed_summary == summary
+    assert resumed_probe_counters == probe_counters
+    for field, array in arrays.items():
+        np.testing.assert_array_equal(resumed_arrays[field], array, err_msg=field)
+
+
+@pytest.mark.parametrize('engine', ['request', 'flow'])
+def test_resume_parity(setting, run_outputs, engine):
+    setting['engine'] = engine
+    setting['origin'] = {'latency': 20, 'coalescing': True}
+    expected = run_outputs(setting, 7, END)
+    # 第 100、200 个时间片保存快照，第 250 个时间片"崩溃"，从第 200 个时间片的快照恢复
+    assert_same(expected, run_outputs(setting, 7, END, crash=(100, 250)))
+
@@ -0,0 +1,44 @@
+"""开启父层时同一种子的仿真可复现：同一进程中先后运行、以及从快照恢复，结果都与单独运行一致"""
+import pytest
+
+from node import Node
+from shield import Shield_Tier
+from test_resume import assert_same, END
+from util.tool import cdn_hash
+
+
+@pytest.fixture
+def shield_setting(setting):
+    setting['shield'] = {'enabled': True, 'placement': 'ketama', 'nodes': [
+        {'num': 3, 'cache': 300, 'bandwidth': 10240, 'unit_price': 1.0, 'cost_method': 'A', 'eviction': 'LRU'}]}
+    setting['workload'] = {**setting['workload'], 'popularity': 'zipf', 'churn_rate': 0.5}
+    return setting
+
+
+@pytest.mark.parametrize('engine', ['request', 'flow'])
+def test_same_seed_parity(shield_setting, run_outputs, engine):
+    shield_setting['engine'] = engine
+    expected = run_outputs(shield_setting, 11, END)
+    assert expected[2]['shield_hit_ratio'] > 0
+    # 前一次仿真已分配过 URL id，第二次仿真的父层路由不能因此改变
+    assert_same(expected, run_outputs(shield_setting, 11, END))
+
+
+@pytest.mark.parametrize('engine', ['request', 'flow'])
+def test_resume_parity(shield_setting, run_outputs, engine):
+    shield_setting['engine'] = engine
+    expected = run_outputs(shield_setting, 11, END)
+    assert_same(expected, run_outputs(shield_setting, 11, END, crash=(100, 250)))
+
+
+def test_routing_ignores_url_id():
+    """父层按 URL 的哈希值路由，同一 URL 分配到不同 id 时仍落到同一父层节点"""
+    def tier():
+        return Shield_Tier([Node(hostname=f"shield-{i}", cache=100, bandwidth=10240, unit_price=1.0, cost_method='A') for i in range(5)])
+
+    first, second = tier(), tier()
+    for i in range(200):
+        hash_value = cdn_hash(f"http://example.com/{i}")
+        first.fetch(i, hash_value, 0, 32)
+        second.fetch(1000 + 7 * i, hash_value, 0, 32)
+    assert [node.current_bandwidth for node in first.nodes] == [node.current_bandwidth for node in second.nodes]
@@ -0,0 +1,42 @@
+"""参数扫描的中断续跑：只复用指纹相同的结果，对比表只包含当前扫描文件中的场景"""
+import csv
+import json
+import sys
+
+import sweep
+
+
+def run_sweep(monkeypatch, tmp_path, setting, scenarios):
+    base = tmp_path / 'base.json'
+    base.write_text(json.dumps(setting))
+    sweep_file = tmp_path / 'sweep.json'
+    sweep_file.write_text(json.dumps({'base': str(base), 'days': 0.05, 'seeds': [0], 'scenarios': scenarios}))
+    monkeypatch.setattr(sys, 'argv', ['sweep.py', str(sweep_file), '--workers', '1', '--out', str(tmp_path / 'out')])
+    sweep.main()
+    with open(tmp_path / 'out' / 'results.jsonl', 'r', encoding='utf-8') as f:
+        records = [json.loads(line) for line in f]
+    with open(tmp_path / 'out' / 'summary.csv', 'r', encoding='utf-8') as f:
+        table = list(csv.DictReader(f))
+    return records, table
+
+
+def test_resume_reuses_only_matching_jobs(monkeypatch, tmp_path, setting):
+    lfu = {'name': 'lfu', 'overrides': {'nodes.0.eviction': 'LFU'}}
+    arc = {'name': 'arc', 'overrides': {'nodes.0.eviction': 'ARC'}}
+    records, table = run_sweep(monkeypatch, tmp_path, setting, [lfu, arc])
+    assert len(records) == 2 and [row['scenario'] for row in table] == ['lfu', 'arc']
+
+    # 未改变的扫描文件：全部复用
+    records, _ = run_sweep(monkeypatch, tmp_path, setting, [lfu, arc])
+    assert len(records) == 2
+
+    # 改变 lfu 的覆盖项并删去 arc：lfu 重新运行，对比表只有新的 lfu
+    lfu['overrides']['nodes.0.cache'] = 10
+    records, table = run_sweep(monkeypatch, tmp_path, setting, [lfu])
+    assert len(records) == 3 and records[-1]['overrides'] == lfu['overrides']
+    assert [(row['scenario'], row['total_cost']) for row in table] == [('lfu', str(records[-1]['total_cost']))]
+
+    # 改变基础配置：同名场景也重新运行
+    setting['nodes'][1]['num'] = 2
+    records, _ = run_sweep(monkeypatch, tmp_path, setting, [lfu])
+    assert len(records) == 4 and records[-1]['key'] != records[-2]['key']
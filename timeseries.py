@@ -0,0 +1,139 @@
+"""列式时间序列存储：按 实体 × 时间片 预分配 NumPy 数组并按块扩容，节点、业务和总体的带宽与成本只存一份
+
+中途加入的实体只记录起始时间片，之前的值保持为 0；Node、Business、/data 接口和 CSV 导出读取的都是存储的视图。
+结果写入磁盘后可以用 trim 丢弃较早的时间片，内存中只保留 [base, 当前) 的窗口，时间片下标始终为绝对值。
+"""
+import numpy as np
+
+
+class Series:
+    """一个实体在存储中的一行，按时间片顺序追加"""
+
+    def __init__(self, store, row: int):
+        self.store = store
+        self.row = row
+
+    @property
+    def start(self):
+        """加入时的时间片"""
+        return self.store.starts[self.row]
+
+    def __len__(self):
+        return self.store.lengths[self.row]
+
+    def append(self, **values):
+        """追加一个时间片，未给出的字段为 0"""
+        self.store.append(self.row, values)
+
+    @property
+    def offset(self):
+        """view 返回的第一个值对应的时间片"""
+        return self.store.base
+
+    def set(self, field: str, value):
+        """修改最近一个时间片的值"""
+        self.store.arrays[field][self.row, self.store.lengths[self.row] - 1 - self.store.base] = value
+
+    def view(self, field: str, begin: int = None, end: int = None):
+        return self.store.view(self.row, field, begin, end)
+
+
+class Time_Series_Store:
+    def __init__(self, fields: tuple = ('bandwidth', 'cost'), tick_chunk: int = 8640, entity_chunk: int = 64):
+        self.fields = fields
+        self.tick_chunk = tick_chunk  # 时间片方向每次扩容的长度（默认一个月）
+        self.arrays = {field: np.zeros((entity_chunk, tick_chunk)) for field in fields}
+        self.keys = []  # 行 -> (类别, 名称)
+        self.rows = {}  # (类别, 名称) -> 行
+        self.starts = []  # 每行的起始时间片
+        self.lengths = []  # 每行已写入到的时间片（不含），含起始前的 0
+        self.base = 0  # 数组第 0 列对应的时间片，trim 之后增大
+
+    def register(self, kind: str, name: str, start: int = 0):
+        """登记一个实体，kind 为 nodes、shields（父层节点）、businesses 或 total，返回其 Series；已登记的实体返回原有的行"""
+        key = (kind, name)
+        if key in self.rows:
+            return Series(self, self.rows[key])
+        row = len(self.keys)
+        self.reserve(row + 1, start)
+        self.keys.append(key)
+        self.rows[key] = row
+        self.starts.append(start)
+        self.lengths.append(start)
+        return Series(self, row)
+
+    def reserve(self, rows: int, tick: int):
+        """保证数组至少有 rows 行、能容纳到时间片 tick（不含），不够时行数翻倍、列数按块补齐"""
+        ticks = tick - self.base
+        capacity_rows, capacity_ticks = self.arrays[self.fields[0]].shape
+        if rows <= capacity_rows and ticks <= capacity_ticks:
+            return
+        new_rows = capacity_rows
+        while new_rows < rows:
+            new_rows *= 2
+        new_ticks = max(capacity_ticks, -(-ticks // self.tick_chunk) * self.tick_chunk)
+        for field in self.fields:
+            array = np.zeros((new_rows, new_ticks))
+            array[:capacity_rows, :capacity_ticks] = self.arrays[field]
+            self.arrays[field] = array
+
+    def append(self, row: int, values: dict):
+        tick = self.lengths[row]
+        self.reserve(row + 1, tick + 1)
+        for field, value in values.items():
+            self.arrays[field][row, tick - self.base] = value
+        self.lengths[row] = tick + 1
+
+    def view(self, row: int, field: str, begin: int = None, end: int = None):
+        """第 row 行 [begin, end) 时间片的视图，只含内存中仍保留的部分
+
+        begin 默认为 base，end 默认为已写入的长度；数组扩容或 trim 后旧视图不再更新
+        """
+        length = self.lengths[row]
+        begin = self.base if begin is None else max(begin, self.base)
+        end = length if end is None else min(end, length)
+        return self.arrays[field][row, begin - self.base:max(begin, end) - self.base]
+
+    def trim(self, before: int):
+        """丢弃时间片 before 之前的数据，数组大小不变，保留的部分移到开头"""
+        shift = before - self.base
+        if shift <= 0:
+            return
+        for field in self.fields:
+            array = self.arrays[field]
+            kept = max(0, array.shape[1] - shift)
+            array[:, :kept] = array[:, array.shape[1] - kept:].copy()
+            array[:, kept:] = 0
+        self.base = before
+        # 没有写到 before 的行之后从 before 开始追加
+        self.lengths = [max(length, before) for length in self.lengths]
+
+    def get_state(self):
+        """快照：实体登记信息和内存中保留的时间片"""
+        rows = len(self.keys)
+        end = max(self.lengths, default=self.base)
+        return {
+            "kinds": np.array([kind for kind, _ in self.keys], dtype=str),
+            "names": np.array([name for _, name in self.keys], dtype=str),
+            "starts": np.array(self.starts, dtype=np.int64),
+            "lengths": np.array(self.lengths, dtype=np.int64),
+            "base": self.base,
+            "arrays": {field: self.arrays[field][:rows, :end - self.base].copy() for field in self.fields},
+        }
+
+    def set_state(self, state: dict):
+        """原地恢复，已有的 Series 和共享本存储的接口在恢复后读取新内容"""
+        self.keys = list(zip(state["kinds"].tolist(), state["names"].tolist()))
+        self.rows = {key: row for row, key in enumerate(self.keys)}
+        self.starts = state["starts"].tolist()
+        self.lengths = state["lengths"].tolist()
+        self.base = state["base"]
+        rows, ticks = state["arrays"][self.fields[0]].shape
+        self.arrays = {field: np.zeros((1, self.tick_chunk)) for field in self.fields}
+        self.reserve(max(rows, 1), self.base + ticks)
+        for field in self.fields:
+            self.arrays[field][:rows, :ticks] = state["arrays"][field]
+
+    def entities(self, kind: str):
+        """某一类实体的 (名称, Series) 列表，按登记顺序"""
+        return [(name, Series(self, row)) for row, (entity_kind, name) in enumerate(self.keys) if entity_kind == kind]
@@ -0,0 +1,119 @@
+"""业务带宽波形（trace）：波形 CSV 只解析一次，缓存为 .npy，之后以只读 memmap 打开
+
+缓存文件按 CSV 的路径、修改时间和大小命名，CSV 修改后自动重新解析；同一进程内各业务共享同一个数组，
+参数扫描的各工作进程共享磁盘上的缓存文件和页缓存。CSV 每行为一个 5 分钟时间片，带宽取 total_bw 列。
+
+回放（settings.json 的 trace 为各业务的默认配置，业务自己的 trace 覆盖其中的项）：
+    loop       播放到波形末尾后从头循环；为 false 时波形之外的时间片带宽为 0
+    shift      时间平移（秒），仿真时间 t 对应波形中的 t + shift 秒
+    scale      带宽缩放倍数
+    length     只使用波形的前 length 秒，null 为整个波形；86400 即原来只重复第一天的行为
+    cache_dir  缓存目录
+"""
+import glob
+import json
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+import xxhash
+
+DEFAULT_SETTING = {
+    "loop": True,
+    "shift": 0,
+    "scale": 1.0,
+    "length": None,
+    "cache_dir": "./data/.cache",
+}
+
+loaded = {}  # (路径, 修改时间, 大小) -> 波形数组，同一进程内共享
+
+
+def parse_trace(path: str):
+    values = pd.read_csv(path, usecols=['total_bw'])['total_bw'].to_numpy(dtype=np.float64)
+    return np.nan_to_num(values)
+
+
+def load_trace(path: str, cache_dir: str = DEFAULT_SETTING["cache_dir"]):
+    """返回 path 的带宽数组（只读），优先使用缓存；缓存目录不可写时直接解析"""
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    values = loaded.get(key)
+    if values is not None:
+        return values
+    # 文件名中的哈希区分不同目录下的同名 CSV，修改时间和大小区分同一 CSV 的不同版本
+    prefix = f"{os.path.splitext(os.path.basename(path))[0]}-{xxhash.xxh64(path).hexdigest()}"
+    cache_path = os.path.join(cache_dir, f"{prefix}-{stat.st_mtime_ns}-{stat.st_size}.npy")
+    try:
+        values = np.load(cache_path, mmap_mode='r')
+    except (OSError, ValueError):
+        values = parse_trace(path)
+        try:
+            save_cache(cache_path, values, prefix)
+            values = np.load(cache_path, mmap_mode='r')
+        except OSError:
+            pass
+    loaded[key] = values
+    return values
+
+
+def save_cache(cache_path: str, values: np.ndarray, prefix: str):
+    """写入临时文件后替换，多个进程同时写入同一缓存也不会读到写了一半的文件；删除同一 CSV 的旧版本缓存"""
+    cache_dir = os.path.dirname(cache_path)
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.save(f, values)
+        os.replace(tmp_path, cache_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    for stale in glob.glob(os.path.join(glob.escape(cache_dir), f"{glob.escape(prefix)}-*.npy")):
+        if stale != cache_path:
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+
+
+def warm_cache(setting: dict):
+    """预先解析 setting 中各业务和事件文件中上线业务的波形，参数扫描启动工作进程前调用，避免各进程重复解析"""
+    trace = setting.get('trace', {})
+    businesses = list(setting['businesses'])
+    events = setting.get('events', {})
+    if events.get('file'):
+        with open(events['file'], 'r', encoding='utf-8') as f:
+            for event in json.load(f)['events']:
+                if event.get('action') == 'onboard_businesses':
+                    businesses.extend(event['businesses'])
+    for business in businesses:
+        cache_dir = {**trace, **business.get('trace', {})}.get('cache_dir', DEFAULT_SETTING["cache_dir"])
+        load_trace(f"./data/{business['wave_file']}", cache_dir)
+
+
+class Trace:
+    """一个业务的带宽波形回放"""
+
+    def __init__(self, path: str, setting: dict = None):
+        self.path = path
+        self.setting = {**DEFAULT_SETTING, **(setting or {})}
+        self.values = load_trace(path, self.setting['cache_dir'])
+        self.loop = self.setting['loop']
+        self.shift = self.setting['shift']
+        self.scale = self.setting['scale']
+        length = self.setting['length']
+        self.ticks = len(self.values) if length is None else min(len(self.values), length // 300)  # 回放的时间片数
+        if self.ticks <= 0:
+            raise ValueError(f"empty trace: {path}")
+
+    def bandwidth(self, timestamp: int):
+        """仿真时间 timestamp 所在时间片的带宽"""
+        index = (timestamp + self.shift) // 300
+        if self.loop:
+            index %= self.ticks
+        elif not 0 <= index < self.ticks:
+            return 0.0
+        return float(self.values[index]) * self.scale
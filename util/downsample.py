@@ -0,0 +1,60 @@
+"""时间序列降采样：长历史在缩小显示时只需保留少量能体现形状的点，均返回保留的下标（升序）"""
+import numpy as np
+
+
+def lttb(values: np.ndarray, threshold: int):
+    """Largest-Triangle-Three-Buckets：首尾点保留，中间每个桶取与前一个选中点、下一个桶均值构成的三角形面积最大的点"""
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)  # 中间 threshold - 2 个桶的边界
+    indexes = np.empty(threshold, dtype=np.int64)
+    indexes[0] = 0
+    indexes[-1] = n - 1
+    selected = 0
+    for i in range(threshold - 2):
+        begin, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        # 下一个桶的均值点，最后一个桶之后是终点
+        next_x = (end + next_end - 1) / 2
+        next_y = values[end:next_end].mean()
+        x = np.arange(begin, end)
+        areas = np.abs((selected - next_x) * (values[begin:end] - values[selected]) - (selected - x) * (next_y - values[selected]))
+        selected = begin + int(np.argmax(areas))
+        indexes[i + 1] = selected
+    return indexes
+
+
+def min_max(values: np.ndarray, threshold: int):
+    """每个桶保留最小值和最大值两个点，峰值不会被平滑掉，最多 threshold 个点"""
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    bucket_num = threshold // 2
+    if threshold >= n or bucket_num < 1:
+        return np.arange(n)
+    edges = np.linspace(0, n, bucket_num + 1).astype(np.int64)
+    lows = np.minimum.reduceat(values, edges[:-1])
+    highs = np.maximum.reduceat(values, edges[:-1])
+    bucket = np.repeat(np.arange(bucket_num), np.diff(edges))
+    # 每个桶中第一个取到最小值、最大值的位置
+    is_low = values == lows[bucket]
+    is_high = values == highs[bucket]
+    first_low = np.flatnonzero(is_low)[np.unique(bucket[is_low], return_index=True)[1]]
+    first_high = np.flatnonzero(is_high)[np.unique(bucket[is_high], return_index=True)[1]]
+    return np.union1d(first_low, first_high)
+
+
+DOWNSAMPLERS = {
+    'lttb': lttb,
+    'minmax': min_max,
+}
+
+
+def downsample(values: np.ndarray, threshold: int, method: str = 'lttb'):
+    """返回降采样后保留的下标，threshold 为 0 或不小于长度时保留全部"""
+    if method not in DOWNSAMPLERS:
+        raise ValueError(f"unknown downsampling method: {method}")
+    if not threshold:
+        return np.arange(len(values))
+    return DOWNSAMPLERS[method](values, threshold)
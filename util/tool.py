@@ -1,5 +1,8 @@
+import heapq
+import math
 import random
 import string
+from array import array
 
 import numpy as np
 import xxhash
@@ -10,6 +13,32 @@ def cdn_hash(content: str):
     return xxhash.xxh64(content).intdigest() % hash_max
 
 
+def pack(value):
+    """把状态中的 array、以整数为键的字典和列表转换为 NumPy 数组，标量原样返回，供快照保存"""
+    if isinstance(value, array):
+        return np.array(value)
+    if isinstance(value, dict):
+        values = list(value.values())
+        return {"keys": np.array(list(value), dtype=np.int64),
+                "values": None if all(v is None for v in values) else np.array(values)}
+    if isinstance(value, list):
+        return np.array(value)
+    return value
+
+
+def unpack(current, packed):
+    """pack 的逆操作，current 为同名属性的当前值，用于确定类型；array 原地更新，别名仍然有效"""
+    if isinstance(current, array):
+        current[:] = array(current.typecode, np.asarray(packed, dtype=current.typecode).tobytes())
+        return current
+    if isinstance(current, dict):
+        keys = packed["keys"].tolist()
+        return dict.fromkeys(keys) if packed["values"] is None else dict(zip(keys, packed["values"].tolist()))
+    if isinstance(current, list):
+        return packed.tolist()
+    return packed
+
+
 def cal_cost(bandwidth: list, cost_method: str, unit_price: float):
     remainder_month = len(bandwidth) % 8640
     if remainder_month == 0:
@@ -79,6 +108,154 @@ def cal_cost(bandwidth: list, cost_method: str, unit_price: float):
     return strategies[cost_method]()
 
 
+class Percentile_Tracker:
+    """只插入不删除的序列上的第 k 小值：low 为最小的若干个值（取负的大顶堆），high 为其余值（小顶堆）
+
+    插入 O(log n)；查询时在两堆之间移动元素使 low 恰好有 k + 1 个，k 随序列增长单调不减，均摊每次插入移动 O(1) 个
+    """
+
+    def __init__(self):
+        self.low = []
+        self.high = []
+
+    def __len__(self):
+        return len(self.low) + len(self.high)
+
+    def add(self, value):
+        if self.low and value <= -self.low[0]:
+            heapq.heappush(self.low, -value)
+        else:
+            heapq.heappush(self.high, value)
+
+    def kth(self, k: int):
+        """第 k 小（从 0 开始）的值"""
+        while len(self.low) > k + 1:
+            heapq.heappush(self.high, -heapq.heappop(self.low))
+        while len(self.low) < k + 1:
+            heapq.heappush(self.low, -heapq.heappop(self.high))
+        return -self.low[0]
+
+    def get_state(self):
+        return {"low": pack(self.low), "high": pack(self.high)}
+
+    def set_state(self, state: dict):
+        self.low = state["low"].tolist()
+        self.high = state["high"].tolist()
+
+
+class Cost_Calculator:
+    """增量计费器：按采样点维护月/日/晚高峰窗口的分位数与日峰值，结果与 cal_cost 保持一致"""
+
+    def __init__(self, cost_method: str, unit_price: float):
+        if cost_method not in ('A', 'B', 'C', 'D', 'E'):
+            raise ValueError(f"unknown cost method: {cost_method}")
+        self.cost_method = cost_method
+        self.unit_price = unit_price
+        self.count = 0  # 已计入的采样点数
+        self.month = Percentile_Tracker()  # 当月带宽（A）
+        self.day = Percentile_Tracker()  # 当日带宽（B）
+        self.peak = Percentile_Tracker()  # 当日晚高峰带宽（C）
+        self.day_peak = None  # 当日峰值（E）
+        self.day_peak_sum = 0  # 当月已结束日的峰值之和（E）
+        self.day_peak_num = 0  # 当月已结束的天数（E）
+        self.cost = 0  # 最近一次计算的费用
+
+    def add(self, value):
+        """计入一个采样点并返回截至该点的费用"""
+        if self.count % 8640 == 0:  # 新的一个月
+            self.month = Percentile_Tracker()
+            self.day_peak = None
+            self.day_peak_sum = 0
+            self.day_peak_num = 0
+        if self.count % 288 == 0:  # 新的一天
+            self.day = Percentile_Tracker()
+            self.peak = Percentile_Tracker()
+            if self.day_peak is not None:
+                self.day_peak_sum += self.day_peak
+                self.day_peak_num += 1
+            self.day_peak = None
+        day_index = self.count % 288
+        self.count += 1
+
+        if self.cost_method == 'A':
+            self.month.add(value)
+            top_95_index = math.ceil(len(self.month) * 0.95) - 1
+            return (round(float(self.month.kth(top_95_index)), 2)) * self.unit_price
+        if self.cost_method == 'B':
+            self.day.add(value)
+            day_95_index = round(len(self.day) * 0.95) - 1
+            return (round(self.day.kth(day_95_index), 2)) * self.unit_price
+        if self.cost_method == 'C':
+            if day_index < 240:  # 晚高峰之前没有足够的数据
+                return 0
+            self.peak.add(value)
+            peak_95_index = round(len(self.peak) * 0.95) - 1
+            return (round(self.peak.kth(peak_95_index), 2)) * self.unit_price
+        if self.cost_method == 'D':
+            return (round(1, 2)) * self.unit_price
+        if self.day_peak is None or value > self.day_peak:
+            self.day_peak = value
+        return (round((self.day_peak_sum + self.day_peak) / (self.day_peak_num + 1), 2)) * self.unit_price
+
+    STATE = ('count', 'day_peak', 'day_peak_sum', 'day_peak_num', 'cost')
+    TRACKERS = ('month', 'day', 'peak')
+
+    def get_state(self):
+        state = {name: pack(getattr(self, name)) for name in self.STATE}
+        state.update({name: getattr(self, name).get_state() for name in self.TRACKERS})
+        return state
+
+    def set_state(self, state: dict):
+        for name in self.STATE:
+            setattr(self, name, unpack(getattr(self, name), state[name]))
+        for name in self.TRACKERS:
+            getattr(self, name).set_state(state[name])
+
+    def update(self, bandwidth: list, offset: int = 0):
+        """计入 bandwidth 中尚未计入的采样点，返回与 cal_cost(bandwidth, ...) 相同的费用
+
+        offset 为 bandwidth 第一个值对应的采样点序号，更早的采样点若尚未计入则按 0 计入
+        """
+        while self.count < offset:
+            self.cost = self.add(0)
+        pending = bandwidth[self.count - offset:]
+        if isinstance(pending, np.ndarray):  # 时间序列存储的视图，转成 Python 数值再比较和排序
+            pending = pending.tolist()
+        for value in pending:
+            self.cost = self.add(value)
+        return self.cost
+
+
+class URL_Interner:
+    """把 URL 字符串映射为唯一的整型 id，节点缓存以 id 为键；id 不会被复用
+
+    每个 Simulation 一个，由它的节点和请求处理器共用，同一进程中先后运行的仿真互不影响
+    """
+
+    def __init__(self):
+        self.ids = {}
+        self.next_id = 0
+
+    def intern(self, url: str):
+        url_id = self.ids.get(url)
+        if url_id is None:
+            url_id = self.next_id
+            self.ids[url] = url_id
+            self.next_id += 1
+        return url_id
+
+    def release(self, url: str):
+        """URL 下线后不再保留字符串到 id 的映射"""
+        self.ids.pop(url, None)
+
+    def get_state(self):
+        return {"urls": np.array(list(self.ids), dtype=str), "ids": np.array(list(self.ids.values()), dtype=np.int64), "next_id": self.next_id}
+
+    def set_state(self, state: dict):
+        self.ids = dict(zip(state["urls"].tolist(), state["ids"].tolist()))
+        self.next_id = state["next_id"]
+
+
 class Hostname_Generator:
     def __init__(self):
         self.generated = set()
@@ -89,34 +266,3 @@ class Hostname_Generator:
             if new_hostname not in self.generated:
                 self.generated.add(new_hostname)
                 return new_hostname
-
-
-class URL_Generator:
-    def __init__(self, app_id, url_num):
-        self.app_id = app_id
-        self.url_num = url_num
-        self.modify_period = 172800 // self.url_num
-        self.last_modify = 0
-        self.l = []
-        self.seen_urls = set(self.l)
-        self.generate()
-
-    def generate(self):
-        while len(self.l) < self.url_num:
-            new_url = f"http://{self.app_id}.com/{''.join(random.choices(string.ascii_letters + string.digits + '_', k=30)).lower()}"
-            if new_url not in self.seen_urls:
-                self.seen_urls.add(new_url)
-                self.l.append(new_url)
-
-    def get_url(self, timestamp):
-        if timestamp - self.last_modify > self.modify_period:
-            drop_index = random.randint(0, self.url_num - 1)
-            new_url = f"http://{self.app_id}.com/{''.join(random.choices(string.ascii_letters + string.digits + '_', k=30)).lower()}"
-            while new_url in self.seen_urls:
-                new_url = f"http://{self.app_id}.com/{''.join(random.choices(string.ascii_letters + string.digits + '_', k=30)).lower()}"
-            self.seen_urls.remove(self.l[drop_index])
-            self.seen_urls.add(new_url)
-            self.l[drop_index] = new_url
-            self.last_modify = timestamp
-
-        return self.l[random.randint(0, self.url_num - 1)]
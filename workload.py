@@ -0,0 +1,141 @@
+"""工作负载生成：每个业务一个 Workload，维护 URL 目录（槽位 -> 对象），向量化生成每个时间片的请求
+
+请求以槽位下标的 NumPy 整型数组表示，由业务自己的 numpy Generator 生成；Simulation 用仿真种子和 app_id 派生种子，
+同一种子的仿真可以复现，加入或删除其他业务也不改变本业务的请求流。对象以 63 位随机整数为键，
+URL 字符串只在需要时（路由计算指纹、URL 下线通知、抽样判断）由键生成。
+
+settings.json 的 workload 为各业务的默认配置，业务自己的 workload 覆盖其中的项：
+    popularity  uniform：各槽位等概率（原有模型）；zipf：第 i 个槽位的概率正比于 1 / (i + 1) ^ alpha
+    churn_rate  每天替换的 URL 比例，每个时间片按泊松分布抽取替换数；为 null 时沿用原有行为，
+                距上次替换超过 172800 / url_num 秒时替换一个
+    size        对象大小分布：fixed、lognormal（对数标准差 size_sigma）、pareto（形状参数 size_alpha），
+                均值均为 size_mean（MB），取整且至少为 1，新对象加入时抽取
+"""
+import numpy as np
+
+POPULARITY_MODELS = ('uniform', 'zipf')
+SIZE_MODELS = ('fixed', 'lognormal', 'pareto')
+DEFAULT_SETTING = {
+    "popularity": "uniform",
+    "alpha": 0.8,
+    "churn_rate": None,
+    "size": "fixed",
+    "size_mean": 32,  # 与 node.py->generate_content_size() 保持一致
+    "size_sigma": 1.0,
+    "size_alpha": 1.5,
+}
+
+
+class Workload:
+    def __init__(self, app_id: str, url_num: int, setting: dict = None, rng: np.random.Generator = None):
+        self.app_id = app_id
+        self.url_num = url_num
+        self.setting = {**DEFAULT_SETTING, **(setting or {})}
+        self.popularity_model = self.setting['popularity']
+        if self.popularity_model not in POPULARITY_MODELS:
+            raise ValueError(f"unknown popularity model: {self.popularity_model}")
+        self.size_model = self.setting['size']
+        if self.size_model not in SIZE_MODELS:
+            raise ValueError(f"unknown size model: {self.size_model}")
+        if self.size_model == 'pareto' and self.setting['size_alpha'] <= 1:
+            raise ValueError(f"size_alpha must be greater than 1 for a finite mean: {self.setting['size_alpha']}")
+        self.size_mean = self.setting['size_mean']
+        self.churn_rate = self.setting['churn_rate']
+        self.modify_period = 172800 // self.url_num
+        self.last_modify = 0
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.keys = self.new_keys(url_num)  # 各槽位上对象的键
+        self.sizes = self.new_sizes(url_num)  # 各槽位上对象的大小（MB）
+        self.retire_listeners = []  # URL 被淘汰时的回调，参数为被淘汰的 URL
+        self.probabilities = None
+        self.cdf = None
+
+    def new_keys(self, num: int):
+        # 63 位随机整数，重复的概率可以忽略
+        return self.rng.integers(0, np.iinfo(np.int64).max, num, dtype=np.int64)
+
+    def new_sizes(self, num: int):
+        mean = self.size_mean
+        if self.size_model == 'fixed':
+            return np.full(num, max(1, round(mean)), dtype=np.int64)
+        if self.size_model == 'lognormal':
+            sigma = self.setting['size_sigma']
+            sizes = self.rng.lognormal(np.log(mean) - sigma ** 2 / 2, sigma, num)
+        else:
+            alpha = self.setting['size_alpha']
+            sizes = mean * (alpha - 1) / alpha * (1 + self.rng.pareto(alpha, num))
+        return np.maximum(1, np.rint(sizes)).astype(np.int64)
+
+    def url(self, i: int):
+        return f"http://{self.app_id}.com/{int(self.keys[i]):016x}"
+
+    def urls(self, indexes: np.ndarray):
+        """槽位下标对应的 URL 列表"""
+        app_id = self.app_id
+        return [f"http://{app_id}.com/{key:016x}" for key in self.keys[indexes].tolist()]
+
+    def churn(self, timestamp: int):
+        """替换本时间片下线的 URL，先替换再通知 retire_listeners"""
+        if self.churn_rate is None:
+            if timestamp - self.last_modify <= self.modify_period:
+                return
+            drops = [int(self.rng.integers(self.url_num))]
+        else:
+            if timestamp <= self.last_modify:
+                return
+            expected = self.url_num * self.churn_rate * (timestamp - self.last_modify) / 86400
+            num = min(int(self.rng.poisson(expected)), self.url_num)
+            drops = self.rng.choice(self.url_num, num, replace=False).tolist() if num else []
+        self.last_modify = timestamp
+        if not drops:
+            return
+        retired_urls = [self.url(i) for i in drops]
+        self.keys[drops] = self.new_keys(len(drops))
+        self.sizes[drops] = self.new_sizes(len(drops))
+        for retired_url in retired_urls:
+            for listener in self.retire_listeners:
+                listener(retired_url)
+
+    def popularity(self):
+        """各槽位被请求的概率"""
+        if self.probabilities is None:
+            if self.popularity_model == 'uniform':
+                self.probabilities = np.full(self.url_num, 1 / self.url_num)
+            else:
+                weights = np.arange(1, self.url_num + 1, dtype=np.float64) ** -self.setting['alpha']
+                self.probabilities = weights / weights.sum()
+            self.cdf = np.cumsum(self.probabilities)
+        return self.probabilities
+
+    def requests(self, request_num: int, candidates: np.ndarray = None, probabilities: np.ndarray = None):
+        """本时间片 request_num 个请求的槽位下标（按到达顺序）
+
+        candidates 不为 None 时只在这些槽位中按 probabilities（已归一化）抽取，用于空间抽样
+        """
+        if candidates is not None:
+            return self.rng.choice(candidates, request_num, p=probabilities) if request_num else candidates[:0]
+        if self.popularity_model == 'uniform':
+            return self.rng.integers(0, self.url_num, request_num)
+        self.popularity()
+        indexes = np.searchsorted(self.cdf, self.rng.random(request_num), side='right')
+        return np.minimum(indexes, self.url_num - 1)  # 累积概率的舍入误差
+
+    def flows(self, request_num: int, candidates: np.ndarray = None, probabilities: np.ndarray = None):
+        """流量级：一次多项分布抽样得到本时间片各槽位的请求数，返回 (被请求的槽位下标, 请求数)
+
+        槽位按随机顺序排列，避免固定顺序让靠前的 URL 总是先占满节点带宽
+        """
+        if candidates is None:
+            probabilities = self.popularity()
+        counts = self.rng.multinomial(request_num, probabilities)
+        indexes = self.rng.permutation(np.flatnonzero(counts))
+        return (indexes if candidates is None else candidates[indexes]), counts[indexes]
+
+    def get_state(self):
+        return {"keys": self.keys, "sizes": self.sizes, "last_modify": self.last_modify, "rng": self.rng.bit_generator.state}
+
+    def set_state(self, state: dict):
+        self.keys = np.array(state["keys"], dtype=np.int64)
+        self.sizes = np.array(state["sizes"], dtype=np.int64)
+        self.last_modify = state["last_modify"]
+        self.rng.bit_generator.state = state["rng"]